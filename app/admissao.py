@@ -0,0 +1,296 @@
+import asyncio
+import logging
+import math
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+from config import Config
+from metricas import metricas
+
+logger = logging.getLogger(__name__)
+
+# Classe de cada rota, pela primeira regra que casar: (métodos ou None para todos, prefixo, classe).
+# Classe None deixa a requisição passar sem limite nem fila.
+REGRAS_ROTAS = (
+    (None, "/metrics", None),
+    (None, "/docs", None),
+    (None, "/redoc", None),
+    (None, "/openapi.json", None),
+    ({"POST"}, "/login", "login"),
+    (None, "/produtos/importar", "pesada"),
+    (None, "/produtos/exportar", "pesada"),
+    (None, "/api/v1/produtos/remover", "pesada"),
+    (None, "/api/v1/usuarios/remover", "pesada"),
+    (None, "/api/v1/analise", "pesada"),
+    (None, "/api/v1/eventos", "eventos"),
+)
+
+# Long-poll e SSE passam quase todo o tempo esperando, sem usar o banco:
+# ocupariam as vagas da fila global por minutos
+CLASSES_SEM_FILA = {"eventos"}
+
+
+def classificar(metodo: str, caminho: str) -> Optional[str]:
+    for metodos, prefixo, classe in REGRAS_ROTAS:
+        if caminho.startswith(prefixo) and (metodos is None or metodo in metodos):
+            return classe
+    return "leitura" if metodo in ("GET", "HEAD") else "escrita"
+
+
+def ler_limites(especificacao: str) -> Dict[str, Tuple[float, float]]:
+    """Lê "classe=taxa/rajada,..." em {classe: (fichas por segundo, capacidade)}; taxa 0 desliga o limite."""
+    limites = {}
+    for item in filter(None, (parte.strip() for parte in especificacao.split(","))):
+        try:
+            classe, valor = item.split("=")
+            taxa, rajada = (float(numero) for numero in valor.split("/"))
+        except ValueError:
+            raise ValueError(f"Limite inválido: {item!r} (use classe=taxa/rajada)")
+        if taxa > 0:
+            limites[classe.strip()] = (taxa, max(rajada, 1.0))
+    return limites
+
+
+def _recarregar(fichas: float, atualizado: float, agora: float, taxa: float, capacidade: float):
+    """Token bucket: repõe as fichas pelo tempo decorrido e tenta gastar uma; retorna (fichas, espera)."""
+    fichas = min(capacidade, fichas + max(agora - atualizado, 0.0) * taxa)
+    if fichas >= 1:
+        return fichas - 1, 0.0
+    return fichas, (1 - fichas) / taxa
+
+
+class MemoriaLimiteBackend:
+    """Baldes deste processo; com vários workers, cada um aplica o limite separadamente."""
+
+    bloqueante = False
+
+    def __init__(self, max_itens: int = 100000):
+        self.max_itens = max_itens
+        self._baldes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consumir(self, chave: str, taxa: float, capacidade: float) -> float:
+        """Gasta uma ficha do balde `chave`; retorna 0 ou quantos segundos faltam para a próxima."""
+        agora = time.monotonic()
+        with self._lock:
+            fichas, atualizado = self._baldes.pop(chave, (capacidade, agora))
+            fichas, espera = _recarregar(fichas, atualizado, agora, taxa, capacidade)
+            self._baldes[chave] = (fichas, agora)
+            # Os clientes parados há mais tempo saem primeiro; voltam com o balde cheio
+            while len(self._baldes) > self.max_itens:
+                self._baldes.popitem(last=False)
+        return espera
+
+    def __len__(self):
+        return len(self._baldes)
+
+
+class SQLiteLimiteBackend:
+    """
+    Baldes num arquivo SQLite local, compartilhado pelos workers da mesma
+    máquina: o limite vale para o cliente no servidor inteiro. Cada thread
+    usa sua própria conexão.
+    """
+
+    bloqueante = True
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self._local = threading.local()
+        self._conexao().execute(
+            "CREATE TABLE IF NOT EXISTS limites (chave TEXT PRIMARY KEY, fichas REAL NOT NULL, atualizado REAL NOT NULL)"
+        )
+
+    def _conexao(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.caminho, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def consumir(self, chave: str, taxa: float, capacidade: float) -> float:
+        # Relógio de parede: o arquivo é lido por vários processos
+        agora = time.time()
+        conn = self._conexao()
+        # BEGIN IMMEDIATE serializa a leitura e a gravação do balde entre os workers
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            linha = conn.execute("SELECT fichas, atualizado FROM limites WHERE chave = ?", (chave,)).fetchone()
+            fichas, espera = _recarregar(*(linha or (capacidade, agora)), agora, taxa, capacidade)
+            conn.execute(
+                "INSERT INTO limites (chave, fichas, atualizado) VALUES (?, ?, ?) "
+                "ON CONFLICT(chave) DO UPDATE SET fichas = excluded.fichas, atualizado = excluded.atualizado",
+                (chave, fichas, agora)
+            )
+            # Baldes parados há uma hora já estão cheios; remove de vez em quando
+            if random.random() < 0.001:
+                conn.execute("DELETE FROM limites WHERE atualizado < ?", (agora - 3600,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return espera
+
+    def __len__(self):
+        return self._conexao().execute("SELECT COUNT(*) FROM limites").fetchone()[0]
+
+
+def criar_backend_limites():
+    if Config.ADMISSAO_BACKEND == "sqlite":
+        return SQLiteLimiteBackend(Config.ADMISSAO_ARQUIVO)
+    return MemoriaLimiteBackend(Config.ADMISSAO_MAX_CLIENTES)
+
+
+class ConcorrenciaRecusada(Exception):
+    def __init__(self, motivo: str):
+        self.motivo = motivo
+        super().__init__(motivo)
+
+
+class ControleConcorrencia:
+    """
+    Limita as requisições em execução ao mesmo tempo e quantas esperam por
+    uma vaga. O padrão acompanha o tamanho do pool do banco: acima dele as
+    requisições só disputariam conexões, segurando memória e sockets.
+    """
+
+    def __init__(self, limite: int, fila: int, espera: float):
+        self.limite = limite
+        self.fila = fila
+        self.espera = espera
+        self._loop = None
+        self._semaforo = None
+        self.em_execucao = 0
+        self.esperando = 0
+
+    def _vincular(self):
+        # O semáforo pertence a um event loop; um novo loop recomeça do zero
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaforo = asyncio.Semaphore(self.limite)
+            self.em_execucao = 0
+            self.esperando = 0
+
+    async def entrar(self):
+        self._vincular()
+        if self._semaforo.locked():
+            if self.esperando >= self.fila:
+                raise ConcorrenciaRecusada("fila_cheia")
+            self.esperando += 1
+            inicio = time.perf_counter()
+            try:
+                await asyncio.wait_for(self._semaforo.acquire(), self.espera)
+            except asyncio.TimeoutError:
+                raise ConcorrenciaRecusada("espera")
+            finally:
+                self.esperando -= 1
+                metricas.observar("admissao_espera_segundos", time.perf_counter() - inicio)
+        else:
+            await self._semaforo.acquire()
+        self.em_execucao += 1
+
+    def sair(self):
+        self.em_execucao -= 1
+        self._semaforo.release()
+
+    def status(self) -> dict:
+        return {"limite": self.limite, "em_execucao": self.em_execucao, "esperando": self.esperando}
+
+
+controle_concorrencia = ControleConcorrencia(
+    Config.ADMISSAO_CONCORRENCIA, Config.ADMISSAO_FILA, Config.ADMISSAO_ESPERA
+)
+
+
+class AdmissaoMiddleware:
+    """
+    Decide na entrada se a requisição é atendida, antes de qualquer acesso ao
+    banco: primeiro o limite do cliente para a classe da rota (429), depois
+    uma vaga na concorrência global (503). Toda requisição gasta uma ficha do
+    balde do IP; a de um usuário logado gasta também uma do balde do usuário,
+    lido do cookie assinado, sem consultar o store. Sessões anônimas não têm
+    balde próprio: qualquer um obtém quantas quiser (basta uma mensagem flash).
+    """
+
+    def __init__(self, app, backend=None, limites: Optional[dict] = None,
+                 controle: ControleConcorrencia = controle_concorrencia):
+        self.app = app
+        self.backend = backend or criar_backend_limites()
+        self.limites = ler_limites(Config.ADMISSAO_LIMITES) if limites is None else limites
+        self.controle = controle
+
+    def _clientes(self, scope) -> list:
+        cliente = scope.get("client")
+        chaves = [f"ip:{cliente[0] if cliente else 'desconhecido'}"]
+        preguicosa = scope.get("state", {}).get("sessao")
+        if preguicosa is not None and preguicosa.usuario_id is not None:
+            chaves.append(f"usuario:{preguicosa.usuario_id}")
+        return chaves
+
+    async def _consumir(self, chave: str, taxa: float, capacidade: float) -> float:
+        try:
+            if self.backend.bloqueante:
+                return await run_in_threadpool(self.backend.consumir, chave, taxa, capacidade)
+            return self.backend.consumir(chave, taxa, capacidade)
+        except Exception as e:
+            # Falha no controle não deve derrubar a aplicação: a requisição passa
+            logger.warning(f"Falha ao consultar o limite de requisições: {str(e)}")
+            return 0.0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        classe = classificar(scope["method"], scope["path"])
+        if classe is None:
+            await self.app(scope, receive, send)
+            return
+
+        limite = self.limites.get(classe)
+        if limite:
+            espera = 0.0
+            for cliente in self._clientes(scope):
+                espera = await self._consumir(f"{classe}:{cliente}", *limite)
+                if espera:
+                    break
+            if espera:
+                metricas.incrementar("admissao_rejeicoes_total", motivo="limite", classe=classe)
+                await _recusar(scope, receive, send, 429, "Muitas requisições; tente novamente em instantes", espera)
+                return
+
+        if classe in CLASSES_SEM_FILA:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self.controle.entrar()
+        except ConcorrenciaRecusada as e:
+            metricas.incrementar("admissao_rejeicoes_total", motivo=e.motivo, classe=classe)
+            await _recusar(scope, receive, send, 503, "Servidor sobrecarregado; tente novamente em instantes", 1)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controle.sair()
+
+
+async def _recusar(scope, receive, send, status: int, mensagem: str, espera: float):
+    resposta = JSONResponse(
+        {"detail": mensagem}, status_code=status, headers={"Retry-After": str(max(1, math.ceil(espera)))}
+    )
+    await resposta(scope, receive, send)
+
+
+metricas.definir("admissao_rejeicoes_total", "counter", "Requisições recusadas na entrada, por motivo e classe de rota")
+metricas.definir("admissao_espera_segundos", "histogram", "Espera por uma vaga na concorrência global")
@@ -0,0 +1,6 @@
+"""
+Benchmarks de carga e micro-benchmarks do sistema.
+
+Os resultados são gravados em JSON para que execuções diferentes possam ser
+comparadas com `python cli.py bench comparar antes.json depois.json`.
+"""
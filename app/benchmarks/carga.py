@@ -0,0 +1,500 @@
+import http.client
+import json
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+from benchmarks.estatisticas import resumo
+from benchmarks.semente import PALAVRAS, SENHA_BENCH
+
+logger = logging.getLogger(__name__)
+
+
+class CorpoJson(dict):
+    """Corpo enviado como JSON; um dict comum é enviado como formulário."""
+
+
+# Uma requisição: (método, caminho, corpo de formulário, CorpoJson ou None)
+Requisicao = Tuple[str, str, Optional[dict]]
+
+
+class Cliente:
+    """Conexão keep-alive com a aplicação; cada thread usa a sua. Redirecionamentos não são seguidos."""
+
+    def __init__(self, url: str, timeout: float = 30):
+        partes = urlsplit(url)
+        self.classe = http.client.HTTPSConnection if partes.scheme == "https" else http.client.HTTPConnection
+        self.host = partes.netloc
+        self.prefixo = partes.path.rstrip("/")
+        self.timeout = timeout
+        self.conn = None
+
+    def requisitar(self, metodo: str, caminho: str, formulario: Optional[dict] = None,
+                   corpo_json=None) -> Tuple[int, bytes, dict]:
+        headers = {}
+        corpo = None
+        if formulario is not None:
+            corpo = urlencode(formulario).encode("utf-8")
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        elif corpo_json is not None:
+            corpo = json.dumps(corpo_json).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+
+        for tentativa in (1, 2):
+            if self.conn is None:
+                self.conn = self.classe(self.host, timeout=self.timeout)
+            try:
+                self.conn.request(metodo, self.prefixo + caminho, body=corpo, headers=headers)
+                resposta = self.conn.getresponse()
+                dados = resposta.read()
+                return resposta.status, dados, dict(resposta.getheaders())
+            except (OSError, http.client.HTTPException):
+                # O servidor pode ter fechado a conexão ociosa; tenta uma vez com uma nova
+                self.fechar()
+                if tentativa == 2:
+                    raise
+
+    def fechar(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class Contexto:
+    """Estado compartilhado pelos cenários: faixa de ids e produtos criados durante a execução."""
+
+    def __init__(self, menor_id: int, maior_id: int, usuarios: int, semente: int, quentes: int = 10):
+        self.menor_id = menor_id
+        self.maior_id = maior_id
+        self.usuarios = usuarios
+        self.semente = semente
+        # Produtos disputados pelos cenários de estoque: os `quentes` primeiros ids
+        self.quentes = list(range(menor_id, min(menor_id + quentes, maior_id + 1)))
+        self.criados: List[int] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def rng(self) -> random.Random:
+        rng = getattr(self._local, "rng", None)
+        if rng is None:
+            rng = self._local.rng = random.Random(f"{self.semente}-{threading.get_ident()}")
+        return rng
+
+    def id_aleatorio(self) -> int:
+        return self.rng.randint(self.menor_id, self.maior_id)
+
+    @property
+    def local(self) -> threading.local:
+        """Estado da thread, para cenários que dependem da resposta anterior."""
+        return self._local
+
+    def proximo_criado(self) -> Optional[int]:
+        with self._lock:
+            return self.criados.pop() if self.criados else None
+
+
+def _formulario_produto(ctx: Contexto) -> dict:
+    rng = ctx.rng
+    return {
+        "nome": " ".join(rng.choice(PALAVRAS) for _ in range(3)).capitalize(),
+        "descricao": " ".join(rng.choice(PALAVRAS) for _ in range(10)),
+        "preco": f"{rng.uniform(1, 500):.2f}",
+        "estoque": str(rng.randint(0, 100)),
+    }
+
+
+def _deletar(ctx: Contexto) -> Requisicao:
+    id = ctx.proximo_criado()
+    # Sem produtos criados pela execução, mede o caminho do "não encontrado"
+    return "POST", f"/produtos/{id if id is not None else 0}/deletar", None
+
+
+def _reservar_ou_liberar(ctx: Contexto) -> Requisicao:
+    # Cada cliente reserva alguns produtos quentes e, na requisição seguinte,
+    # devolve o que conseguiu reservar: o estoque fica estável e os clientes
+    # disputam as mesmas linhas
+    reservado = getattr(ctx.local, "reservado", None)
+    if reservado:
+        ctx.local.reservado = None
+        return "POST", "/estoque/liberar", CorpoJson(itens=reservado)
+    ids = ctx.rng.sample(ctx.quentes, min(len(ctx.quentes), ctx.rng.randint(2, 4)))
+    return "POST", "/estoque/reservar", CorpoJson(itens=[{"id": id, "quantidade": 1} for id in sorted(ids)])
+
+
+def _reserva_respondida(ctx: Contexto, requisicao: Requisicao, status: int, corpo: bytes):
+    if requisicao[1] == "/estoque/reservar" and status == 200:
+        ctx.local.reservado = requisicao[2]["itens"]
+
+
+# Páginas seguidas de uma mesma busca antes de trocar de termo
+PAGINAS_BUSCA = 10
+
+
+def _buscar_paginando(ctx: Contexto) -> Requisicao:
+    # Cada cliente segue o cursor `proximo` de uma busca de duas palavras por
+    # até PAGINAS_BUSCA páginas, medindo também as páginas fundas
+    busca = getattr(ctx.local, "busca", None)
+    if busca is None:
+        busca = ctx.local.busca = {"q": " ".join(ctx.rng.sample(PALAVRAS, 2)), "apos": None, "pagina": 0}
+    parametros = {"q": busca["q"], "limite": 20}
+    if busca["apos"]:
+        parametros["apos"] = busca["apos"]
+    return "GET", "/api/v1/produtos/buscar?" + urlencode(parametros), None
+
+
+def _busca_respondida(ctx: Contexto, requisicao: Requisicao, status: int, corpo: bytes):
+    busca = ctx.local.busca
+    proximo = json.loads(corpo).get("proximo") if status == 200 else None
+    busca["pagina"] += 1
+    if proximo and busca["pagina"] < PAGINAS_BUSCA:
+        busca["apos"] = proximo
+    else:
+        ctx.local.busca = None
+
+
+# Cada cenário gera a próxima requisição a partir do contexto
+CENARIOS: Dict[str, Callable[[Contexto], Requisicao]] = {
+    "produtos_listar": lambda ctx: (
+        "GET", "/produtos/?" + urlencode({"ordenar": ctx.rng.choice(("id", "nome", "preco")), "limite": 20}), None
+    ),
+    "produtos_detalhe": lambda ctx: ("GET", f"/produtos/{ctx.id_aleatorio()}", None),
+    "produtos_buscar": lambda ctx: ("GET", "/produtos/buscar?" + urlencode({"q": ctx.rng.choice(PALAVRAS)}), None),
+    "api_produtos_buscar": _buscar_paginando,
+    "api_produtos_listar": lambda ctx: ("GET", "/api/v1/produtos?limite=50", None),
+    "api_produto_detalhe": lambda ctx: ("GET", f"/api/v1/produtos/{ctx.id_aleatorio()}", None),
+    "produtos_criar": lambda ctx: ("POST", "/produtos/cadastrar", _formulario_produto(ctx)),
+    "produtos_editar": lambda ctx: ("POST", f"/produtos/{ctx.id_aleatorio()}/editar", _formulario_produto(ctx)),
+    "produtos_deletar": _deletar,
+    "estoque_ajustar": lambda ctx: (
+        "POST", f"/estoque/{ctx.rng.choice(ctx.quentes)}", CorpoJson(delta=ctx.rng.choice((-1, 1)))
+    ),
+    "estoque_reservar": _reservar_ou_liberar,
+    "usuarios_listar": lambda ctx: ("GET", "/usuarios/", None),
+    "usuarios_criar": lambda ctx: ("POST", "/usuarios/cadastrar", {
+        "nome": "Usuário de carga",
+        "email": f"carga-{uuid.uuid4().hex[:12]}@bench.local",
+        "senha": SENHA_BENCH,
+    }),
+    "login": lambda ctx: ("POST", "/login", {
+        "email": f"usuario{ctx.rng.randrange(max(ctx.usuarios, 1))}@bench.local",
+        "senha": SENHA_BENCH,
+    }),
+}
+
+# Chamados com a resposta de cada requisição do cenário
+RETORNOS: Dict[str, Callable[[Contexto, Requisicao, int, bytes], None]] = {
+    "estoque_reservar": _reserva_respondida,
+    "api_produtos_buscar": _busca_respondida,
+}
+
+# Estoque dos produtos quentes no início dos cenários de estoque: baixo o
+# bastante para que a concorrência produza conflitos (409)
+ESTOQUE_QUENTE = 5
+
+# login só entra quando há usuários de benchmark (--usuarios)
+PADRAO = [
+    "produtos_listar", "produtos_detalhe", "produtos_buscar", "api_produtos_buscar", "api_produtos_listar",
+    "api_produto_detalhe", "produtos_criar", "produtos_editar", "produtos_deletar", "estoque_ajustar", "estoque_reservar",
+    "usuarios_listar", "usuarios_criar", "misto_cadastros",
+]
+
+
+def _sucesso(status: int) -> bool:
+    # Os formulários respondem com 303 após gravar
+    return 200 <= status < 400
+
+
+# Respostas do controle de admissão (admissao.py): medi-las mede recusas, não a aplicação
+RECUSAS = ("429", "503")
+
+
+def _faixa_ids(cliente: Cliente) -> Tuple[int, int]:
+    ids = []
+    for direcao in ("asc", "desc"):
+        status, corpo, _ = cliente.requisitar("GET", f"/api/v1/produtos?ordenar=id&direcao={direcao}&limite=1")
+        produtos = json.loads(corpo)["produtos"] if status == 200 else []
+        if not produtos:
+            raise RuntimeError("Nenhum produto cadastrado; rode `python cli.py bench popular` antes da carga")
+        ids.append(produtos[0]["id"])
+    return ids[0], ids[1]
+
+
+_METRICA = re.compile(r'^(http_consultas_db|http_tempo_db_segundos)_(sum|count)\{rota="([^"]*)"\} (\S+)$')
+
+
+def _metricas_servidor(cliente: Cliente) -> Optional[dict]:
+    """Totais de consultas e tempo de banco lidos do /metrics (None se indisponível)."""
+    try:
+        status, corpo, _ = cliente.requisitar("GET", "/metrics")
+    except (OSError, http.client.HTTPException):
+        return None
+    if status != 200:
+        return None
+    totais = Counter()
+    for linha in corpo.decode("utf-8").splitlines():
+        encontrada = _METRICA.match(linha)
+        if encontrada and encontrada.group(3) != "/metrics":
+            totais[f"{encontrada.group(1)}_{encontrada.group(2)}"] += float(encontrada.group(4))
+    return totais
+
+
+def _requisitar(cliente: Cliente, gerar: Callable[[Contexto], Requisicao],
+                retorno: Optional[Callable], ctx: Contexto) -> Tuple[float, int]:
+    requisicao = gerar(ctx)
+    metodo, caminho, corpo = requisicao
+    formulario, corpo_json = (None, corpo) if isinstance(corpo, CorpoJson) else (corpo, None)
+    inicio = time.perf_counter()
+    try:
+        status, dados, _ = cliente.requisitar(metodo, caminho, formulario, corpo_json)
+    except (OSError, http.client.HTTPException):
+        status, dados = 0, b""
+    duracao = time.perf_counter() - inicio
+    if retorno is not None:
+        retorno(ctx, requisicao, status, dados)
+    return duracao, status
+
+
+def _relatorio(nome: str, resultados: List[Tuple[float, int]], total: float, concorrencia: int) -> dict:
+    requisicoes = len(resultados)
+    duracoes = [d for d, _ in resultados]
+    status = Counter(str(s) for _, s in resultados)
+    tempos = resumo(duracoes)
+    relatorio = {
+        "requisicoes": requisicoes,
+        "concorrencia": concorrencia,
+        "erros": sum(n for s, n in status.items() if not _sucesso(int(s))),
+        "recusadas": sum(status[s] for s in RECUSAS),
+        # Conflitos de estoque ou de versão: nos cenários de estoque, medem a disputa pelas mesmas linhas
+        "conflitos_409": status["409"],
+        "taxa_conflito": round(status["409"] / requisicoes, 4) if requisicoes else 0.0,
+        "status": dict(sorted(status.items())),
+        "duracao_s": round(total, 3),
+        "throughput_rps": round(requisicoes / total, 1) if total else 0.0,
+        "p50_ms": tempos["p50"],
+        "p95_ms": tempos["p95"],
+        "p99_ms": tempos["p99"],
+        "max_ms": tempos["max"],
+    }
+    if relatorio["recusadas"]:
+        logger.warning(
+            f"Cenário {nome}: {relatorio['recusadas']} de {requisicoes} respostas 429/503; os tempos não "
+            "medem a aplicação. Rode-a com ADMISSAO_ATIVA=false ou limites maiores (ADMISSAO_LIMITES)"
+        )
+    return relatorio
+
+
+def executar_cenario(url: str, nome: str, ctx: Contexto, requisicoes: int,
+                     concorrencia: int, aquecimento: int = 0) -> dict:
+    gerar = CENARIOS[nome]
+    retorno = RETORNOS.get(nome)
+    locais = threading.local()
+    clientes = []
+    clientes_lock = threading.Lock()
+
+    def cliente() -> Cliente:
+        atual = getattr(locais, "cliente", None)
+        if atual is None:
+            atual = locais.cliente = Cliente(url)
+            with clientes_lock:
+                clientes.append(atual)
+        return atual
+
+    def executar(_) -> Tuple[float, int]:
+        return _requisitar(cliente(), gerar, retorno, ctx)
+
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        list(executor.map(executar, range(aquecimento)))
+
+        observador = Cliente(url)
+        antes = _metricas_servidor(observador)
+        inicio = time.perf_counter()
+        resultados = list(executor.map(executar, range(requisicoes)))
+        total = time.perf_counter() - inicio
+        depois = _metricas_servidor(observador)
+        observador.fechar()
+
+    for c in clientes:
+        c.fechar()
+
+    relatorio = _relatorio(nome, resultados, total, concorrencia)
+    if antes is not None and depois is not None:
+        # Só é exato com um worker: o /metrics mostra os números do processo que atendeu
+        contagem = depois["http_consultas_db_count"] - antes["http_consultas_db_count"]
+        if contagem > 0:
+            relatorio["consultas_db_por_req"] = round(
+                (depois["http_consultas_db_sum"] - antes["http_consultas_db_sum"]) / contagem, 2
+            )
+            relatorio["tempo_db_ms_por_req"] = round(
+                (depois["http_tempo_db_segundos_sum"] - antes["http_tempo_db_segundos_sum"]) / contagem * 1000, 3
+            )
+    return relatorio
+
+
+class CargaDeFundo:
+    """Enquanto ativa, `concorrencia` clientes repetem o cenário `nome` sem parar."""
+
+    def __init__(self, url: str, nome: str, ctx: Contexto, concorrencia: int):
+        self.url = url
+        self.nome = nome
+        self.ctx = ctx
+        self.concorrencia = concorrencia
+        self.resultados: List[Tuple[float, int]] = []
+        self._parar = threading.Event()
+        self._threads = []
+        self._inicio = self._total = 0.0
+
+    def _repetir(self):
+        cliente = Cliente(self.url)
+        gerar, retorno = CENARIOS[self.nome], RETORNOS.get(self.nome)
+        try:
+            while not self._parar.is_set():
+                # list.append é atômico; não precisa de lock
+                self.resultados.append(_requisitar(cliente, gerar, retorno, self.ctx))
+        finally:
+            cliente.fechar()
+
+    def __enter__(self) -> "CargaDeFundo":
+        self._inicio = time.perf_counter()
+        self._threads = [threading.Thread(target=self._repetir, daemon=True) for _ in range(self.concorrencia)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        for thread in self._threads:
+            thread.join()
+        self._total = time.perf_counter() - self._inicio
+
+    def relatorio(self) -> dict:
+        return _relatorio(self.nome, self.resultados, self._total, self.concorrencia)
+
+
+# Cenários compostos: (cenário de fundo, cenários medidos sozinhos e durante o fundo)
+MISTOS: Dict[str, Tuple[str, List[str]]] = {
+    # Cadastros calculam bcrypt no pool de processos: as outras rotas não devem sentir
+    "misto_cadastros": ("usuarios_criar", ["produtos_listar", "api_produto_detalhe"]),
+}
+
+
+def executar_misto(url: str, nome: str, ctx: Contexto, requisicoes: int,
+                   concorrencia: int, aquecimento: int = 0) -> Dict[str, dict]:
+    """
+    Mede cada cenário de MISTOS[nome] sozinho (linha de base) e de novo
+    durante uma rajada contínua do cenário de fundo com `concorrencia`
+    clientes. As medições usam poucos clientes (um quarto da concorrência),
+    para observar a latência sem saturar o servidor por conta própria.
+
+    Retorna uma entrada `nome:cenário` por cenário medido, com o p95 durante a
+    rajada (`p95_ms`, usado por `bench comparar`), o da linha de base e a
+    variação, e uma entrada para a própria rajada.
+    """
+    fundo, medidos = MISTOS[nome]
+    amostragem = max(1, concorrencia // 4)
+    base = {medido: executar_cenario(url, medido, ctx, requisicoes, amostragem, aquecimento) for medido in medidos}
+
+    resultados = {}
+    with CargaDeFundo(url, fundo, ctx, concorrencia) as rajada:
+        for medido in medidos:
+            relatorio = executar_cenario(url, medido, ctx, requisicoes, amostragem, aquecimento)
+            # Os totais do /metrics incluem as requisições da rajada
+            relatorio.pop("consultas_db_por_req", None)
+            relatorio.pop("tempo_db_ms_por_req", None)
+            relatorio["p95_base_ms"] = base[medido]["p95_ms"]
+            relatorio["variacao_p95"] = (
+                round(relatorio["p95_ms"] / base[medido]["p95_ms"] - 1, 3) if base[medido]["p95_ms"] else 0.0
+            )
+            resultados[f"{nome}:{medido}"] = relatorio
+    resultados[f"{nome}:{fundo}"] = rajada.relatorio()
+    return resultados
+
+
+def _preparar_delecoes(url: str, ctx: Contexto, quantidade: int):
+    """Cria pela API os produtos que o cenário produtos_deletar vai remover (fora da medição)."""
+    cliente = Cliente(url)
+    for _ in range(quantidade):
+        formulario = _formulario_produto(ctx)
+        status, _, headers = cliente.requisitar("POST", "/api/v1/produtos", corpo_json={
+            "nome": formulario["nome"], "descricao": formulario["descricao"],
+            "preco": float(formulario["preco"]), "estoque": int(formulario["estoque"]),
+        })
+        if status == 201:
+            ctx.criados.append(int(headers["location"].rsplit("/", 1)[-1]))
+    cliente.fechar()
+
+
+def _preparar_estoque(url: str, ctx: Contexto):
+    """Leva o estoque dos produtos quentes a ESTOQUE_QUENTE (fora da medição), para execuções comparáveis."""
+    cliente = Cliente(url)
+    for id in ctx.quentes:
+        status, corpo, _ = cliente.requisitar("GET", f"/api/v1/produtos/{id}")
+        if status != 200:
+            raise RuntimeError(f"Produto quente {id} não encontrado; rode `python cli.py bench popular`")
+        delta = ESTOQUE_QUENTE - json.loads(corpo)["estoque"]
+        if delta:
+            cliente.requisitar("POST", f"/estoque/{id}", corpo_json={"delta": delta})
+    cliente.fechar()
+
+
+def executar_carga(url: str, cenarios: List[str], requisicoes: int, concorrencia: int,
+                   aquecimento: int = 20, usuarios: int = 0, semente: int = 42, quentes: int = 10) -> dict:
+    """Executa os cenários em sequência contra uma aplicação já em execução em `url`."""
+    desconhecidos = set(cenarios) - set(CENARIOS) - set(MISTOS)
+    if desconhecidos:
+        raise ValueError(f"Cenários desconhecidos: {', '.join(sorted(desconhecidos))}")
+    if "login" in cenarios and usuarios <= 0:
+        raise ValueError("O cenário login precisa de --usuarios (os usuários criados por bench popular)")
+
+    cliente = Cliente(url)
+    menor_id, maior_id = _faixa_ids(cliente)
+    cliente.fechar()
+    ctx = Contexto(menor_id, maior_id, usuarios, semente, quentes)
+
+    resultados = {}
+    for nome in cenarios:
+        if nome == "produtos_deletar":
+            _preparar_delecoes(url, ctx, requisicoes + aquecimento)
+        if nome.startswith("estoque_"):
+            _preparar_estoque(url, ctx)
+        logger.info(f"Cenário {nome}: {requisicoes} requisições, concorrência {concorrencia}")
+        if nome in MISTOS:
+            resultados.update(executar_misto(url, nome, ctx, requisicoes, concorrencia, aquecimento))
+        else:
+            resultados[nome] = executar_cenario(url, nome, ctx, requisicoes, concorrencia, aquecimento)
+    return resultados
+
+
+def executar_varredura(url: str, cenarios: List[str], requisicoes: int, concorrencias: List[int],
+                       **kwargs) -> Tuple[Dict[str, dict], Dict[str, List[dict]]]:
+    """
+    Executa os cenários em cada nível de concorrência, em ordem. Retorna os
+    resultados por `cenário@concorrência` (comparáveis por `bench comparar`) e
+    a curva de escalonamento de cada cenário: vazão, p95 e a vazão relativa à
+    do primeiro nível. Com um único worker, a vazão deve crescer com a
+    concorrência até o limite do pool do banco.
+    """
+    resultados = {}
+    pontos: Dict[str, List[Tuple[int, dict]]] = {}
+    for concorrencia in concorrencias:
+        for nome, relatorio in executar_carga(url, cenarios, requisicoes, concorrencia, **kwargs).items():
+            resultados[f"{nome}@{concorrencia}"] = relatorio
+            pontos.setdefault(nome, []).append((concorrencia, relatorio))
+
+    curvas = {}
+    for nome, medicoes in pontos.items():
+        base = medicoes[0][1]["throughput_rps"]
+        curvas[nome] = [{
+            "concorrencia": concorrencia,
+            "throughput_rps": relatorio["throughput_rps"],
+            "p95_ms": relatorio["p95_ms"],
+            "escala": round(relatorio["throughput_rps"] / base, 2) if base else None,
+        } for concorrencia, relatorio in medicoes]
+    return resultados, curvas
@@ -0,0 +1,87 @@
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+from typing import List
+
+
+def percentil(ordenadas: List[float], p: float) -> float:
+    """Percentil pelo método do posto mais próximo; `ordenadas` já deve estar em ordem."""
+    if not ordenadas:
+        return 0.0
+    posicao = max(0, math.ceil(p / 100 * len(ordenadas)) - 1)
+    return ordenadas[posicao]
+
+
+def resumo(duracoes: List[float], escala: float = 1000.0) -> dict:
+    """p50/p95/p99/máximo das durações (em segundos), convertidas por `escala` (padrão: ms)."""
+    ordenadas = sorted(duracoes)
+    return {
+        "p50": round(percentil(ordenadas, 50) * escala, 3),
+        "p95": round(percentil(ordenadas, 95) * escala, 3),
+        "p99": round(percentil(ordenadas, 99) * escala, 3),
+        "max": round((ordenadas[-1] if ordenadas else 0.0) * escala, 3),
+    }
+
+
+def _commit_atual() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def metadados(**parametros) -> dict:
+    return {
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit_atual(),
+        "python": sys.version.split()[0],
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "parametros": parametros,
+    }
+
+
+def gravar(resultado: dict, caminho: str = None):
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2)
+    if caminho:
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto + "\n")
+    else:
+        sys.stdout.write(texto + "\n")
+
+
+def comparar(antes: dict, depois: dict, limiar: float) -> tuple:
+    """
+    Compara os p95 (e a vazão, na carga) de duas execuções. Retorna as linhas
+    do relatório e se alguma medição piorou mais que `limiar` (fração). Um
+    cenário com respostas 429/503 em qualquer das execuções não é comparável
+    e também conta como falha.
+    """
+    linhas = []
+    regressao = False
+    for secao, metrica in (("carga", "p95_ms"), ("micro", "p95_us")):
+        for nome, atual in sorted(depois.get(secao, {}).items()):
+            anterior = antes.get(secao, {}).get(nome)
+            if not anterior or not anterior.get(metrica):
+                continue
+            if anterior.get("recusadas") or atual.get("recusadas"):
+                regressao = True
+                linhas.append(
+                    f"{secao:5} {nome:28} INVÁLIDO: respostas 429/503 "
+                    f"({anterior.get('recusadas', 0)} -> {atual.get('recusadas', 0)})"
+                )
+                continue
+            variacao = atual[metrica] / anterior[metrica] - 1
+            piorou = variacao > limiar
+            regressao = regressao or piorou
+            linhas.append(
+                f"{secao:5} {nome:28} {metrica} {anterior[metrica]:>10.3f} -> {atual[metrica]:>10.3f} "
+                f"({variacao:+.1%}){'  REGRESSÃO' if piorou else ''}"
+            )
+    return linhas, regressao
@@ -0,0 +1,223 @@
+import gc
+import logging
+import random
+import time
+import tracemalloc
+from datetime import datetime
+from decimal import Decimal
+from typing import Callable, Dict, Optional
+
+from benchmarks.estatisticas import resumo
+from benchmarks.semente import PALAVRAS
+
+logger = logging.getLogger(__name__)
+
+LINHAS_LOTE = 100_000
+
+
+def medir(func: Callable[[], object], repeticoes: int, preparar: Optional[Callable[[], object]] = None,
+          amostras_memoria: int = 200) -> dict:
+    """
+    Mede `func` chamada `repeticoes` vezes. `preparar` roda antes de cada
+    chamada, fora da medição (ex.: invalidar o cache). A memória é medida
+    numa rodada separada, já que o tracemalloc deixa as chamadas mais lentas.
+    """
+    for _ in range(min(repeticoes, 50)):
+        if preparar:
+            preparar()
+        func()
+
+    duracoes = []
+    gc_ativo = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeticoes):
+            if preparar:
+                preparar()
+            inicio = time.perf_counter()
+            func()
+            duracoes.append(time.perf_counter() - inicio)
+    finally:
+        if gc_ativo:
+            gc.enable()
+
+    amostras = min(repeticoes, amostras_memoria)
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        pico = 0
+        for _ in range(amostras):
+            if preparar:
+                preparar()
+            atual = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            func()
+            pico = max(pico, tracemalloc.get_traced_memory()[1] - atual)
+        retido = tracemalloc.get_traced_memory()[0] - base
+    finally:
+        tracemalloc.stop()
+
+    tempos = resumo(duracoes, escala=1_000_000)
+    total = sum(duracoes)
+    return {
+        "repeticoes": repeticoes,
+        "ops_por_s": round(repeticoes / total, 1) if total else 0.0,
+        "p50_us": tempos["p50"],
+        "p95_us": tempos["p95"],
+        "p99_us": tempos["p99"],
+        "max_us": tempos["max"],
+        # Pico de memória alocada durante uma chamada e o que sobra alocado depois dela
+        "pico_bytes_por_op": pico,
+        "retido_bytes_por_op": round(retido / amostras) if amostras else 0,
+    }
+
+
+def _produto_exemplo(rng: random.Random, id: int) -> dict:
+    agora = datetime(2024, 1, 1, 12, 0, 0)
+    return {
+        "id": id,
+        "nome": " ".join(rng.choice(PALAVRAS) for _ in range(3)).capitalize(),
+        "descricao": " ".join(rng.choice(PALAVRAS) for _ in range(12)),
+        "preco": Decimal(f"{rng.uniform(1, 2000):.2f}"),
+        "estoque": rng.randint(0, 500),
+        "versao": rng.randint(0, 5),
+        "created_at": agora,
+        "updated_at": agora,
+    }
+
+
+def _request_falso():
+    """Request mínima para renderizar templates que usam url_for."""
+    from starlette.requests import Request
+    from main import app
+
+    return Request({
+        "type": "http", "method": "GET", "path": "/produtos/", "root_path": "", "scheme": "http",
+        "server": ("bench", 80), "headers": [], "query_string": b"", "app": app, "router": app.router,
+    })
+
+
+def casos_sem_banco(semente: int = 42) -> Dict[str, dict]:
+    """Validações, serialização e templates, sem acesso ao banco."""
+    from controllers.api_controller import RespostaJSON
+    from controllers.usuario_controller import validar_usuario
+    from models.cache import Cache, MemoryCacheBackend
+    from models.produto_model import Produto, ProdutoCreate, decode_cursor, encode_cursor, termo_busca_booleano
+    from templating import fragmento_cache, templates
+    from validators.produto_validator import validador_produto, validador_produto_importacao
+
+    rng = random.Random(semente)
+    produtos = [_produto_exemplo(rng, id) for id in range(1, 51)]
+    formulario = {"nome": "Café torrado premium", "descricao": "Pacote de 500 g", "preco": "29.90", "estoque": "15"}
+    # Linhas como vêm de um CSV de importação, 1 em cada 20 inválida
+    linhas_importacao = [
+        (numero, {
+            "nome": " ".join(rng.choice(PALAVRAS) for _ in range(3)),
+            "descricao": " ".join(rng.choice(PALAVRAS) for _ in range(8)),
+            "preco": f"{rng.uniform(1, 2000):.2f}" if numero % 20 else "-1",
+            "estoque": str(rng.randint(0, 500)),
+            "id": "" if numero % 3 else str(numero),
+        })
+        for numero in range(1, LINHAS_LOTE + 1)
+    ]
+    cursor = encode_cursor(produtos[0], "preco")
+    pagina = {"produtos": produtos, "proximo": cursor, "anterior": None}
+    cache = Cache(MemoryCacheBackend(1000), ttl=60)
+    cache.set("produto:1", produtos[0])
+    lista = templates.get_template("produtos/lista.html")
+    contexto = {
+        "request": _request_falso(), "produtos": produtos, "messages": [],
+        "filtros": {"ordenar": "id", "direcao": "asc", "limite": 50, "preco_min": "", "preco_max": "",
+                    "em_estoque": False},
+    }
+
+    return {
+        "produto_create_validar": {"func": lambda: ProdutoCreate(**formulario)},
+        "validador_produto_registro": {"func": lambda: validador_produto.validar(formulario)},
+        "validador_produto_lote_100k": {
+            "func": lambda: validador_produto_importacao.validar_lote(linhas_importacao),
+            "linhas": LINHAS_LOTE, "repeticoes_max": 5,
+        },
+        "produto_serializar_pagina": {"func": lambda: [Produto(**p) for p in produtos]},
+        "usuario_validar_formulario": {"func": lambda: validar_usuario("Maria Silva", "maria@exemplo.com", "segredo123")},
+        "cursor_codificar": {"func": lambda: encode_cursor(produtos[0], "preco")},
+        "cursor_decodificar": {"func": lambda: decode_cursor(cursor)},
+        "termo_busca_booleano": {"func": lambda: termo_busca_booleano("café torrado em grãos premium")},
+        "json_pagina_produtos": {"func": lambda: RespostaJSON(pagina)},
+        "cache_memoria_hit": {"func": lambda: cache.get_or_load("produto:1", lambda: produtos[0])},
+        "template_lista_fragmentos_frios": {"func": lambda: lista.render(contexto), "preparar": fragmento_cache.clear},
+        "template_lista_fragmentos_quentes": {"func": lambda: lista.render(contexto)},
+    }
+
+
+def casos_com_banco(db, semente: int = 42) -> Dict[str, dict]:
+    """Funções do model contra o banco, com e sem o cache de produtos."""
+    from models.produto_model import (
+        buscar_produtos, get_produto_by_id, invalidar_cache_produto, listar_produtos_pagina
+    )
+
+    cursor = db.cursor()
+    cursor.execute("SELECT MIN(id), MAX(id) FROM produtos")
+    menor, maior = cursor.fetchone()
+    cursor.close()
+    if menor is None:
+        raise RuntimeError("Nenhum produto cadastrado; rode `python cli.py bench popular` antes")
+
+    rng = random.Random(semente)
+    ids = [rng.randint(menor, maior) for _ in range(1000)]
+    atual = {"id": ids[0]}
+
+    def sortear_e_invalidar():
+        atual["id"] = rng.choice(ids)
+        invalidar_cache_produto(atual["id"])
+
+    busca = {"q": "", "apos": None}
+
+    def avancar_busca(paginas: int = 5):
+        # Cursor da quinta página de uma busca de duas palavras, sem cache para a página medida
+        busca["q"], busca["apos"] = " ".join(rng.sample(PALAVRAS, 2)), None
+        invalidar_cache_produto()
+        for _ in range(paginas - 1):
+            proximo = buscar_produtos(busca["q"], db, apos=busca["apos"])["proximo"]
+            if proximo is None:
+                break
+            busca["apos"] = proximo
+
+    return {
+        "get_produto_by_id_cache_miss": {
+            "func": lambda: get_produto_by_id(atual["id"], db),
+            "preparar": sortear_e_invalidar,
+        },
+        "get_produto_by_id_cache_hit": {"func": lambda: get_produto_by_id(ids[0], db)},
+        "listar_produtos_pagina_preco": {
+            "func": lambda: listar_produtos_pagina(db, ordenar_por="preco", limite=20),
+            "preparar": invalidar_cache_produto,
+        },
+        "buscar_produtos": {
+            "func": lambda: buscar_produtos(rng.choice(PALAVRAS), db),
+            "preparar": invalidar_cache_produto,
+        },
+        "buscar_produtos_pagina_5": {
+            "func": lambda: buscar_produtos(busca["q"], db, apos=busca["apos"]),
+            "preparar": avancar_busca,
+        },
+    }
+
+
+def executar_micro(repeticoes: int, db=None, filtro: Optional[str] = None, semente: int = 42) -> dict:
+    casos = casos_sem_banco(semente)
+    if db is not None:
+        casos.update(casos_com_banco(db, semente))
+
+    resultados = {}
+    for nome, caso in casos.items():
+        if filtro and filtro not in nome:
+            continue
+        # Casos que processam um lote inteiro por chamada rodam menos vezes
+        vezes = min(repeticoes, caso.get("repeticoes_max", repeticoes))
+        logger.info(f"Micro-benchmark {nome}: {vezes} repetições")
+        resultados[nome] = medir(caso["func"], vezes, caso.get("preparar"), amostras_memoria=min(vezes, 200))
+        if "linhas" in caso:
+            resultados[nome]["linhas_por_s"] = round(resultados[nome]["ops_por_s"] * caso["linhas"])
+    return resultados
@@ -0,0 +1,70 @@
+import logging
+import random
+
+import mysql.connector
+
+from models.produto_model import invalidar_cache_produto
+from models.senha import gerar_hash
+
+logger = logging.getLogger(__name__)
+
+PALAVRAS = (
+    "café", "arroz", "feijão", "açúcar", "leite", "queijo", "manteiga", "pão", "farinha", "óleo",
+    "sabonete", "shampoo", "detergente", "esponja", "caderno", "caneta", "lápis", "borracha",
+    "cabo", "carregador", "fone", "teclado", "mouse", "monitor", "cadeira", "mesa", "lâmpada",
+    "orgânico", "integral", "premium", "econômico", "grande", "pequeno", "azul", "verde", "preto",
+)
+SENHA_BENCH = "benchmark123"
+
+
+def _nome(rng: random.Random) -> str:
+    return " ".join(rng.choice(PALAVRAS) for _ in range(rng.randint(2, 4))).capitalize()
+
+
+def popular(db: mysql.connector.MySQLConnection, produtos: int, usuarios: int,
+            semente: int = 42, lote: int = 1000, limpar: bool = False) -> dict:
+    """
+    Popula o banco com um catálogo sintético e reprodutível (mesma `semente`,
+    mesmos dados). Todos os usuários recebem a senha SENHA_BENCH.
+    """
+    rng = random.Random(semente)
+    cursor = db.cursor()
+    if limpar:
+        cursor.execute("DELETE FROM produtos")
+        cursor.execute("DELETE FROM usuarios WHERE email LIKE %s", ("%@bench.local",))
+        db.commit()
+
+    linhas = []
+    for _ in range(produtos):
+        linhas.append((
+            _nome(rng),
+            " ".join(rng.choice(PALAVRAS) for _ in range(rng.randint(5, 20))),
+            round(rng.uniform(0.5, 2000), 2),
+            rng.choice((0, 0, 1, 5, 10, 50, 100, 500)),
+        ))
+        if len(linhas) >= lote:
+            cursor.executemany(
+                "INSERT INTO produtos (nome, descricao, preco, estoque) VALUES (%s, %s, %s, %s)", linhas
+            )
+            db.commit()
+            linhas = []
+    if linhas:
+        cursor.executemany("INSERT INTO produtos (nome, descricao, preco, estoque) VALUES (%s, %s, %s, %s)", linhas)
+        db.commit()
+
+    # Um único hash para todos: calcular bcrypt por usuário dominaria o tempo da carga
+    senha_hash = gerar_hash(SENHA_BENCH)
+    for inicio in range(0, usuarios, lote):
+        cursor.executemany(
+            "INSERT IGNORE INTO usuarios (nome, email, senha) VALUES (%s, %s, %s)",
+            [(f"Usuário {i}", f"usuario{i}@bench.local", senha_hash)
+             for i in range(inicio, min(inicio + lote, usuarios))]
+        )
+        db.commit()
+
+    cursor.execute("SELECT COUNT(*), MIN(id), MAX(id) FROM produtos")
+    total, menor, maior = cursor.fetchone()
+    cursor.close()
+    invalidar_cache_produto()
+    logger.info(f"Banco populado: {total} produtos, {usuarios} usuários de benchmark")
+    return {"produtos": total, "menor_id": menor, "maior_id": maior, "usuarios": usuarios}
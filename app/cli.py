@@ -0,0 +1,287 @@
+"""
+Comandos de manutenção do sistema.
+
+Uso (a partir do diretório app/):
+    python cli.py logs retencao
+    python cli.py logs consultar --de 2024-01-01 --ate 2024-04-01 --tabela produtos
+    python cli.py produtos importar catalogo.csv
+    python cli.py produtos exportar --formato jsonl > catalogo.jsonl
+    python cli.py eventos limpar --dias 7
+    python cli.py expurgo executar --ignorar-janela
+    python cli.py expurgo status
+    python cli.py bench popular --produtos 100000 --usuarios 1000
+    python cli.py bench carga --url http://127.0.0.1:8000 --concorrencia 16 --saida carga.json
+    python cli.py bench carga --cenarios api_produto_detalhe --concorrencia 1,4,16,64 --saida escala.json
+    python cli.py bench micro --sem-banco --saida micro.json
+    python cli.py bench comparar antes.json depois.json --limiar 0.10
+"""
+import argparse
+import json
+import logging
+import sys
+from datetime import datetime
+
+from benchmarks.carga import CENARIOS, MISTOS, PADRAO, executar_carga, executar_varredura
+from benchmarks.estatisticas import comparar, gravar, metadados
+from benchmarks.micro import executar_micro
+from benchmarks.semente import popular
+from config import Config
+from models.database import get_connection
+from models.eventos_model import limpar_eventos
+from models.exclusao import executar_expurgo, pendentes_expurgo
+from models.log_model import json_default
+from models.log_retention import executar_retencao, garantir_particoes, ler_arquivo
+from models.log_model import registrar_log
+from models.log_writer import log_writer
+from models.produto_bulk import exportar_produtos, formato_do_arquivo, importar_produtos, ler_registros
+
+logging.basicConfig(level=logging.INFO)
+
+
+def logs_retencao(args):
+    with get_connection() as conn:
+        resultado = executar_retencao(conn)
+    if not resultado["executado"]:
+        print("Retenção já em execução em outro processo", file=sys.stderr)
+        return 1
+    print(json.dumps(resultado["arquivados"], ensure_ascii=False))
+    return 0
+
+
+def logs_particoes(args):
+    with get_connection() as conn:
+        garantir_particoes(conn, particionar=True)
+    return 0
+
+
+def logs_consultar(args):
+    logs = ler_arquivo(
+        args.diretorio,
+        inicio=datetime.fromisoformat(args.de) if args.de else None,
+        fim=datetime.fromisoformat(args.ate) if args.ate else None,
+        tabela=args.tabela,
+        id_registro=args.registro,
+        id_usuario=args.usuario,
+        tipo_operacao=args.operacao
+    )
+    for log in logs:
+        sys.stdout.write(json.dumps(log, ensure_ascii=False, default=json_default) + "\n")
+    return 0
+
+
+def produtos_importar(args):
+    formato = args.formato or formato_do_arquivo(args.arquivo)
+    with open(args.arquivo, encoding="utf-8-sig", newline="") as arquivo, get_connection() as conn:
+        relatorio = importar_produtos(
+            ler_registros(arquivo, formato), conn, lote=args.lote, transacao=args.transacao
+        )
+    registrar_log("IMPORT", "produtos", dados_novos={
+        "arquivo": args.arquivo,
+        "processados": relatorio["processados"],
+        "gravados": relatorio["gravados"],
+        "erros": relatorio["total_erros"]
+    })
+    log_writer.stop()
+    print(json.dumps(relatorio, ensure_ascii=False, indent=2))
+    return 1 if relatorio["total_erros"] else 0
+
+
+def produtos_exportar(args):
+    with get_connection() as conn:
+        for bloco in exportar_produtos(conn, args.formato):
+            sys.stdout.write(bloco)
+    return 0
+
+
+def eventos_limpar(args):
+    with get_connection() as conn:
+        total = limpar_eventos(conn, dias=args.dias)
+    print(json.dumps({"removidos": total}))
+    return 0
+
+
+def expurgo_executar(args):
+    with get_connection() as conn:
+        resultado = executar_expurgo(conn, janela="" if args.ignorar_janela else Config.EXPURGO_JANELA)
+    if not resultado["executado"]:
+        print(f"Expurgo não executado: {resultado['motivo']}", file=sys.stderr)
+        return 1
+    print(json.dumps(resultado, ensure_ascii=False))
+    return 0
+
+
+def expurgo_status(args):
+    with get_connection() as conn:
+        print(json.dumps(pendentes_expurgo(conn), ensure_ascii=False))
+    return 0
+
+
+def bench_popular(args):
+    with get_connection() as conn:
+        resultado = popular(conn, args.produtos, args.usuarios, semente=args.semente, limpar=args.limpar)
+    print(json.dumps(resultado, ensure_ascii=False))
+    return 0
+
+
+def _concorrencias(valor: str) -> list:
+    try:
+        niveis = [int(parte) for parte in valor.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Concorrência inválida: {valor!r} (use 8 ou 1,4,16,64)")
+    if not niveis or min(niveis) < 1:
+        raise argparse.ArgumentTypeError("A concorrência deve ser ao menos 1")
+    return niveis
+
+
+def bench_carga(args):
+    cenarios = args.cenarios.split(",") if args.cenarios else PADRAO + (["login"] if args.usuarios else [])
+    resultado = metadados(
+        url=args.url, cenarios=cenarios, requisicoes=args.requisicoes,
+        concorrencia=args.concorrencia, aquecimento=args.aquecimento, semente=args.semente, quentes=args.quentes
+    )
+    opcoes = dict(aquecimento=args.aquecimento, usuarios=args.usuarios, semente=args.semente, quentes=args.quentes)
+    if len(args.concorrencia) == 1:
+        resultado["carga"] = executar_carga(args.url, cenarios, args.requisicoes, args.concorrencia[0], **opcoes)
+    else:
+        resultado["carga"], resultado["escalonamento"] = executar_varredura(
+            args.url, cenarios, args.requisicoes, args.concorrencia, **opcoes
+        )
+        for nome, curva in resultado["escalonamento"].items():
+            pontos = "  ".join(f"c={p['concorrencia']}: {p['throughput_rps']} rps (x{p['escala']})" for p in curva)
+            print(f"{nome:40} {pontos}", file=sys.stderr)
+    gravar(resultado, args.saida)
+    recusados = [nome for nome, cenario in resultado["carga"].items() if cenario["recusadas"]]
+    if recusados:
+        print(
+            f"Respostas 429/503 do controle de admissão em: {', '.join(recusados)}. "
+            "Rode a aplicação com ADMISSAO_ATIVA=false para medir a carga",
+            file=sys.stderr
+        )
+        return 1
+    if args.meta_p95 is not None:
+        acima = {nome: c["p95_ms"] for nome, c in resultado["carga"].items() if c["p95_ms"] > args.meta_p95}
+        for nome, p95 in acima.items():
+            print(f"{nome}: p95 de {p95} ms acima da meta de {args.meta_p95} ms", file=sys.stderr)
+        if acima:
+            return 1
+    return 0
+
+
+def bench_micro(args):
+    resultado = metadados(repeticoes=args.repeticoes, banco=not args.sem_banco, filtro=args.filtro)
+    if args.sem_banco:
+        resultado["micro"] = executar_micro(args.repeticoes, filtro=args.filtro, semente=args.semente)
+    else:
+        with get_connection() as conn:
+            resultado["micro"] = executar_micro(args.repeticoes, conn, filtro=args.filtro, semente=args.semente)
+    gravar(resultado, args.saida)
+    return 0
+
+
+def bench_comparar(args):
+    with open(args.antes, encoding="utf-8") as arquivo:
+        antes = json.load(arquivo)
+    with open(args.depois, encoding="utf-8") as arquivo:
+        depois = json.load(arquivo)
+    linhas, regressao = comparar(antes, depois, args.limiar)
+    print("\n".join(linhas))
+    return 1 if regressao else 0
+
+
+def criar_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Comandos de manutenção do sistema")
+    grupos = parser.add_subparsers(dest="grupo", required=True)
+
+    logs = grupos.add_parser("logs", help="Retenção e arquivo de logs").add_subparsers(dest="comando", required=True)
+
+    retencao = logs.add_parser("retencao", help="Arquiva e remove os meses de log expirados")
+    retencao.set_defaults(func=logs_retencao)
+
+    particoes = logs.add_parser("particoes", help="Particiona a tabela de logs e cria as partições futuras")
+    particoes.set_defaults(func=logs_particoes)
+
+    consultar = logs.add_parser("consultar", help="Consulta os logs arquivados (saída em JSONL)")
+    consultar.add_argument("--diretorio", default=Config.LOG_ARQUIVO_DIR)
+    consultar.add_argument("--de", help="Data/hora inicial (ISO 8601, inclusiva)")
+    consultar.add_argument("--ate", help="Data/hora final (ISO 8601, exclusiva)")
+    consultar.add_argument("--tabela")
+    consultar.add_argument("--registro", type=int)
+    consultar.add_argument("--usuario", type=int)
+    consultar.add_argument("--operacao")
+    consultar.set_defaults(func=logs_consultar)
+
+    produtos = grupos.add_parser("produtos", help="Importação e exportação de produtos").add_subparsers(dest="comando", required=True)
+
+    importar = produtos.add_parser("importar", help="Importa produtos de um arquivo CSV ou JSONL")
+    importar.add_argument("arquivo")
+    importar.add_argument("--formato", choices=("csv", "jsonl"))
+    importar.add_argument("--lote", type=int, default=Config.IMPORT_LOTE)
+    importar.add_argument("--transacao", type=int, default=Config.IMPORT_TRANSACAO)
+    importar.set_defaults(func=produtos_importar)
+
+    exportar = produtos.add_parser("exportar", help="Exporta o catálogo para a saída padrão")
+    exportar.add_argument("--formato", choices=("csv", "jsonl"), default="csv")
+    exportar.set_defaults(func=produtos_exportar)
+
+    eventos = grupos.add_parser("eventos", help="Eventos de alteração").add_subparsers(dest="comando", required=True)
+
+    limpar = eventos.add_parser("limpar", help="Remove eventos antigos já lidos pelos consumidores registrados")
+    limpar.add_argument("--dias", type=int, default=Config.EVENTOS_RETENCAO_DIAS)
+    limpar.set_defaults(func=eventos_limpar)
+
+    expurgo = grupos.add_parser("expurgo", help="Expurgo de registros removidos").add_subparsers(dest="comando", required=True)
+
+    executar = expurgo.add_parser("executar", help="Apaga de vez os registros removidos há mais que a carência")
+    executar.add_argument("--ignorar-janela", action="store_true", help="Executa mesmo fora de EXPURGO_JANELA")
+    executar.set_defaults(func=expurgo_executar)
+
+    status = expurgo.add_parser("status", help="Registros removidos aguardando o expurgo, por tabela")
+    status.set_defaults(func=expurgo_status)
+
+    bench = grupos.add_parser("bench", help="Benchmarks de carga e micro-benchmarks").add_subparsers(dest="comando", required=True)
+
+    semente = bench.add_parser("popular", help="Popula o banco com produtos e usuários sintéticos")
+    semente.add_argument("--produtos", type=int, default=10000)
+    semente.add_argument("--usuarios", type=int, default=100)
+    semente.add_argument("--semente", type=int, default=42)
+    semente.add_argument("--limpar", action="store_true", help="Apaga os produtos e usuários de benchmark antes")
+    semente.set_defaults(func=bench_popular)
+
+    carga = bench.add_parser("carga", help="Dispara requisições contra a aplicação em execução")
+    carga.add_argument("--url", default="http://127.0.0.1:8000")
+    carga.add_argument("--cenarios", help=f"Separados por vírgula, entre: {', '.join([*CENARIOS, *MISTOS])}")
+    carga.add_argument("--requisicoes", type=int, default=500, help="Requisições medidas por cenário")
+    carga.add_argument("--concorrencia", type=_concorrencias, default=[8],
+                       help="Clientes simultâneos; vários níveis separados por vírgula fazem uma varredura")
+    carga.add_argument("--aquecimento", type=int, default=20)
+    carga.add_argument("--usuarios", type=int, default=0, help="Usuários criados por bench popular (cenário login)")
+    carga.add_argument("--semente", type=int, default=42)
+    carga.add_argument("--quentes", type=int, default=10, help="Produtos disputados pelos cenários de estoque")
+    carga.add_argument("--meta-p95", type=float, help="Sai com código 1 se o p95 de algum cenário passar deste valor (ms)")
+    carga.add_argument("--saida", help="Arquivo JSON de resultado (padrão: saída padrão)")
+    carga.set_defaults(func=bench_carga)
+
+    micro = bench.add_parser("micro", help="Micro-benchmarks de models, validações e templates")
+    micro.add_argument("--repeticoes", type=int, default=2000)
+    micro.add_argument("--sem-banco", action="store_true", help="Só os casos que não acessam o banco")
+    micro.add_argument("--filtro", help="Executa só os casos cujo nome contém o texto")
+    micro.add_argument("--semente", type=int, default=42)
+    micro.add_argument("--saida")
+    micro.set_defaults(func=bench_micro)
+
+    comparacao = bench.add_parser("comparar", help="Compara dois resultados; falha se algum p95 piorou além do limiar")
+    comparacao.add_argument("antes")
+    comparacao.add_argument("depois")
+    comparacao.add_argument("--limiar", type=float, default=0.10)
+    comparacao.set_defaults(func=bench_comparar)
+
+    return parser
+
+
+def main(argv=None):
+    args = criar_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
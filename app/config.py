@@ -5,4 +5,124 @@ class Config:
     MYSQL_HOST = os.getenv('MYSQL_HOST', 'localhost')
     MYSQL_USER = os.getenv('MYSQL_USER', 'root')
     MYSQL_PASSWORD = os.getenv('MYSQL_PASSWORD', 'manager')
-    MYSQL_PORT = os.getenv('MYSQL_PORT', '3306')
\ No newline at end of file
+    MYSQL_PORT = os.getenv('MYSQL_PORT', '3306')
+
+    # Pool de conexões
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+    DB_POOL_MAX_OVERFLOW = int(os.getenv('DB_POOL_MAX_OVERFLOW', '10'))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+
+    # Executor das chamadas síncronas ao banco (caminho assíncrono dos controllers)
+    DB_EXECUTOR_WORKERS = int(os.getenv('DB_EXECUTOR_WORKERS', str(DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW)))
+    DB_EXECUTOR_MAX_PENDING = int(os.getenv('DB_EXECUTOR_MAX_PENDING', '100'))
+    DB_EXECUTOR_TIMEOUT = float(os.getenv('DB_EXECUTOR_TIMEOUT', str(DB_POOL_TIMEOUT)))
+
+    # Listagem de produtos
+    PRODUTOS_PAGE_SIZE = int(os.getenv('PRODUTOS_PAGE_SIZE', '20'))
+    PRODUTOS_PAGE_SIZE_MAX = int(os.getenv('PRODUTOS_PAGE_SIZE_MAX', '100'))
+
+    # Cache de produtos ('memoria' ou 'redis')
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memoria')
+    CACHE_URL = os.getenv('CACHE_URL', 'redis://localhost:6379/0')
+    CACHE_MAX_ITENS = int(os.getenv('CACHE_MAX_ITENS', '10000'))
+    CACHE_TTL = float(os.getenv('CACHE_TTL', '300'))
+    CACHE_LISTAGEM_TTL = float(os.getenv('CACHE_LISTAGEM_TTL', '30'))
+
+    # Gravação de logs de auditoria em segundo plano
+    LOG_QUEUE_MAX = int(os.getenv('LOG_QUEUE_MAX', '10000'))
+    LOG_BATCH_SIZE = int(os.getenv('LOG_BATCH_SIZE', '500'))
+    LOG_FLUSH_INTERVAL = float(os.getenv('LOG_FLUSH_INTERVAL', '1.0'))
+    LOG_SPILL_FILE = os.getenv('LOG_SPILL_FILE', '')
+    LOG_SPILL_MAX_FALHAS = int(os.getenv('LOG_SPILL_MAX_FALHAS', '3'))
+
+    # Retenção e arquivamento de logs
+    LOG_PARTICOES_FUTURAS = int(os.getenv('LOG_PARTICOES_FUTURAS', '3'))
+    LOG_RETENCAO_ATIVA = os.getenv('LOG_RETENCAO_ATIVA', 'true').lower() in ('1', 'true', 'yes')
+    LOG_RETENCAO_MESES = int(os.getenv('LOG_RETENCAO_MESES', '12'))
+    LOG_RETENCAO_INTERVALO = float(os.getenv('LOG_RETENCAO_INTERVALO', '86400'))
+    LOG_RETENCAO_LOTE = int(os.getenv('LOG_RETENCAO_LOTE', '5000'))
+    LOG_ARQUIVO_DIR = os.getenv('LOG_ARQUIVO_DIR', 'arquivo_logs')
+
+    # Importação e exportação em lote de produtos
+    IMPORT_LOTE = int(os.getenv('IMPORT_LOTE', '1000'))
+    IMPORT_TRANSACAO = int(os.getenv('IMPORT_TRANSACAO', '5000'))
+    IMPORT_MAX_ERROS_REPORTADOS = int(os.getenv('IMPORT_MAX_ERROS_REPORTADOS', '1000'))
+
+    # Compressão das respostas (brotli requer o pacote opcional `brotli`)
+    COMPRESSAO_MIN_BYTES = int(os.getenv('COMPRESSAO_MIN_BYTES', '1000'))
+    COMPRESSAO_NIVEL_GZIP = int(os.getenv('COMPRESSAO_NIVEL_GZIP', '6'))
+    COMPRESSAO_NIVEL_BROTLI = int(os.getenv('COMPRESSAO_NIVEL_BROTLI', '5'))
+
+    # Templates: cache de bytecode entre reinícios e cache de fragmentos renderizados
+    TEMPLATE_BYTECODE_CACHE = os.getenv('TEMPLATE_BYTECODE_CACHE', 'true').lower() in ('1', 'true', 'yes')
+    TEMPLATE_BYTECODE_DIR = os.getenv('TEMPLATE_BYTECODE_DIR', '')
+    TEMPLATE_AUTO_RELOAD = os.getenv('TEMPLATE_AUTO_RELOAD', 'false').lower() in ('1', 'true', 'yes')
+    FRAGMENTO_CACHE_MAX_ITENS = int(os.getenv('FRAGMENTO_CACHE_MAX_ITENS', '5000'))
+    FRAGMENTO_CACHE_TTL = float(os.getenv('FRAGMENTO_CACHE_TTL', '3600'))
+
+    # Hash de senhas: custo do bcrypt e processos dedicados (0 = threads do executor padrão)
+    SENHA_BCRYPT_ROUNDS = int(os.getenv('SENHA_BCRYPT_ROUNDS', '12'))
+    SENHA_PROCESSOS = int(os.getenv('SENHA_PROCESSOS', '2'))
+
+    # Sessões: cookie assinado com SECRET_KEY e dados no servidor ('sqlite', 'memoria' ou 'redis')
+    SECRET_KEY = os.getenv('SECRET_KEY', '')
+    SESSAO_BACKEND = os.getenv('SESSAO_BACKEND', 'sqlite')
+    SESSAO_ARQUIVO = os.getenv('SESSAO_ARQUIVO', 'sessoes.db')
+    SESSAO_MAX_ITENS = int(os.getenv('SESSAO_MAX_ITENS', '100000'))
+    SESSAO_TTL = float(os.getenv('SESSAO_TTL', '86400'))
+    SESSAO_COOKIE = os.getenv('SESSAO_COOKIE', 'sessao')
+    SESSAO_COOKIE_SECURE = os.getenv('SESSAO_COOKIE_SECURE', 'false').lower() in ('1', 'true', 'yes')
+
+    # Métricas (/metrics) e log de consultas lentas (0 desativa)
+    METRICAS_ATIVAS = os.getenv('METRICAS_ATIVAS', 'true').lower() in ('1', 'true', 'yes')
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '0'))
+
+    # Servidor de produção (servidor.py); SERVIDOR_WORKERS=0 usa um worker por CPU
+    SERVIDOR_HOST = os.getenv('SERVIDOR_HOST', '0.0.0.0')
+    SERVIDOR_PORTA = int(os.getenv('SERVIDOR_PORTA', '8000'))
+    SERVIDOR_WORKERS = int(os.getenv('SERVIDOR_WORKERS', '0'))
+    SERVIDOR_KEEPALIVE = int(os.getenv('SERVIDOR_KEEPALIVE', '5'))
+    SERVIDOR_TIMEOUT_DESLIGAMENTO = int(os.getenv('SERVIDOR_TIMEOUT_DESLIGAMENTO', '30'))
+    SERVIDOR_ACCESS_LOG = os.getenv('SERVIDOR_ACCESS_LOG', 'false').lower() in ('1', 'true', 'yes')
+    AQUECIMENTO_ATIVO = os.getenv('AQUECIMENTO_ATIVO', 'true').lower() in ('1', 'true', 'yes')
+
+    # Réplicas de leitura ("host:porta" separados por vírgula; mesmo usuário, senha e banco do primário)
+    DB_REPLICAS = os.getenv('DB_REPLICAS', '')
+    DB_REPLICA_ESTRATEGIA = os.getenv('DB_REPLICA_ESTRATEGIA', 'round_robin')
+    DB_REPLICA_JANELA_ESCRITA = float(os.getenv('DB_REPLICA_JANELA_ESCRITA', '5'))
+    DB_REPLICA_QUARENTENA = float(os.getenv('DB_REPLICA_QUARENTENA', '30'))
+
+    # Análise do catálogo ("memoria": instantâneo local incremental; "sql": agregação no MySQL)
+    ANALISE_MODO = os.getenv('ANALISE_MODO', 'memoria')
+    ANALISE_LOTE = int(os.getenv('ANALISE_LOTE', '5000'))
+    ANALISE_RECARGA_TOTAL = float(os.getenv('ANALISE_RECARGA_TOTAL', '3600'))
+    ANALISE_ESTOQUE_BAIXO = int(os.getenv('ANALISE_ESTOQUE_BAIXO', '5'))
+
+    # Reserva de estoque: itens por requisição (um único UPDATE bloqueia todas as linhas)
+    ESTOQUE_RESERVA_MAX_ITENS = int(os.getenv('ESTOQUE_RESERVA_MAX_ITENS', '100'))
+
+    # Eventos de alteração (change feed em /api/v1/eventos)
+    EVENTOS_INTERVALO_CONSULTA = float(os.getenv('EVENTOS_INTERVALO_CONSULTA', '0.5'))
+    EVENTOS_ESPERA_MAXIMA = float(os.getenv('EVENTOS_ESPERA_MAXIMA', '30'))
+    EVENTOS_RETENCAO_DIAS = int(os.getenv('EVENTOS_RETENCAO_DIAS', '7'))
+
+    # Exclusão lógica: remoção em lote e expurgo definitivo em segundo plano
+    EXCLUSAO_LOTE = int(os.getenv('EXCLUSAO_LOTE', '1000'))
+    EXPURGO_ATIVO = os.getenv('EXPURGO_ATIVO', 'true').lower() in ('1', 'true', 'yes')
+    EXPURGO_CARENCIA_DIAS = int(os.getenv('EXPURGO_CARENCIA_DIAS', '7'))
+    EXPURGO_JANELA = os.getenv('EXPURGO_JANELA', '02:00-06:00')
+    EXPURGO_INTERVALO = float(os.getenv('EXPURGO_INTERVALO', '600'))
+    EXPURGO_LOTE = int(os.getenv('EXPURGO_LOTE', '500'))
+    EXPURGO_PAUSA = float(os.getenv('EXPURGO_PAUSA', '0.5'))
+
+    # Controle de admissão: limite por cliente e classe de rota (token bucket) e concorrência global
+    ADMISSAO_ATIVA = os.getenv('ADMISSAO_ATIVA', 'true').lower() in ('1', 'true', 'yes')
+    ADMISSAO_LIMITES = os.getenv('ADMISSAO_LIMITES', 'leitura=20/40,escrita=5/20,pesada=0.2/3,login=0.2/5,eventos=2/10')
+    ADMISSAO_BACKEND = os.getenv('ADMISSAO_BACKEND', 'memoria')
+    ADMISSAO_ARQUIVO = os.getenv('ADMISSAO_ARQUIVO', 'limites.db')
+    ADMISSAO_MAX_CLIENTES = int(os.getenv('ADMISSAO_MAX_CLIENTES', '100000'))
+    ADMISSAO_CONCORRENCIA = int(os.getenv('ADMISSAO_CONCORRENCIA', str(DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW)))
+    ADMISSAO_FILA = int(os.getenv('ADMISSAO_FILA', '100'))
+    ADMISSAO_ESPERA = float(os.getenv('ADMISSAO_ESPERA', '2'))
@@ -0,0 +1,426 @@
+import hashlib
+import json
+import logging
+import re
+from datetime import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+
+from config import Config
+from models.database import como_utc
+from models.log_model import json_default
+from models.produto_model import ConflitoVersaoError, Produto, ProdutoBase, ProdutoCreate
+from models.usuario_model import Usuario
+from models.unidade_trabalho import RegistroNaoEncontradoError
+from sessao import exigir_login
+from validators.produto_validator import validador_produto
+from validators.validacao import detalhes_api
+from models.async_db import (
+    listar_produtos_pagina,
+    buscar_produtos,
+    get_produto_by_id,
+    create_produto,
+    get_all_usuarios,
+    get_usuario_by_id,
+    consultar_logs,
+    historico_registro,
+    registrar_log,
+    unidade_de_trabalho,
+    salvar,
+    resumo_catalogo,
+    remover_produtos,
+    remover_usuarios,
+    status_expurgo
+)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+router = APIRouter(prefix="/api/v1", tags=["api"])
+logger = logging.getLogger(__name__)
+
+
+class PaginaProdutos(BaseModel):
+    produtos: List[Produto]
+    proximo: Optional[str] = None
+    anterior: Optional[str] = None
+
+
+class ResultadoBusca(BaseModel):
+    produtos: List[Produto]
+    proximo: Optional[str] = None
+    anterior: Optional[str] = None
+
+
+MAX_IDS_REMOCAO = 10000
+
+
+class RemocaoProdutos(BaseModel):
+    ids: Optional[List[int]] = Field(None, min_items=1, max_items=MAX_IDS_REMOCAO)
+    preco_min: Optional[float] = None
+    preco_max: Optional[float] = None
+    estoque_max: Optional[int] = None
+    atualizado_antes: Optional[datetime] = None
+
+    class Config:
+        # Um filtro com nome errado seria ignorado e ampliaria a remoção
+        extra = "forbid"
+
+
+class RemocaoUsuarios(BaseModel):
+    ids: Optional[List[int]] = Field(None, min_items=1, max_items=MAX_IDS_REMOCAO)
+    atualizado_antes: Optional[datetime] = None
+
+    class Config:
+        extra = "forbid"
+
+
+def _criterios_remocao(criterios: BaseModel) -> dict:
+    filtros = criterios.dict(exclude_none=True)
+    if not filtros:
+        raise HTTPException(status_code=400, detail="Informe os ids ou ao menos um filtro para remover")
+    return filtros
+
+
+class PaginaLogs(BaseModel):
+    logs: List[dict]
+    proximo: Optional[str] = None
+
+
+class RespostaJSON(JSONResponse):
+    """Serializa com orjson quando disponível, com fallback para o módulo json."""
+
+    def render(self, content) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, default=json_default)
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=json_default).encode("utf-8")
+
+
+def _etag(*partes) -> str:
+    return 'W/"' + hashlib.sha1(repr(partes).encode("utf-8")).hexdigest()[:20] + '"'
+
+
+def _etag_produto(produto: dict) -> str:
+    # A versão muda a cada escrita, então identifica o estado do produto
+    return f'W/"p{produto["id"]}-v{produto["versao"]}"'
+
+
+def _data_http(data: datetime) -> str:
+    # Datas sem fuso vêm do MySQL no fuso da conexão, não no da aplicação
+    return format_datetime(como_utc(data), usegmt=True)
+
+
+def _tags(cabecalho: str) -> set:
+    return {tag.strip().replace("W/", "", 1) for tag in cabecalho.split(",")}
+
+
+def _nao_modificado(request: Request, etag: str, ultima_modificacao: Optional[datetime]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = _tags(if_none_match)
+        return "*" in tags or etag.replace("W/", "", 1) in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and ultima_modificacao:
+        try:
+            desde = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return como_utc(ultima_modificacao).replace(microsecond=0) <= desde
+    return False
+
+
+def _aceita(request: Request, codificacao: str) -> bool:
+    aceitas = request.headers.get("accept-encoding", "")
+    return codificacao in {parte.split(";")[0].strip() for parte in aceitas.split(",")}
+
+
+def _responder(
+    request: Request,
+    conteudo,
+    etag: Optional[str] = None,
+    ultima_modificacao: Optional[datetime] = None,
+    status_code: int = 200,
+    headers: Optional[dict] = None
+) -> Response:
+    """
+    Monta a resposta JSON com ETag/Last-Modified, devolvendo 304 quando o
+    cliente já tem a versão atual. O gzip fica a cargo do GZipMiddleware;
+    aqui só é aplicado o brotli, quando o pacote está instalado.
+    """
+    headers = dict(headers or {})
+    if etag:
+        headers["ETag"] = etag
+        headers["Cache-Control"] = "no-cache"
+    if ultima_modificacao:
+        headers["Last-Modified"] = _data_http(ultima_modificacao)
+    if etag and _nao_modificado(request, etag, ultima_modificacao):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    resposta = RespostaJSON(conteudo, status_code=status_code, headers=headers)
+    if brotli is not None and len(resposta.body) >= Config.COMPRESSAO_MIN_BYTES and _aceita(request, "br"):
+        resposta.body = brotli.compress(resposta.body, quality=Config.COMPRESSAO_NIVEL_BROTLI)
+        resposta.headers["Content-Encoding"] = "br"
+        resposta.headers["Content-Length"] = str(len(resposta.body))
+        resposta.headers["Vary"] = "Accept-Encoding"
+    return resposta
+
+
+def _validar_produto(produto: ProdutoBase) -> ProdutoCreate:
+    """Aplica as regras de produto ao corpo já convertido pelo FastAPI; 422 como os erros de tipo."""
+    dados, erros = validador_produto.validar(produto.dict())
+    if erros:
+        raise HTTPException(status_code=422, detail=detalhes_api(erros))
+    return ProdutoCreate.construct(**dados)
+
+
+def _versao_if_match(if_match: Optional[str], id: int) -> Optional[int]:
+    # "*" aceita qualquer versão existente (RFC 9110); produto inexistente cai no 404
+    if not if_match or if_match.strip() == "*":
+        return None
+    for tag in _tags(if_match):
+        encontrado = re.fullmatch(r'"p(\d+)-v(\d+)"', tag)
+        if encontrado and int(encontrado.group(1)) == id:
+            return int(encontrado.group(2))
+    raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="If-Match não corresponde ao produto")
+
+
+# Produtos
+
+@router.get("/produtos", response_model=PaginaProdutos, name="api_listar_produtos")
+async def api_listar_produtos(
+    request: Request,
+    ordenar: str = "id",
+    direcao: str = "asc",
+    limite: int = Config.PRODUTOS_PAGE_SIZE,
+    apos: Optional[str] = None,
+    antes: Optional[str] = None,
+    preco_min: Optional[float] = None,
+    preco_max: Optional[float] = None,
+    em_estoque: bool = False
+):
+    try:
+        pagina = await listar_produtos_pagina(
+            ordenar_por=ordenar,
+            direcao=direcao,
+            limite=limite,
+            apos=apos,
+            antes=antes,
+            preco_min=preco_min,
+            preco_max=preco_max,
+            em_estoque=em_estoque
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    etag = _etag(
+        [(p["id"], p["versao"], p["updated_at"]) for p in pagina["produtos"]],
+        pagina["proximo"], pagina["anterior"]
+    )
+    return _responder(request, pagina, etag)
+
+
+@router.get("/produtos/buscar", response_model=ResultadoBusca, name="api_buscar_produtos")
+async def api_buscar_produtos(
+    request: Request,
+    q: str = "",
+    limite: int = Config.PRODUTOS_PAGE_SIZE,
+    apos: Optional[str] = None,
+    antes: Optional[str] = None
+):
+    """Busca por relevância; `proximo` e `anterior` são cursores para `apos` e `antes`."""
+    try:
+        resultado = await buscar_produtos(q, limite=limite, apos=apos, antes=antes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    etag = _etag(
+        [(p["id"], p["versao"], p["updated_at"]) for p in resultado["produtos"]],
+        resultado["proximo"], resultado["anterior"]
+    )
+    return _responder(request, resultado, etag)
+
+
+@router.get("/produtos/{id}", response_model=Produto, name="api_obter_produto")
+async def api_obter_produto(request: Request, id: int):
+    produto = await get_produto_by_id(id)
+    if not produto:
+        raise HTTPException(status_code=404, detail="Produto não encontrado")
+    return _responder(request, produto, _etag_produto(produto), produto["updated_at"])
+
+
+@router.post("/produtos", response_model=Produto, status_code=201, name="api_criar_produto")
+async def api_criar_produto(request: Request, produto: ProdutoCreate):
+    produto = _validar_produto(produto)
+    try:
+        id = await create_produto(produto)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    await registrar_log("CREATE", "produtos", id, dados_novos=produto.dict(), request=request)
+    criado = await get_produto_by_id(id)
+    return _responder(
+        request, criado, _etag_produto(criado), criado["updated_at"], status_code=201,
+        headers={"Location": router.url_path_for("api_obter_produto", id=id)}
+    )
+
+
+@router.put("/produtos/{id}", response_model=Produto, name="api_atualizar_produto")
+async def api_atualizar_produto(
+    request: Request,
+    id: int,
+    produto: ProdutoBase,
+    if_match: Optional[str] = Header(None)
+):
+    produto = _validar_produto(produto)
+    versao = _versao_if_match(if_match, id)
+    uow = unidade_de_trabalho(request)
+    # O commit lê a linha, confere a versão, atualiza e relê numa única transação
+    uow.atualizar_produto(id, produto, versao=versao, reler=True)
+    try:
+        await salvar(uow)
+    except ConflitoVersaoError as e:
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail=str(e))
+    except RegistroNaoEncontradoError:
+        raise HTTPException(status_code=404, detail="Produto não encontrado")
+
+    atualizado = uow.produtos[id]
+    return _responder(request, atualizado, _etag_produto(atualizado), atualizado["updated_at"])
+
+
+@router.delete("/produtos/{id}", status_code=204, name="api_deletar_produto")
+async def api_deletar_produto(request: Request, id: int, usuario: dict = Depends(exigir_login)):
+    # Sem leitura prévia: o UPDATE da exclusão lógica já diz se o produto existia
+    uow = unidade_de_trabalho(request)
+    uow.remover_produto(id, id_usuario=usuario["id"])
+    try:
+        await salvar(uow)
+    except RegistroNaoEncontradoError:
+        raise HTTPException(status_code=404, detail="Produto não encontrado")
+    return Response(status_code=204)
+
+
+@router.post("/produtos/remover", response_model=dict, name="api_remover_produtos")
+async def api_remover_produtos(request: Request, criterios: RemocaoProdutos, usuario: dict = Depends(exigir_login)):
+    """
+    Remove vários produtos de uma vez, pelos `ids` e/ou pelos filtros. A
+    remoção é lógica; as linhas são apagadas depois pelo expurgo. Exige login.
+    """
+    filtros = _criterios_remocao(criterios)
+    try:
+        removidos = await remover_produtos(**filtros)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    await registrar_log("DELETE_LOTE", "produtos", id_usuario=usuario["id"], request=request,
+                        dados_novos={"criterios": filtros, "removidos": removidos})
+    return RespostaJSON({"removidos": removidos})
+
+
+# Usuários
+
+@router.get("/usuarios", response_model=List[Usuario], name="api_listar_usuarios")
+async def api_listar_usuarios(request: Request):
+    usuarios = await get_all_usuarios()
+    etag = _etag([(u["id"], u["data_atualizacao"]) for u in usuarios])
+    return _responder(request, usuarios, etag)
+
+
+@router.get("/usuarios/{id}", response_model=Usuario, name="api_obter_usuario")
+async def api_obter_usuario(request: Request, id: int):
+    usuario = await get_usuario_by_id(id)
+    if not usuario:
+        raise HTTPException(status_code=404, detail="Usuário não encontrado")
+    return _responder(request, usuario, _etag(usuario["id"], usuario["data_atualizacao"]), usuario["data_atualizacao"])
+
+
+@router.post("/usuarios/remover", response_model=dict, name="api_remover_usuarios")
+async def api_remover_usuarios(request: Request, criterios: RemocaoUsuarios, usuario: dict = Depends(exigir_login)):
+    """Remove vários usuários de uma vez, pelos `ids` e/ou sem alterações desde `atualizado_antes`. Exige login."""
+    filtros = _criterios_remocao(criterios)
+    try:
+        removidos = await remover_usuarios(**filtros)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    await registrar_log("DELETE_LOTE", "usuarios", id_usuario=usuario["id"], request=request,
+                        dados_novos={"criterios": filtros, "removidos": removidos})
+    return RespostaJSON({"removidos": removidos})
+
+
+# Expurgo
+
+@router.get("/expurgo", response_model=dict, name="api_status_expurgo")
+async def api_status_expurgo():
+    """Registros removidos aguardando o expurgo definitivo e o andamento da última execução neste worker."""
+    return RespostaJSON(await status_expurgo())
+
+
+# Análise
+
+@router.get("/analise/estoque", response_model=dict, name="api_analise_estoque")
+async def api_analise_estoque(
+    request: Request,
+    limite_baixo: int = Config.ANALISE_ESTOQUE_BAIXO,
+    faixas: int = 10,
+    itens: int = 50
+):
+    try:
+        resultado = await resumo_catalogo(limite_baixo=limite_baixo, faixas=faixas, max_itens=itens)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    etag = _etag(
+        resultado["produtos"], resultado["unidades"], resultado["valor_estoque"],
+        resultado["estoque_baixo"], resultado["precos"]
+    )
+    return _responder(request, resultado, etag)
+
+
+# Logs
+
+@router.get("/logs", response_model=PaginaLogs, name="api_listar_logs")
+async def api_listar_logs(
+    request: Request,
+    tabela: Optional[str] = None,
+    id_registro: Optional[int] = None,
+    id_usuario: Optional[int] = None,
+    tipo_operacao: Optional[str] = None,
+    inicio: Optional[datetime] = None,
+    fim: Optional[datetime] = None,
+    limite: int = 50,
+    apos: Optional[str] = None
+):
+    try:
+        pagina = await consultar_logs(
+            tabela=tabela,
+            id_registro=id_registro,
+            id_usuario=id_usuario,
+            tipo_operacao=tipo_operacao,
+            inicio=inicio,
+            fim=fim,
+            limite=limite,
+            apos=apos
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Logs não mudam depois de gravados: os ids bastam para identificar a página
+    return _responder(request, pagina, _etag([log["id"] for log in pagina["logs"]], pagina["proximo"]))
+
+
+@router.get("/logs/{tabela}/{id_registro}", response_model=List[dict], name="api_historico_registro")
+async def api_historico_registro(request: Request, tabela: str, id_registro: int):
+    historico = await historico_registro(tabela, id_registro)
+    if not historico:
+        raise HTTPException(status_code=404, detail="Nenhum log encontrado para o registro")
+    return _responder(request, historico, _etag([log["id"] for log in historico]), historico[-1]["data_operacao"])
@@ -0,0 +1,41 @@
+import logging
+from fastapi import APIRouter, Form, Request, status
+from fastapi.responses import HTMLResponse, RedirectResponse
+
+from templating import templates
+from sessao import encerrar_login, get_flash, iniciar_login, set_flash, usuario_logado
+from models.async_db import autenticar_usuario, registrar_log
+
+router = APIRouter(tags=["auth"])
+logger = logging.getLogger(__name__)
+
+@router.get("/login", response_class=HTMLResponse, name="login")
+async def form_login(request: Request):
+    flash = await get_flash(request)
+    return templates.TemplateResponse("login.html", {
+        "request": request,
+        "usuario": await usuario_logado(request),
+        "errors": [],
+        "messages": [flash] if flash else []
+    })
+
+@router.post("/login", response_class=HTMLResponse, name="login_post")
+async def login(request: Request, email: str = Form(...), senha: str = Form(...)):
+    usuario = await autenticar_usuario(email.strip(), senha)
+    if not usuario:
+        return templates.TemplateResponse("login.html", {
+            "request": request, "usuario": None, "email": email, "errors": ["Email ou senha inválidos"]
+        }, status_code=status.HTTP_401_UNAUTHORIZED)
+
+    await iniciar_login(request, usuario)
+    await registrar_log("LOGIN", "usuarios", usuario["id"], id_usuario=usuario["id"], request=request)
+    await set_flash(request, f"Bem-vindo, {usuario['nome']}!")
+    return RedirectResponse(router.url_path_for("login"), status_code=status.HTTP_303_SEE_OTHER)
+
+@router.post("/logout", name="logout")
+async def logout(request: Request):
+    usuario = await usuario_logado(request)
+    await encerrar_login(request)
+    if usuario:
+        await registrar_log("LOGOUT", "usuarios", usuario["id"], id_usuario=usuario["id"], request=request)
+    return RedirectResponse(router.url_path_for("login"), status_code=status.HTTP_303_SEE_OTHER)
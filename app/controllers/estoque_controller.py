@@ -0,0 +1,54 @@
+import logging
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from models.estoque_model import (
+    AjusteEstoque,
+    EstoqueInsuficienteError,
+    ProdutoNaoEncontradoError,
+    Reserva
+)
+from models.async_db import ajustar_estoque, reservar_estoque, liberar_estoque, registrar_log
+
+router = APIRouter(prefix="/estoque", tags=["estoque"])
+logger = logging.getLogger(__name__)
+
+def _erro_estoque(e: ValueError):
+    if isinstance(e, ProdutoNaoEncontradoError):
+        return JSONResponse({"detail": str(e), "ids": e.ids}, status_code=404)
+    if isinstance(e, EstoqueInsuficienteError):
+        return JSONResponse({"detail": str(e), "ids": e.ids}, status_code=409)
+    raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/reservar", name="estoque_reservar")
+async def reservar(request: Request, reserva: Reserva):
+    try:
+        resultado = await reservar_estoque(reserva.itens)
+    except ValueError as e:
+        return _erro_estoque(e)
+
+    await registrar_log("RESERVA", "produtos", request=request, dados_novos={"itens": reserva.dict()["itens"]})
+    return {"produtos": resultado}
+
+@router.post("/liberar", name="estoque_liberar")
+async def liberar(request: Request, reserva: Reserva):
+    try:
+        resultado = await liberar_estoque(reserva.itens)
+    except ValueError as e:
+        return _erro_estoque(e)
+
+    await registrar_log("LIBERACAO", "produtos", request=request, dados_novos={"itens": reserva.dict()["itens"]})
+    return {"produtos": resultado}
+
+@router.post("/{id}", name="estoque_ajustar")
+async def ajustar(request: Request, id: int, ajuste: AjusteEstoque):
+    try:
+        resultado = await ajustar_estoque(id, ajuste.delta)
+    except ValueError as e:
+        return _erro_estoque(e)
+
+    await registrar_log("ESTOQUE", "produtos", id, request=request, dados_novos={
+        "delta": ajuste.delta,
+        "estoque": resultado["estoque"]
+    })
+    return resultado
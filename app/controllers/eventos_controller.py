@@ -0,0 +1,202 @@
+import asyncio
+import json
+import logging
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from config import Config
+from controllers.api_controller import RespostaJSON
+from models.eventos_model import LOTE_MAXIMO
+from models.log_model import json_default
+from models.async_db import ler_eventos, posicao_consumidor, salvar_posicao, ultimo_evento
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+router = APIRouter(prefix="/api/v1/eventos", tags=["api"])
+logger = logging.getLogger(__name__)
+
+SSE_DURACAO_MAXIMA = 3600
+SSE_INTERVALO_PING = 15
+
+
+class PosicaoConsumidor(BaseModel):
+    posicao: int = Field(..., ge=0)
+
+
+class NotificadorEventos:
+    """
+    Acorda as requisições em espera (long-poll e SSE) quando surgem eventos.
+
+    Uma única tarefa por worker consulta a última posição do feed, e só enquanto
+    há alguém esperando; assim, eventos gravados por outros workers (ou pela
+    CLI) também são percebidos, sem uma consulta por cliente conectado.
+    """
+
+    def __init__(self, intervalo: float):
+        self.intervalo = intervalo
+        self.ultima_posicao = 0
+        self._loop = None
+        self._condicao = None
+        self._esperando = 0
+        self._tarefa = None
+
+    def _vincular(self):
+        # Condição e tarefa pertencem a um event loop; um novo loop recomeça do zero
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._condicao = asyncio.Condition()
+            self._esperando = 0
+            self._tarefa = None
+
+    async def _vigiar(self):
+        condicao = self._condicao
+        try:
+            while self._esperando and condicao is self._condicao:
+                try:
+                    maximo = await ultimo_evento()
+                except Exception as e:
+                    logger.warning(f"Falha ao consultar eventos: {str(e)}")
+                    maximo = self.ultima_posicao
+                if maximo > self.ultima_posicao:
+                    self.ultima_posicao = maximo
+                    async with condicao:
+                        condicao.notify_all()
+                await asyncio.sleep(self.intervalo)
+        finally:
+            if condicao is self._condicao:
+                self._tarefa = None
+
+    async def esperar(self, apos: int, timeout: float) -> bool:
+        """Espera até existir evento com posição maior que `apos`; False se o tempo acabou antes."""
+        self._vincular()
+        self._esperando += 1
+        if self._tarefa is None:
+            self._tarefa = asyncio.create_task(self._vigiar())
+        try:
+            async with self._condicao:
+                await asyncio.wait_for(self._condicao.wait_for(lambda: self.ultima_posicao > apos), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._esperando -= 1
+
+
+notificador = NotificadorEventos(Config.EVENTOS_INTERVALO_CONSULTA)
+
+
+def _json(valor) -> str:
+    if orjson is not None:
+        return orjson.dumps(valor, default=json_default).decode("utf-8")
+    return json.dumps(valor, ensure_ascii=False, separators=(",", ":"), default=json_default)
+
+
+async def _posicao_inicial(apos: Optional[int], consumidor: Optional[str]) -> int:
+    if apos is not None:
+        return apos
+    if consumidor:
+        registro = await posicao_consumidor(consumidor)
+        return registro["posicao"] if registro else 0
+    return 0
+
+
+async def _ler(apos: int, limite: int, agregado: Optional[str]) -> dict:
+    try:
+        return await ler_eventos(apos=apos, limite=limite, agregado=agregado)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("", name="api_listar_eventos")
+async def api_listar_eventos(
+    apos: Optional[int] = None,
+    consumidor: Optional[str] = None,
+    agregado: Optional[str] = None,
+    limite: int = 100,
+    espera: float = 0
+):
+    """
+    Lê um lote de eventos a partir de `apos` (ou da posição salva do
+    `consumidor`). Com `espera`, segura a requisição até chegar um evento
+    ou o tempo acabar (long-poll). Continue a leitura a partir de `proximo`.
+    """
+    posicao = await _posicao_inicial(apos, consumidor)
+    loop = asyncio.get_running_loop()
+    prazo = loop.time() + min(max(espera, 0), Config.EVENTOS_ESPERA_MAXIMA)
+
+    while True:
+        resultado = await _ler(posicao, limite, agregado)
+        posicao = resultado["proximo"]
+        restante = prazo - loop.time()
+        if resultado["eventos"] or restante <= 0:
+            break
+        if not await notificador.esperar(posicao, restante):
+            break
+
+    return RespostaJSON(resultado)
+
+
+@router.get("/stream", name="api_stream_eventos")
+async def api_stream_eventos(
+    apos: Optional[int] = None,
+    consumidor: Optional[str] = None,
+    agregado: Optional[str] = None,
+    duracao: float = 300,
+    last_event_id: Optional[str] = Header(None)
+):
+    """
+    Entrega os eventos por Server-Sent Events. Ao reconectar, o navegador
+    envia Last-Event-ID e o fluxo continua de onde parou. A conexão é
+    encerrada depois de `duracao` segundos; o cliente reconecta sozinho.
+    """
+    if last_event_id and last_event_id.isdigit():
+        apos = int(last_event_id)
+    posicao = await _posicao_inicial(apos, consumidor)
+    await _ler(posicao, 1, agregado)  # valida os parâmetros antes de abrir o fluxo
+
+    async def gerar():
+        nonlocal posicao
+        loop = asyncio.get_running_loop()
+        fim = loop.time() + min(max(duracao, 0), SSE_DURACAO_MAXIMA)
+        yield "retry: 3000\n\n"
+        while loop.time() < fim:
+            resultado = await ler_eventos(apos=posicao, limite=LOTE_MAXIMO, agregado=agregado)
+            for evento in resultado["eventos"]:
+                yield (f"id: {evento['posicao']}\nevent: {evento['agregado']}.{evento['tipo']}\n"
+                       f"data: {_json(evento)}\n\n")
+            posicao = resultado["proximo"]
+            if resultado["eventos"]:
+                continue
+            if not await notificador.esperar(posicao, min(SSE_INTERVALO_PING, max(fim - loop.time(), 0))):
+                # O id sem dados não dispara evento, mas atualiza o Last-Event-ID
+                # do cliente sobre os eventos filtrados por agregado
+                yield f": ping\nid: {posicao}\n\n"
+
+    return StreamingResponse(gerar(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+        # Impede o GZipMiddleware de acumular o fluxo num buffer
+        "Content-Encoding": "identity",
+    })
+
+
+@router.get("/consumidores/{nome}", name="api_obter_consumidor")
+async def api_obter_consumidor(nome: str):
+    consumidor = await posicao_consumidor(nome)
+    if not consumidor:
+        raise HTTPException(status_code=404, detail="Consumidor não encontrado")
+    return RespostaJSON(consumidor)
+
+
+@router.put("/consumidores/{nome}", name="api_salvar_consumidor")
+async def api_salvar_consumidor(nome: str, corpo: PosicaoConsumidor):
+    """Confirma até onde o consumidor processou; `?consumidor=` retoma daí."""
+    if len(nome) > 100:
+        raise HTTPException(status_code=400, detail="O nome do consumidor deve ter no máximo 100 caracteres")
+    return RespostaJSON(await salvar_posicao(nome, corpo.posicao))
@@ -0,0 +1,78 @@
+import logging
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import HTMLResponse
+
+from templating import templates
+from models.async_db import consultar_logs, historico_registro
+
+router = APIRouter(prefix="/logs", tags=["logs"])
+logger = logging.getLogger(__name__)
+
+def _data_ou_none(valor: Optional[str]):
+    if not valor:
+        return None
+    return datetime.fromisoformat(valor)
+
+def _int_ou_none(valor: Optional[str]):
+    if not valor:
+        return None
+    return int(valor)
+
+@router.get("/", response_class=HTMLResponse, name="listar_logs")
+async def listar_logs(
+    request: Request,
+    tabela: Optional[str] = None,
+    id_registro: Optional[str] = None,
+    id_usuario: Optional[str] = None,
+    tipo_operacao: Optional[str] = None,
+    inicio: Optional[str] = None,
+    fim: Optional[str] = None,
+    limite: int = 50,
+    apos: Optional[str] = None
+):
+    filtros = {
+        "tabela": tabela or "", "id_registro": id_registro or "", "id_usuario": id_usuario or "",
+        "tipo_operacao": tipo_operacao or "", "inicio": inicio or "", "fim": fim or ""
+    }
+    try:
+        pagina = await consultar_logs(
+            tabela=tabela or None,
+            id_registro=_int_ou_none(id_registro),
+            id_usuario=_int_ou_none(id_usuario),
+            tipo_operacao=tipo_operacao or None,
+            inicio=_data_ou_none(inicio),
+            fim=_data_ou_none(fim),
+            limite=limite,
+            apos=apos
+        )
+        proxima_url = None
+        if pagina["proximo"]:
+            proxima_url = str(request.url.include_query_params(apos=pagina["proximo"]))
+        return templates.TemplateResponse("logs/lista.html", {
+            "request": request,
+            "logs": pagina["logs"],
+            "filtros": filtros,
+            "proxima_url": proxima_url
+        })
+    except Exception as e:
+        logger.error(f"Erro ao consultar logs: {str(e)}", exc_info=True)
+        return templates.TemplateResponse("logs/lista.html", {
+            "request": request,
+            "logs": [],
+            "filtros": filtros,
+            "messages": [{"message": "Erro ao carregar logs", "category": "danger"}]
+        })
+
+@router.get("/{tabela}/{id_registro}", response_class=HTMLResponse, name="historico_registro")
+async def obter_historico(request: Request, tabela: str, id_registro: int):
+    historico = await historico_registro(tabela, id_registro)
+    if not historico:
+        raise HTTPException(status_code=404, detail="Nenhum log encontrado para o registro")
+
+    return templates.TemplateResponse("logs/lista.html", {
+        "request": request,
+        "logs": historico,
+        "historico": {"tabela": tabela, "id_registro": id_registro}
+    })
@@ -1,52 +1,110 @@
 import logging
-from fastapi import APIRouter, Depends, Form, HTTPException, Request, status
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
-import mysql.connector
-
-from models.database import get_db
-from models.produto_model import (
-    ProdutoCreate,
-    get_all_produtos,
+from typing import Optional
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Request, UploadFile, status
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, StreamingResponse
+
+from config import Config
+from templating import templates
+from sessao import exigir_login, get_flash, set_flash
+from models.produto_model import ProdutoCreate
+from validators.produto_validator import validador_produto
+from validators.validacao import mensagens
+from models.unidade_trabalho import RegistroNaoEncontradoError
+from models.async_db import (
+    listar_produtos_pagina,
+    buscar_produtos,
     get_produto_by_id,
     create_produto,
-    update_produto,
-    delete_produto
+    registrar_log,
+    run_escrita,
+    unidade_de_trabalho,
+    carregar_produto,
+    salvar
 )
-from models.log_model import registrar_log
+from models.produto_bulk import FORMATOS, formato_do_arquivo, importar_arquivo, stream_exportacao
 
 router = APIRouter(prefix="/produtos", tags=["produtos"])
-templates = Jinja2Templates(directory="templates")
 logger = logging.getLogger(__name__)
 
-def set_flash(request: Request, message: str, category: str = "success"):
-    if not hasattr(request.state, 'session'):
-        request.state.session = {}
-    request.state.session['flash'] = {'message': message, 'category': category}
-
-def get_flash(request: Request):
-    if hasattr(request.state, 'session') and 'flash' in request.state.session:
-        flash = request.state.session.pop('flash')
-        return flash
-    return None
+def _float_ou_none(valor: Optional[str]):
+    if valor is None or not valor.strip():
+        return None
+    return float(valor.replace(",", "."))
 
 @router.get("/", response_class=HTMLResponse, name="listar_produtos")
-async def listar_produtos(request: Request, db: mysql.connector.MySQLConnection = Depends(get_db)):
+async def listar_produtos(
+    request: Request,
+    ordenar: str = "id",
+    direcao: str = "asc",
+    limite: int = Config.PRODUTOS_PAGE_SIZE,
+    apos: Optional[str] = None,
+    antes: Optional[str] = None,
+    preco_min: Optional[str] = None,
+    preco_max: Optional[str] = None,
+    em_estoque: bool = False
+):
+    filtros = {
+        "ordenar": ordenar, "direcao": direcao, "limite": limite,
+        "preco_min": preco_min or "", "preco_max": preco_max or "", "em_estoque": em_estoque
+    }
     try:
-        produtos = get_all_produtos(db)
-        flash = get_flash(request)
+        pagina = await listar_produtos_pagina(
+            ordenar_por=ordenar,
+            direcao=direcao,
+            limite=limite,
+            apos=apos,
+            antes=antes,
+            preco_min=_float_ou_none(preco_min),
+            preco_max=_float_ou_none(preco_max),
+            em_estoque=em_estoque
+        )
+        url_base = request.url.remove_query_params(["apos", "antes"])
+        flash = await get_flash(request)
         messages = [flash] if flash else []
         return templates.TemplateResponse("produtos/lista.html", {
-            "request": request, "produtos": produtos, "messages": messages
+            "request": request,
+            "produtos": pagina["produtos"],
+            "filtros": filtros,
+            "proxima_url": str(url_base.include_query_params(apos=pagina["proximo"])) if pagina["proximo"] else None,
+            "anterior_url": str(url_base.include_query_params(antes=pagina["anterior"])) if pagina["anterior"] else None,
+            "messages": messages
         })
     except Exception as e:
         logger.error(f"Erro ao listar produtos: {str(e)}", exc_info=True)
         return templates.TemplateResponse("produtos/lista.html", {
             "request": request,
             "produtos": [],
+            "filtros": filtros,
             "messages": [{"message": "Erro ao carregar produtos", "category": "danger"}]
         })
 
+@router.get("/buscar", response_class=HTMLResponse, name="produto_buscar")
+async def buscar(
+    request: Request,
+    q: str = "",
+    limite: int = Config.PRODUTOS_PAGE_SIZE,
+    apos: Optional[str] = None,
+    antes: Optional[str] = None
+):
+    try:
+        resultado = await buscar_produtos(q, limite=limite, apos=apos, antes=antes)
+        url_base = request.url.remove_query_params(["apos", "antes"])
+        return templates.TemplateResponse("produtos/lista.html", {
+            "request": request,
+            "produtos": resultado["produtos"],
+            "busca": q,
+            "proxima_url": str(url_base.include_query_params(apos=resultado["proximo"])) if resultado["proximo"] else None,
+            "anterior_url": str(url_base.include_query_params(antes=resultado["anterior"])) if resultado["anterior"] else None
+        })
+    except Exception as e:
+        logger.error(f"Erro ao buscar produtos: {str(e)}", exc_info=True)
+        return templates.TemplateResponse("produtos/lista.html", {
+            "request": request,
+            "produtos": [],
+            "busca": q,
+            "messages": [{"message": "Erro ao buscar produtos", "category": "danger"}]
+        })
+
 @router.get("/cadastrar", response_class=HTMLResponse, name="produto_cadastrar")
 async def form_cadastrar_produto(request: Request):
     return templates.TemplateResponse("produtos/cadastro.html", {
@@ -59,55 +117,98 @@ async def cadastrar_produto(
     nome: str = Form(...),
     descricao: str = Form(""),
     preco: float = Form(...),
-    estoque: int = Form(...),
-    db: mysql.connector.MySQLConnection = Depends(get_db)
+    estoque: int = Form(...)
 ):
-    errors = []
-
-    if len(nome.strip()) < 3:
-        errors.append("O nome do produto deve ter no mínimo 3 caracteres")
-    if preco <= 0:
-        errors.append("O preço deve ser um valor positivo")
-    if estoque < 0:
-        errors.append("O estoque deve ser um número inteiro maior ou igual a zero")
-
-    if errors:
+    dados, erros = validador_produto.validar(
+        {"nome": nome, "descricao": descricao, "preco": preco, "estoque": estoque}
+    )
+    if erros:
         return templates.TemplateResponse("produtos/cadastro.html", {
             "request": request,
-            "errors": errors,
+            "errors": mensagens(erros),
             "form_data": {
                 "nome": nome, "descricao": descricao, "preco": preco, "estoque": estoque
             }
         })
 
-    produto_data = ProdutoCreate(nome=nome, descricao=descricao, preco=preco, estoque=estoque)
-    produto_id = create_produto(produto_data, db)
+    produto_data = ProdutoCreate.construct(**dados)
+    produto_id = await create_produto(produto_data)
 
     if not produto_id:
         raise ValueError("Não foi possível criar o produto")
 
-    registrar_log("CREATE", "produtos", produto_id, produto_data.dict(), request, db)
-    set_flash(request, "Produto cadastrado com sucesso!")
+    await registrar_log("CREATE", "produtos", produto_id, dados_novos=produto_data.dict(), request=request)
+    await set_flash(request, "Produto cadastrado com sucesso!")
     return RedirectResponse(router.url_path_for("listar_produtos"), status_code=status.HTTP_303_SEE_OTHER)
 
+@router.post("/importar", name="produto_importar")
+async def importar_produtos(
+    request: Request,
+    arquivo: UploadFile = File(...),
+    formato: Optional[str] = Form(None),
+    usuario: dict = Depends(exigir_login)
+):
+    formato = formato or formato_do_arquivo(arquivo.filename)
+    if formato not in FORMATOS:
+        raise HTTPException(status_code=400, detail=f"Formato inválido: {formato}")
+
+    try:
+        relatorio = await run_escrita(importar_arquivo, arquivo.file, formato)
+    except ValueError as e:
+        logger.error(f"Erro ao importar produtos: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    await registrar_log("IMPORT", "produtos", request=request, dados_novos={
+        "arquivo": arquivo.filename,
+        "processados": relatorio["processados"],
+        "gravados": relatorio["gravados"],
+        "erros": relatorio["total_erros"]
+    })
+    return JSONResponse(relatorio)
+
+@router.get("/exportar", name="produto_exportar")
+async def exportar_produtos(
+    formato: str = "csv",
+    preco_min: Optional[str] = None,
+    preco_max: Optional[str] = None,
+    em_estoque: bool = False,
+    usuario: dict = Depends(exigir_login)
+):
+    # Exige login: a exportação segura uma conexão do pool durante todo o download
+    if formato not in FORMATOS:
+        raise HTTPException(status_code=400, detail=f"Formato inválido: {formato}")
+
+    media_type = "text/csv" if formato == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        stream_exportacao(
+            formato,
+            preco_min=_float_ou_none(preco_min),
+            preco_max=_float_ou_none(preco_max),
+            em_estoque=em_estoque
+        ),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="produtos.{formato}"'}
+    )
+
 @router.get("/{id}", response_class=HTMLResponse, name="produto_detalhes")
-async def obter_produto(request: Request, id: int, db: mysql.connector.MySQLConnection = Depends(get_db)):
+async def obter_produto(request: Request, id: int):
     try:
-        produto = get_produto_by_id(id, db)
+        produto = await get_produto_by_id(id)
         if not produto:
             raise HTTPException(status_code=404, detail="Produto não encontrado")
 
+        flash = await get_flash(request)
         return templates.TemplateResponse("produtos/detalhes.html", {
-            "request": request, "produto": produto
+            "request": request, "produto": produto, "messages": [flash] if flash else []
         })
     except Exception as e:
         logger.error(f"Erro ao obter produto {id}: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Erro ao carregar produto")
 
 @router.get("/{id}/editar", response_class=HTMLResponse, name="produto_editar")
-async def form_editar_produto(request: Request, id: int, db: mysql.connector.MySQLConnection = Depends(get_db)):
+async def form_editar_produto(request: Request, id: int):
     try:
-        produto = get_produto_by_id(id, db)
+        produto = await get_produto_by_id(id)
         if not produto:
             raise HTTPException(status_code=404, detail="Produto não encontrado")
 
@@ -126,70 +227,50 @@ async def processar_edicao_produto(
     descricao: str = Form(""),
     preco: float = Form(...),
     estoque: int = Form(...),
-    db: mysql.connector.MySQLConnection = Depends(get_db)
+    versao: Optional[int] = Form(None)
 ):
+    uow = unidade_de_trabalho(request)
     try:
-        errors = []
-
-        if len(nome.strip()) < 3:
-            errors.append("O nome do produto deve ter no mínimo 3 caracteres")
-        if preco <= 0:
-            errors.append("O preço deve ser um valor positivo")
-        if estoque < 0:
-            errors.append("O estoque deve ser um número inteiro maior ou igual a zero")
-
-        if errors:
+        dados, erros = validador_produto.validar(
+            {"nome": nome, "descricao": descricao, "preco": preco, "estoque": estoque}
+        )
+        if erros:
             return templates.TemplateResponse("produtos/editar.html", {
                 "request": request,
                 "produto": {
                     "id": id, "nome": nome, "descricao": descricao,
-                    "preco": preco, "estoque": estoque
+                    "preco": preco, "estoque": estoque, "versao": versao
                 },
-                "errors": errors
+                "errors": mensagens(erros)
             })
 
-        produto_atual = get_produto_by_id(id, db)
-        produto_data = ProdutoCreate(nome=nome, descricao=descricao, preco=preco, estoque=estoque)
-        rows_updated = update_produto(id, produto_data, db)
+        # Leitura com bloqueio, atualização e log saem numa única transação (ver UnidadeDeTrabalho.commit)
+        produto_data = ProdutoCreate.construct(**dados)
+        uow.atualizar_produto(id, produto_data, versao=versao)
+        await salvar(uow)
 
-        if rows_updated == 0:
-            raise ValueError("Nenhum produto foi atualizado")
-
-        registrar_log("UPDATE", "produtos", id, produto_data.dict(), request, db, {
-            "nome": produto_atual["nome"],
-            "descricao": produto_atual["descricao"],
-            "preco": float(produto_atual["preco"]),
-            "estoque": produto_atual["estoque"]
-        })
-
-        set_flash(request, "Produto atualizado com sucesso!")
+        await set_flash(request, "Produto atualizado com sucesso!")
         return RedirectResponse(router.url_path_for("produto_detalhes", id=id), status_code=status.HTTP_303_SEE_OTHER)
     except Exception as e:
         logger.error(f"Erro ao editar produto {id}: {str(e)}", exc_info=True)
         return templates.TemplateResponse("produtos/editar.html", {
             "request": request,
-            "produto": get_produto_by_id(id, db),
+            "produto": await carregar_produto(uow, id),
             "errors": [str(e)]
         })
 
 @router.post("/{id}/deletar", name="produto_deletar")
-async def deletar_produto(request: Request, id: int, db: mysql.connector.MySQLConnection = Depends(get_db)):
+async def deletar_produto(request: Request, id: int, usuario: dict = Depends(exigir_login)):
+    # Sem leitura prévia: o UPDATE da exclusão lógica já diz se o produto existia
+    uow = unidade_de_trabalho(request)
+    uow.remover_produto(id, id_usuario=usuario["id"])
     try:
-        produto = get_produto_by_id(id, db)
-        affected_rows = delete_produto(id, db)
-
-        if affected_rows == 0:
-            raise HTTPException(status_code=404, detail="Produto não encontrado")
-
-        registrar_log("DELETE", "produtos", id, request=request, db=db, dados_anteriores={
-            "nome": produto["nome"],
-            "descricao": produto["descricao"],
-            "preco": float(produto["preco"]),
-            "estoque": produto["estoque"]
-        })
-
-        set_flash(request, "Produto excluído com sucesso!")
-        return RedirectResponse(router.url_path_for("listar_produtos"), status_code=status.HTTP_303_SEE_OTHER)
+        await salvar(uow)
+    except RegistroNaoEncontradoError:
+        raise HTTPException(status_code=404, detail="Produto não encontrado")
     except Exception as e:
         logger.error(f"Erro ao deletar produto {id}: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Erro ao deletar produto")
+
+    await set_flash(request, "Produto excluído com sucesso!")
+    return RedirectResponse(router.url_path_for("listar_produtos"), status_code=status.HTTP_303_SEE_OTHER)
@@ -1,34 +1,149 @@
 import logging
-import mysql.connector
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, Form, Request, status
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
-from models.database import get_db
-from models.log_model import registrar_log
-from models.usuario_model import (
-    UsuarioCreate, 
+from templating import templates
+from sessao import exigir_login, get_flash, set_flash
+from models.usuario_model import UsuarioCreate
+from validators.usuario_validator import validador_usuario, validador_usuario_edicao
+from validators.validacao import mensagens
+from models.async_db import (
     get_all_usuarios, 
     get_usuario_by_id, 
     create_usuario, 
     delete_usuario, 
-    update_usuario
+    update_usuario,
+    registrar_log
 )
-from routes.usuarios_routes import router
+
+router = APIRouter(prefix="/usuarios", tags=["usuarios"])
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def set_flash(request: Request, message: str, category: str = "success"):
-    """Define uma mensagem flash na sessão."""
-    if not hasattr(request.state, 'session'):
-        request.state.session = {}
-    request.state.session['flash'] = {'message': message, 'category': category}
+def validar_usuario(nome: str, email: str, senha: Optional[str], senha_obrigatoria: bool = True):
+    """Valida os campos do formulário de usuário e retorna a lista de erros."""
+    validador = validador_usuario if senha_obrigatoria else validador_usuario_edicao
+    _, erros = validador.validar({"nome": nome, "email": email, "senha": senha})
+    return mensagens(erros)
+
+@router.get("/", response_class=HTMLResponse, name="listar_usuarios")
+async def listar_usuarios(request: Request):
+    try:
+        usuarios = await get_all_usuarios()
+        flash = await get_flash(request)
+        messages = [flash] if flash else []
+        return templates.TemplateResponse("usuarios/lista.html", {
+            "request": request, "usuarios": usuarios, "messages": messages
+        })
+    except Exception as e:
+        logger.error(f"Erro ao listar usuários: {str(e)}", exc_info=True)
+        return templates.TemplateResponse("usuarios/lista.html", {
+            "request": request,
+            "usuarios": [],
+            "messages": [{"message": "Erro ao carregar usuários", "category": "danger"}]
+        })
+
+@router.get("/cadastrar", response_class=HTMLResponse, name="form_cadastrar_usuario")
+async def form_cadastrar_usuario(request: Request):
+    return templates.TemplateResponse("usuarios/cadastro.html", {
+        "request": request, "errors": [], "form_data": {}
+    })
+
+@router.post("/cadastrar", response_class=HTMLResponse, name="cadastrar_usuario")
+async def cadastrar_usuario(
+    request: Request,
+    nome: str = Form(...),
+    email: str = Form(...),
+    senha: str = Form(...)
+):
+    errors = validar_usuario(nome, email, senha)
+    if errors:
+        return templates.TemplateResponse("usuarios/cadastro.html", {
+            "request": request,
+            "errors": errors,
+            "form_data": {"nome": nome, "email": email}
+        })
+
+    try:
+        usuario_id = await create_usuario(UsuarioCreate(nome=nome, email=email, senha=senha))
+    except ValueError as e:
+        return templates.TemplateResponse("usuarios/cadastro.html", {
+            "request": request,
+            "errors": [str(e)],
+            "form_data": {"nome": nome, "email": email}
+        })
+
+    await registrar_log("CREATE", "usuarios", usuario_id, dados_novos={"nome": nome, "email": email}, request=request)
+    await set_flash(request, "Usuário cadastrado com sucesso!")
+    return RedirectResponse(router.url_path_for("listar_usuarios"), status_code=status.HTTP_303_SEE_OTHER)
+
+@router.get("/{id}", response_class=HTMLResponse, name="obter_usuario")
+async def obter_usuario(request: Request, id: int):
+    usuario = await get_usuario_by_id(id)
+    if not usuario:
+        raise HTTPException(status_code=404, detail="Usuário não encontrado")
+
+    flash = await get_flash(request)
+    return templates.TemplateResponse("usuarios/detalhes.html", {
+        "request": request, "usuario": usuario, "messages": [flash] if flash else []
+    })
+
+@router.get("/{id}/editar", response_class=HTMLResponse, name="form_editar_usuario")
+async def form_editar_usuario(request: Request, id: int):
+    usuario = await get_usuario_by_id(id)
+    if not usuario:
+        raise HTTPException(status_code=404, detail="Usuário não encontrado")
+
+    return templates.TemplateResponse("usuarios/editar.html", {
+        "request": request, "usuario": usuario, "errors": []
+    })
+
+@router.post("/{id}/editar", response_class=HTMLResponse, name="processar_edicao_usuario")
+async def processar_edicao_usuario(
+    request: Request,
+    id: int,
+    nome: str = Form(...),
+    email: str = Form(...),
+    senha: str = Form("")
+):
+    usuario = {"id": id, "nome": nome, "email": email}
+    errors = validar_usuario(nome, email, senha, senha_obrigatoria=False)
+    if errors:
+        return templates.TemplateResponse("usuarios/editar.html", {
+            "request": request, "usuario": usuario, "errors": errors
+        })
+
+    try:
+        usuario_atual = await get_usuario_by_id(id)
+        if not usuario_atual:
+            raise HTTPException(status_code=404, detail="Usuário não encontrado")
+
+        update_data = {"nome": nome, "email": email}
+        if senha:
+            update_data["senha"] = senha
+        await update_usuario(id, update_data)
+    except ValueError as e:
+        return templates.TemplateResponse("usuarios/editar.html", {
+            "request": request, "usuario": usuario, "errors": [str(e)]
+        })
+
+    await registrar_log("UPDATE", "usuarios", id, request=request,
+                        dados_anteriores={"nome": usuario_atual["nome"], "email": usuario_atual["email"]},
+                        dados_novos={"nome": nome, "email": email})
+    await set_flash(request, "Usuário atualizado com sucesso!")
+    return RedirectResponse(router.url_path_for("obter_usuario", id=id), status_code=status.HTTP_303_SEE_OTHER)
 
-def get_flash(request: Request):
-    """Obtém e remove a mensagem flash da sessão."""
-    if hasattr(request.state, 'session') and 'flash' in request.state.session:
-        flash = request.state.session.pop('flash')
-        return flash
-    return None
+@router.post("/{id}/deletar", name="deletar_usuario")
+async def deletar_usuario(request: Request, id: int, usuario: dict = Depends(exigir_login)):
+    # O log com os dados anteriores é gravado na mesma transação da exclusão
+    try:
+        removidos = await delete_usuario(id, id_usuario=usuario["id"], request=request)
+    except ValueError as e:
+        logger.error(f"Erro ao deletar usuário {id}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Erro ao deletar usuário")
+    if not removidos:
+        raise HTTPException(status_code=404, detail="Usuário não encontrado")
 
+    await set_flash(request, "Usuário excluído com sucesso!")
+    return RedirectResponse(router.url_path_for("listar_usuarios"), status_code=status.HTTP_303_SEE_OTHER)
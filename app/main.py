@@ -1,17 +1,150 @@
+import time
+
+_inicio_importacao = time.perf_counter()
+
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
-import uvicorn
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
 from routes.produto_route import router as produto_router
 from routes.usuario_route import router as usuario_router
+from routes.log_route import router as log_router
+from routes.estoque_route import router as estoque_router
+from routes.api_route import router as api_router
+from routes.eventos_route import router as eventos_router
+from routes.auth_route import router as auth_router
+from models.database import init_db, close_pool, get_pool, get_connection
+from models.async_db import DBOverloadError, shutdown_executor
+from models.replicas import LeituraConsistenteMiddleware, close_roteador, get_roteador
+from models.senha import shutdown_pool as shutdown_senha_pool
+from models.log_writer import log_writer
+from models.log_retention import retencao_scheduler
+from models.exclusao import expurgo_scheduler, progresso_expurgo
+from models.cache import produto_cache
+from models.produto_model import listar_produtos_pagina
+from config import Config
+from templating import templates, precompilar_templates, fragmento_cache
+from sessao import SessaoMiddleware, criar_store, secret_key
+from metricas import MetricasMiddleware, metricas
+from admissao import AdmissaoMiddleware, controle_concorrencia
+
+
+logger = logging.getLogger(__name__)
+tempos_inicializacao = {}
+
+
+def aquecer():
+    """Abre as conexões do pool e carrega a primeira página de produtos no cache."""
+    conexoes = get_pool().aquecer()
+    get_roteador().aquecer()
+    with get_connection() as conn:
+        listar_produtos_pagina(conn)
+    logger.info(f"Aquecimento concluído: {conexoes} conexões abertas")
+
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    inicio = time.perf_counter()
+    init_db()
+    precompilar_templates()
+    if Config.AQUECIMENTO_ATIVO:
+        try:
+            aquecer()
+        except Exception as e:
+            logger.warning(f"Falha no aquecimento, a aplicação segue sem ele: {str(e)}")
+    log_writer.start()
+    if Config.LOG_RETENCAO_ATIVA:
+        retencao_scheduler.start()
+    if Config.EXPURGO_ATIVO:
+        expurgo_scheduler.start()
+    tempos_inicializacao["inicializacao"] = time.perf_counter() - inicio
+    logger.info(
+        f"Aplicação pronta: importação {tempos_inicializacao['importacao'] * 1000:.0f} ms, "
+        f"inicialização {tempos_inicializacao['inicializacao'] * 1000:.0f} ms"
+    )
 
-app = FastAPI()
+    yield
+
+    # O uvicorn só chega aqui depois de concluir as requisições em andamento
+    # (ou de esgotar SERVIDOR_TIMEOUT_DESLIGAMENTO); agora esvazia as filas
+    retencao_scheduler.stop()
+    expurgo_scheduler.stop()
+    log_writer.stop(timeout=Config.SERVIDOR_TIMEOUT_DESLIGAMENTO)
+    shutdown_executor()
+    shutdown_senha_pool()
+    close_roteador()
+    close_pool()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(GZipMiddleware, minimum_size=Config.COMPRESSAO_MIN_BYTES, compresslevel=Config.COMPRESSAO_NIVEL_GZIP)
+if Config.ADMISSAO_ATIVA:
+    # Dentro da sessão, para usar o id assinado do cookie; as métricas contam as recusas
+    app.add_middleware(AdmissaoMiddleware)
+app.add_middleware(
+    SessaoMiddleware,
+    store=criar_store(),
+    secret_key=secret_key(),
+    cookie=Config.SESSAO_COOKIE,
+    ttl=Config.SESSAO_TTL,
+    secure=Config.SESSAO_COOKIE_SECURE
+)
+if Config.DB_REPLICAS:
+    app.add_middleware(LeituraConsistenteMiddleware, janela=Config.DB_REPLICA_JANELA_ESCRITA)
+if Config.METRICAS_ATIVAS:
+    app.add_middleware(MetricasMiddleware)
 
-templates = Jinja2Templates(directory="templates")
 
 app.include_router(produto_router)
 app.include_router(usuario_router)
+app.include_router(log_router)
+app.include_router(estoque_router)
+app.include_router(api_router)
+app.include_router(eventos_router)
+app.include_router(auth_router)
+
+@app.exception_handler(DBOverloadError)
+async def banco_sobrecarregado(request: Request, exc: DBOverloadError):
+    """A fila do executor do banco esgotou o tempo: recusa com 503 em vez de um erro 500."""
+    metricas.incrementar("admissao_rejeicoes_total", motivo="banco")
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": "1"})
+
+@metricas.coletor
+def coletar_estado():
+    """Estado atual do pool, dos caches, do log writer, da admissão e do expurgo, lido a cada exportação."""
+    pool = get_pool().status()
+    yield "db_pool_conexoes_em_uso", pool["em_uso"], {}
+    yield "db_pool_conexoes_ociosas", pool["ociosas"], {}
+    for replica in get_roteador().status():
+        rotulos = {"replica": replica["replica"]}
+        yield "db_replica_disponivel", int(replica["disponivel"]), rotulos
+        yield "db_replica_latencia_segundos", replica["latencia"], rotulos
+        yield "db_pool_conexoes_em_uso", replica["em_uso"], rotulos
+        yield "db_pool_conexoes_ociosas", replica["ociosas"], rotulos
+    for nome, cache in (("produtos", produto_cache), ("fragmentos", fragmento_cache)):
+        stats = cache.stats()
+        yield "cache_acertos", stats["hits"], {"cache": nome}
+        yield "cache_falhas", stats["misses"], {"cache": nome}
+        yield "cache_taxa_acerto", stats["hit_ratio"], {"cache": nome}
+        yield "cache_itens", stats["itens"], {"cache": nome}
+        yield "cache_evictions", stats["evictions"], {"cache": nome}
+    for chave, valor in log_writer.stats().items():
+        yield f"log_writer_{chave}", valor, {}
+    admissao = controle_concorrencia.status()
+    yield "admissao_em_execucao", admissao["em_execucao"], {}
+    yield "admissao_esperando", admissao["esperando"], {}
+    expurgo = progresso_expurgo.status()
+    yield "expurgo_executando", int(expurgo["executando"]), {}
+    for tabela, total in expurgo["removidos"].items():
+        yield "expurgo_removidos", total, {"tabela": tabela}
+        yield "expurgo_pendentes", max(expurgo["pendentes"][tabela] - total, 0), {"tabela": tabela}
+    for etapa, segundos in tempos_inicializacao.items():
+        yield "app_inicializacao_segundos", segundos, {"etapa": etapa}
+
+@app.get("/metrics", include_in_schema=False)
+async def exportar_metricas():
+    return PlainTextResponse(metricas.exportar(), media_type="text/plain; version=0.0.4")
 
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
@@ -26,5 +159,9 @@ async def home(request: Request):
     """
     return templates.TemplateResponse("index.html", {"request": request})
 
+tempos_inicializacao["importacao"] = time.perf_counter() - _inicio_importacao
+
 if __name__ == "__main__":
+    # Modo de desenvolvimento; em produção use servidor.py
+    import uvicorn
     uvicorn.run("main:app",host="127.0.0.1",port=8000,reload=True)
\ No newline at end of file
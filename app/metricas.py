@@ -0,0 +1,210 @@
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("slow_query")
+
+BUCKETS_TEMPO = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_CONTAGEM = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Consultas e tempo de banco acumulados pela requisição em andamento
+_requisicao = contextvars.ContextVar("metricas_requisicao", default=None)
+
+
+class _Histograma:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.contagens = [0] * (len(buckets) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float):
+        self.contagens[bisect.bisect_left(self.buckets, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+
+def _rotulos(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _formatar_rotulos(rotulos: tuple, extra: Optional[tuple] = None) -> str:
+    pares = list(rotulos) + ([extra] if extra else [])
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in pares) + "}"
+
+
+class Registro:
+    """
+    Métricas do processo em formato compatível com o Prometheus. Cada worker
+    mantém o próprio registro; o /metrics de um worker mostra só os números dele.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._contadores = {}
+        self._histogramas = {}
+        self._definicoes = {}
+        self._coletores = []
+
+    def definir(self, nome: str, tipo: str, ajuda: str, buckets: Iterable[float] = BUCKETS_TEMPO):
+        self._definicoes[nome] = (tipo, ajuda, tuple(buckets))
+
+    def incrementar(self, nome: str, valor: float = 1.0, **labels):
+        chave = (nome, _rotulos(labels))
+        with self._lock:
+            self._contadores[chave] = self._contadores.get(chave, 0.0) + valor
+
+    def observar(self, nome: str, valor: float, **labels):
+        chave = (nome, _rotulos(labels))
+        with self._lock:
+            histograma = self._histogramas.get(chave)
+            if histograma is None:
+                buckets = self._definicoes.get(nome, (None, None, BUCKETS_TEMPO))[2]
+                histograma = self._histogramas[chave] = _Histograma(buckets)
+            histograma.observar(valor)
+
+    def coletor(self, func: Callable[[], Iterable[tuple]]):
+        """Registra uma função que devolve (nome, valor, labels) lidos no momento da exportação."""
+        self._coletores.append(func)
+        return func
+
+    def exportar(self) -> str:
+        with self._lock:
+            contadores = dict(self._contadores)
+            histogramas = {
+                chave: (h.buckets, list(h.contagens), h.soma, h.total)
+                for chave, h in self._histogramas.items()
+            }
+
+        linhas = []
+        cabecalhos = set()
+
+        def cabecalho(nome, tipo_padrao):
+            if nome in cabecalhos:
+                return
+            cabecalhos.add(nome)
+            tipo, ajuda, _ = self._definicoes.get(nome, (tipo_padrao, None, None))
+            if ajuda:
+                linhas.append(f"# HELP {nome} {ajuda}")
+            linhas.append(f"# TYPE {nome} {tipo or tipo_padrao}")
+
+        for (nome, rotulos), valor in sorted(contadores.items()):
+            cabecalho(nome, "counter")
+            linhas.append(f"{nome}{_formatar_rotulos(rotulos)} {valor:g}")
+
+        for (nome, rotulos), (buckets, contagens, soma, total) in sorted(histogramas.items()):
+            cabecalho(nome, "histogram")
+            acumulado = 0
+            for limite, contagem in zip(buckets, contagens):
+                acumulado += contagem
+                linhas.append(f"{nome}_bucket{_formatar_rotulos(rotulos, ('le', f'{limite:g}'))} {acumulado}")
+            linhas.append(f"{nome}_bucket{_formatar_rotulos(rotulos, ('le', '+Inf'))} {total}")
+            linhas.append(f"{nome}_sum{_formatar_rotulos(rotulos)} {soma:g}")
+            linhas.append(f"{nome}_count{_formatar_rotulos(rotulos)} {total}")
+
+        for func in self._coletores:
+            try:
+                for nome, valor, labels in func():
+                    cabecalho(nome, "gauge")
+                    linhas.append(f"{nome}{_formatar_rotulos(_rotulos(labels))} {valor:g}")
+            except Exception as e:
+                logger.warning(f"Falha ao coletar métricas de {func.__name__}: {str(e)}")
+
+        return "\n".join(linhas) + "\n"
+
+
+metricas = Registro()
+metricas.definir("http_requisicoes_total", "counter", "Requisições atendidas")
+metricas.definir("http_requisicao_segundos", "histogram", "Latência das requisições por rota")
+metricas.definir("http_consultas_db", "histogram", "Idas ao banco por requisição (consultas, commits e rollbacks)", BUCKETS_CONTAGEM)
+metricas.definir("http_tempo_db_segundos", "histogram", "Tempo em consultas ao banco por requisição")
+metricas.definir("db_consulta_segundos", "histogram", "Duração de cada consulta ao banco")
+metricas.definir("db_pool_espera_segundos", "histogram", "Espera por uma conexão do pool")
+metricas.definir("template_render_segundos", "histogram", "Tempo de renderização por template")
+metricas.definir("log_flush_segundos", "histogram", "Duração de cada lote gravado pelo log writer")
+metricas.definir("db_leituras_total", "counter", "Leituras por destino (réplica ou primário)")
+metricas.definir("db_replica_falhas_total", "counter", "Falhas de conexão por réplica")
+
+
+def registrar_consulta(sql: str, params, duracao: float):
+    """Chamado pela camada de banco a cada execute/executemany."""
+    metricas.observar("db_consulta_segundos", duracao)
+    contexto = _requisicao.get()
+    if contexto is not None:
+        contexto["consultas"] += 1
+        contexto["tempo_db"] += duracao
+
+    if Config.SLOW_QUERY_MS > 0 and duracao * 1000 >= Config.SLOW_QUERY_MS:
+        parametros = repr(params)
+        if len(parametros) > 500:
+            parametros = parametros[:500] + "..."
+        slow_query_logger.warning(
+            f"Consulta lenta ({duracao * 1000:.1f} ms): {' '.join(str(sql).split())} | parâmetros: {parametros}"
+        )
+
+
+class MetricasMiddleware:
+    """Mede latência, status e uso do banco de cada requisição HTTP."""
+
+    def __init__(self, app):
+        self.app = app
+        self._rotas = {}
+
+    def _rota(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "desconhecida"
+        if endpoint not in self._rotas:
+            router = scope.get("router")
+            for rota in getattr(router, "routes", []):
+                if getattr(rota, "endpoint", None) is endpoint:
+                    self._rotas[endpoint] = rota.path
+                    break
+            else:
+                self._rotas[endpoint] = getattr(endpoint, "__name__", "desconhecida")
+        return self._rotas[endpoint]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        contexto = {"consultas": 0, "tempo_db": 0.0}
+        token = _requisicao.set(contexto)
+        status = 500
+
+        async def enviar(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(
+                    b"server-timing",
+                    f"db;dur={contexto['tempo_db'] * 1000:.1f}, "
+                    f"app;dur={(time.perf_counter() - inicio) * 1000:.1f}".encode("latin-1")
+                )]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _requisicao.reset(token)
+            duracao = time.perf_counter() - inicio
+            rota = self._rota(scope)
+            metodo = scope["method"]
+            metricas.incrementar("http_requisicoes_total", metodo=metodo, rota=rota, status=status)
+            metricas.observar("http_requisicao_segundos", duracao, metodo=metodo, rota=rota)
+            metricas.observar("http_consultas_db", contexto["consultas"], rota=rota)
+            metricas.observar("http_tempo_db_segundos", contexto["tempo_db"], rota=rota)
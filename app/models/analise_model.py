@@ -0,0 +1,330 @@
+import bisect
+import heapq
+import json
+import logging
+import math
+import threading
+import time
+from array import array
+from datetime import timedelta
+from typing import List
+
+import mysql.connector
+
+from config import Config
+from models.cache import produto_cache
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+logger = logging.getLogger(__name__)
+
+PERCENTIS = (10, 25, 50, 75, 90, 99)
+
+# Releitura de segurança na atualização incremental: uma transação que gravou
+# updated_at antes da marca só fica visível quando faz o commit
+MARGEM_INCREMENTAL = timedelta(seconds=5)
+
+SELECT_COLUNAS = "SELECT id, preco, estoque, updated_at, removido_em FROM produtos"
+
+
+def _percentil_linear(ordenados, p: float) -> float:
+    """Percentil com interpolação linear, o mesmo método padrão do numpy.percentile."""
+    posicao = p / 100 * (len(ordenados) - 1)
+    abaixo = math.floor(posicao)
+    acima = min(abaixo + 1, len(ordenados) - 1)
+    return ordenados[abaixo] + (ordenados[acima] - ordenados[abaixo]) * (posicao - abaixo)
+
+
+def _faixas(minimo: float, maximo: float, quantidade: int) -> List[float]:
+    largura = (maximo - minimo) / quantidade
+    return [minimo + largura * i for i in range(quantidade)] + [maximo]
+
+
+def _histograma(limites: List[float], contagens) -> List[dict]:
+    return [
+        {"de": round(limites[i], 2), "ate": round(limites[i + 1], 2), "quantidade": int(contagens[i])}
+        for i in range(len(contagens))
+    ]
+
+
+class InstantaneoCatalogo:
+    """
+    Preço e estoque de todos os produtos em arrays compactos (8 bytes por
+    valor), lidos em lotes e depois mantidos em dia só com as linhas cujo
+    updated_at mudou. Com o NumPy instalado, os cálculos são vetorizados
+    sobre os mesmos buffers, sem cópia.
+    """
+
+    def __init__(self, lote: int = 5000, recarga_total: float = 3600):
+        self.lote = lote
+        self.recarga_total = recarga_total
+        self._lock = threading.Lock()
+        self._limpar()
+
+    def _limpar(self):
+        self.ids = array("q")
+        self.precos = array("d")
+        self.estoques = array("q")
+        self.posicoes = {}
+        self.marca = None
+        self.carregado_em = 0.0
+
+    def _descartar(self, id, posicao):
+        # Troca com o último e encurta: os arrays continuam contíguos
+        ultimo = len(self.ids) - 1
+        if posicao != ultimo:
+            self.ids[posicao] = self.ids[ultimo]
+            self.precos[posicao] = self.precos[ultimo]
+            self.estoques[posicao] = self.estoques[ultimo]
+            self.posicoes[self.ids[posicao]] = posicao
+        del self.posicoes[id]
+        self.ids.pop()
+        self.precos.pop()
+        self.estoques.pop()
+
+    def _aplicar(self, linhas):
+        for id, preco, estoque, updated_at, removido_em in linhas:
+            posicao = self.posicoes.get(id)
+            if removido_em is not None:
+                # A exclusão lógica também muda updated_at, então chega pela leitura incremental
+                if posicao is not None:
+                    self._descartar(id, posicao)
+            elif posicao is None:
+                self.posicoes[id] = len(self.ids)
+                self.ids.append(id)
+                self.precos.append(float(preco))
+                self.estoques.append(estoque)
+            else:
+                self.precos[posicao] = float(preco)
+                self.estoques[posicao] = estoque
+            if self.marca is None or updated_at > self.marca:
+                self.marca = updated_at
+
+    def _carregar_tudo(self, db: mysql.connector.MySQLConnection):
+        self._limpar()
+        cursor = db.cursor()
+        ultimo_id = 0
+        while True:
+            cursor.execute(
+                f"{SELECT_COLUNAS} WHERE removido_em IS NULL AND id > %s ORDER BY id LIMIT %s",
+                (ultimo_id, self.lote)
+            )
+            linhas = cursor.fetchall()
+            self._aplicar(linhas)
+            if len(linhas) < self.lote:
+                break
+            ultimo_id = linhas[-1][0]
+        cursor.close()
+        self.carregado_em = time.monotonic()
+
+    def sincronizar(self, db: mysql.connector.MySQLConnection) -> str:
+        """Põe o instantâneo em dia; retorna "completa" ou "incremental"."""
+        if self.marca is None or time.monotonic() - self.carregado_em > self.recarga_total:
+            self._carregar_tudo(db)
+            return "completa"
+
+        cursor = db.cursor()
+        cursor.execute(f"{SELECT_COLUNAS} WHERE updated_at >= %s", (self.marca - MARGEM_INCREMENTAL,))
+        self._aplicar(cursor.fetchall())
+        cursor.execute("SELECT COUNT(*) FROM produtos WHERE removido_em IS NULL")
+        total = cursor.fetchone()[0]
+        cursor.close()
+        if total != len(self.ids):
+            # Linhas apagadas direto no banco não aparecem por updated_at; só uma releitura as descarta
+            self._carregar_tudo(db)
+            return "completa"
+        return "incremental"
+
+    def calcular(self, limite_baixo: int, faixas: int, max_itens: int) -> dict:
+        if not self.ids:
+            return _resumo_vazio(limite_baixo)
+        if numpy is not None:
+            return self._calcular_numpy(limite_baixo, faixas, max_itens)
+        return self._calcular_python(limite_baixo, faixas, max_itens)
+
+    def _calcular_numpy(self, limite_baixo, faixas, max_itens) -> dict:
+        ids = numpy.frombuffer(self.ids, dtype=numpy.int64)
+        precos = numpy.frombuffer(self.precos, dtype=numpy.float64)
+        estoques = numpy.frombuffer(self.estoques, dtype=numpy.int64)
+
+        baixo = numpy.flatnonzero(estoques <= limite_baixo)
+        ordem = numpy.lexsort((ids[baixo], estoques[baixo]))[:max_itens]
+        contagens, limites = numpy.histogram(precos, bins=faixas)
+        # Só escalares e listas saem daqui: views dos buffers impediriam os arrays de crescer
+        return {
+            "produtos": int(len(ids)),
+            "unidades": int(estoques.sum()),
+            "valor_estoque": round(float(numpy.dot(precos, estoques)), 2),
+            "sem_estoque": int(numpy.count_nonzero(estoques == 0)),
+            "estoque_baixo": {"limite": limite_baixo, "total": int(len(baixo)), "ids": ids[baixo][ordem].tolist()},
+            "precos": {
+                "minimo": round(float(precos.min()), 2),
+                "maximo": round(float(precos.max()), 2),
+                "media": round(float(precos.mean()), 2),
+                "percentis": {
+                    f"p{p}": round(float(v), 2) for p, v in zip(PERCENTIS, numpy.percentile(precos, PERCENTIS))
+                },
+                "histograma": _histograma(limites.tolist(), contagens.tolist()),
+            },
+        }
+
+    def _calcular_python(self, limite_baixo, faixas, max_itens) -> dict:
+        ordenados = sorted(self.precos)
+        minimo, maximo = ordenados[0], ordenados[-1]
+        limites = _faixas(minimo, maximo, faixas)
+        contagens = [0] * faixas
+        for preco in ordenados:
+            # Como no numpy.histogram, a última faixa inclui o máximo
+            contagens[min(bisect.bisect_right(limites, preco) - 1, faixas - 1)] += 1
+
+        baixos = [(e, id) for e, id in zip(self.estoques, self.ids) if e <= limite_baixo]
+        return {
+            "produtos": len(self.ids),
+            "unidades": sum(self.estoques),
+            "valor_estoque": round(math.fsum(p * e for p, e in zip(self.precos, self.estoques)), 2),
+            "sem_estoque": sum(1 for e in self.estoques if e == 0),
+            "estoque_baixo": {
+                "limite": limite_baixo,
+                "total": len(baixos),
+                "ids": [id for _, id in heapq.nsmallest(max_itens, baixos)],
+            },
+            "precos": {
+                "minimo": round(minimo, 2),
+                "maximo": round(maximo, 2),
+                "media": round(math.fsum(ordenados) / len(ordenados), 2),
+                "percentis": {f"p{p}": round(_percentil_linear(ordenados, p), 2) for p in PERCENTIS},
+                "histograma": _histograma(limites, contagens),
+            },
+        }
+
+
+def _resumo_vazio(limite_baixo: int) -> dict:
+    return {
+        "produtos": 0, "unidades": 0, "valor_estoque": 0.0, "sem_estoque": 0,
+        "estoque_baixo": {"limite": limite_baixo, "total": 0, "ids": []},
+        "precos": {"minimo": None, "maximo": None, "media": None, "percentis": {}, "histograma": []},
+    }
+
+
+def _resumo_sql(db: mysql.connector.MySQLConnection, limite_baixo: int, faixas: int, max_itens: int) -> dict:
+    """Os mesmos números calculados pelo MySQL, sem trazer as linhas para a aplicação."""
+    cursor = db.cursor()
+    cursor.execute(
+        """
+        SELECT COUNT(*), COALESCE(SUM(estoque), 0), COALESCE(SUM(preco * estoque), 0),
+               COALESCE(SUM(estoque = 0), 0), MIN(preco), MAX(preco), AVG(preco)
+        FROM produtos WHERE removido_em IS NULL
+        """
+    )
+    total, unidades, valor, sem_estoque, minimo, maximo, media = cursor.fetchone()
+    if not total:
+        cursor.close()
+        return _resumo_vazio(limite_baixo)
+
+    cursor.execute("SELECT COUNT(*) FROM produtos WHERE removido_em IS NULL AND estoque <= %s", (limite_baixo,))
+    total_baixo = cursor.fetchone()[0]
+    cursor.execute(
+        "SELECT id FROM produtos WHERE removido_em IS NULL AND estoque <= %s ORDER BY estoque, id LIMIT %s",
+        (limite_baixo, max_itens)
+    )
+    ids_baixo = [linha[0] for linha in cursor.fetchall()]
+
+    # Cada percentil lê só duas linhas, percorrendo o índice (removido_em, preco, id)
+    percentis = {}
+    for p in PERCENTIS:
+        posicao = p / 100 * (total - 1)
+        cursor.execute(
+            "SELECT preco FROM produtos WHERE removido_em IS NULL ORDER BY preco, id LIMIT 2 OFFSET %s",
+            (math.floor(posicao),)
+        )
+        valores = [float(linha[0]) for linha in cursor.fetchall()]
+        percentis[f"p{p}"] = round(_percentil_linear(valores, (posicao - math.floor(posicao)) * 100), 2)
+
+    minimo, maximo = float(minimo), float(maximo)
+    limites = _faixas(minimo, maximo, faixas)
+    contagens = [0] * faixas
+    if maximo > minimo:
+        cursor.execute(
+            """
+            SELECT LEAST(FLOOR((preco - %s) / %s), %s) AS faixa, COUNT(*)
+            FROM produtos WHERE removido_em IS NULL GROUP BY faixa
+            """,
+            (minimo, (maximo - minimo) / faixas, faixas - 1)
+        )
+        for faixa, quantidade in cursor.fetchall():
+            contagens[int(faixa)] += quantidade
+    else:
+        contagens[-1] = total
+    cursor.close()
+
+    return {
+        "produtos": total,
+        "unidades": int(unidades),
+        "valor_estoque": round(float(valor), 2),
+        "sem_estoque": int(sem_estoque),
+        "estoque_baixo": {"limite": limite_baixo, "total": total_baixo, "ids": ids_baixo},
+        "precos": {
+            "minimo": round(minimo, 2),
+            "maximo": round(maximo, 2),
+            "media": round(float(media), 2),
+            "percentis": percentis,
+            "histograma": _histograma(limites, contagens),
+        },
+    }
+
+
+def _detalhar_estoque_baixo(resumo: dict, db: mysql.connector.MySQLConnection) -> dict:
+    ids = resumo["estoque_baixo"].pop("ids")
+    produtos = []
+    if ids:
+        cursor = db.cursor(dictionary=True)
+        cursor.execute(
+            f"SELECT id, nome, preco, estoque FROM produtos "
+            f"WHERE id IN ({', '.join(['%s'] * len(ids))}) AND removido_em IS NULL",
+            tuple(ids)
+        )
+        por_id = {p["id"]: p for p in cursor.fetchall()}
+        cursor.close()
+        produtos = [por_id[id] for id in ids if id in por_id]
+    resumo["estoque_baixo"]["produtos"] = produtos
+    return resumo
+
+
+instantaneo = InstantaneoCatalogo(Config.ANALISE_LOTE, Config.ANALISE_RECARGA_TOTAL)
+
+
+def resumo_catalogo(
+    db: mysql.connector.MySQLConnection,
+    limite_baixo: int = Config.ANALISE_ESTOQUE_BAIXO,
+    faixas: int = 10,
+    max_itens: int = 50
+) -> dict:
+    """
+    Valor total do estoque, produtos com estoque baixo e distribuição de preços.
+
+    No modo "memoria" (padrão) os números vêm do instantâneo local, atualizado
+    de forma incremental a cada chamada. No modo "sql" a agregação é feita pelo
+    MySQL e o resultado fica em cache até a próxima escrita em produtos.
+    """
+    if not 1 <= faixas <= 100:
+        raise ValueError("O número de faixas deve estar entre 1 e 100")
+    if not 0 <= max_itens <= 500:
+        raise ValueError("O número de itens deve estar entre 0 e 500")
+    if Config.ANALISE_MODO == "sql":
+        chave = "produtos:analise:{}:{}".format(
+            produto_cache.geracao("produtos"), json.dumps([limite_baixo, faixas, max_itens])
+        )
+        resumo = produto_cache.get_or_load(
+            chave, lambda: _detalhar_estoque_baixo(_resumo_sql(db, limite_baixo, faixas, max_itens), db)
+        )
+        return {**resumo, "modo": "sql"}
+
+    with instantaneo._lock:
+        leitura = instantaneo.sincronizar(db)
+        resumo = instantaneo.calcular(limite_baixo, faixas, max_itens)
+        marca = instantaneo.marca
+    resumo = _detalhar_estoque_baixo(resumo, db)
+    return {**resumo, "modo": "memoria", "leitura": leitura, "atualizado_ate": marca}
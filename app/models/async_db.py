@@ -0,0 +1,276 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from fastapi import Request
+
+from config import Config
+from models.database import get_connection
+from models import produto_model, usuario_model, log_model, estoque_model, analise_model, eventos_model, exclusao
+from models.replicas import get_roteador, marcar_escrita
+from models.unidade_trabalho import UnidadeDeTrabalho
+from models.senha import hash_senha, verificar_senha
+
+logger = logging.getLogger(__name__)
+
+
+class DBOverloadError(Exception):
+    """Fila do executor do banco cheia por mais tempo que o limite configurado."""
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_semaforos = weakref.WeakKeyDictionary()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=Config.DB_EXECUTOR_WORKERS,
+                    thread_name_prefix="db"
+                )
+    return _executor
+
+
+def shutdown_executor(wait: bool = True):
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait)
+            _executor = None
+
+
+def _semaforo() -> asyncio.Semaphore:
+    # Um semáforo por event loop: limita quantas chamadas ficam em execução
+    # ou aguardando uma thread, aplicando back-pressure aos handlers.
+    loop = asyncio.get_running_loop()
+    sem = _semaforos.get(loop)
+    if sem is None:
+        sem = asyncio.Semaphore(Config.DB_EXECUTOR_WORKERS + Config.DB_EXECUTOR_MAX_PENDING)
+        _semaforos[loop] = sem
+    return sem
+
+
+async def run_sync(func, *args, **kwargs):
+    """Executa uma função síncrona bloqueante no executor do banco."""
+    sem = _semaforo()
+    try:
+        await asyncio.wait_for(sem.acquire(), Config.DB_EXECUTOR_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning(f"Executor do banco saturado ao chamar {func.__name__}")
+        raise DBOverloadError("Banco de dados sobrecarregado, tente novamente")
+    try:
+        loop = asyncio.get_running_loop()
+        # Leva o contexto da requisição (ex.: contadores de métricas) para a thread
+        contexto = contextvars.copy_context()
+        return await loop.run_in_executor(
+            get_executor(), functools.partial(contexto.run, func, *args, **kwargs)
+        )
+    finally:
+        sem.release()
+
+
+def _com_conexao(func, *args, **kwargs):
+    with get_connection() as conn:
+        return func(*args, db=conn, **kwargs)
+
+
+async def run_db(func, *args, **kwargs):
+    """Executa `func(*args, db=conexao, **kwargs)` no executor com uma conexão do pool."""
+    return await run_sync(_com_conexao, func, *args, **kwargs)
+
+
+async def run_leitura(func, *args, **kwargs):
+    """Como run_db, para funções só de leitura: podem ir a uma réplica (ver models/replicas.py)."""
+    return await run_sync(get_roteador().executar, func, *args, **kwargs)
+
+
+async def run_escrita(func, *args, **kwargs):
+    """Como run_db, marcando a escrita para que as leituras seguintes do usuário vejam o resultado."""
+    marcar_escrita()
+    return await run_db(func, *args, **kwargs)
+
+
+# Produtos
+
+async def get_all_produtos():
+    return await run_leitura(produto_model.get_all_produtos)
+
+
+async def listar_produtos_pagina(**kwargs):
+    return await run_leitura(produto_model.listar_produtos_pagina, **kwargs)
+
+
+async def buscar_produtos(termo: str, **kwargs):
+    return await run_leitura(produto_model.buscar_produtos, termo, **kwargs)
+
+
+async def get_produto_by_id(id: int):
+    return await run_leitura(produto_model.get_produto_by_id, id)
+
+
+async def create_produto(produto: produto_model.ProdutoCreate):
+    return await run_escrita(produto_model.create_produto, produto)
+
+
+async def update_produto(id: int, produto: produto_model.ProdutoBase, versao: Optional[int] = None):
+    return await run_escrita(produto_model.update_produto, id, produto, versao=versao)
+
+
+async def delete_produto(id: int):
+    return await run_escrita(produto_model.delete_produto, id)
+
+
+async def remover_produtos(**criterios):
+    return await run_escrita(produto_model.remover_produtos, **criterios)
+
+
+# Unidade de trabalho
+
+def unidade_de_trabalho(request: Request) -> UnidadeDeTrabalho:
+    """Unidade de trabalho da requisição, criada no primeiro uso."""
+    uow = getattr(request.state, "unidade_trabalho", None)
+    if uow is None:
+        uow = request.state.unidade_trabalho = UnidadeDeTrabalho(request)
+    return uow
+
+
+async def carregar_produto(uow: UnidadeDeTrabalho, id: int):
+    # Produto já lido nesta requisição não passa pelo executor
+    if id in uow.produtos:
+        return uow.produtos[id]
+    return await run_db(uow.carregar_produto, id)
+
+
+async def salvar(uow: UnidadeDeTrabalho):
+    # Leitura com bloqueio, alterações, log e commit numa só chamada, na mesma conexão
+    return await run_escrita(uow.commit)
+
+
+# Estoque
+
+async def ajustar_estoque(id: int, delta: int):
+    return await run_escrita(estoque_model.ajustar_estoque, id, delta)
+
+
+async def reservar_estoque(itens: list):
+    return await run_escrita(estoque_model.reservar_estoque, itens)
+
+
+async def liberar_estoque(itens: list):
+    return await run_escrita(estoque_model.liberar_estoque, itens)
+
+
+# Análise
+
+async def resumo_catalogo(**kwargs):
+    if Config.ANALISE_MODO == "sql":
+        return await run_leitura(analise_model.resumo_catalogo, **kwargs)
+    # O instantâneo é atualizado pela marca de updated_at: uma réplica atrasada perderia alterações
+    return await run_db(analise_model.resumo_catalogo, **kwargs)
+
+
+# Usuários
+
+async def get_all_usuarios():
+    return await run_leitura(usuario_model.get_all_usuarios)
+
+
+async def get_usuario_by_id(id: int):
+    return await run_leitura(usuario_model.get_usuario_by_id, id)
+
+
+async def create_usuario(usuario: usuario_model.UsuarioCreate):
+    # O hash é calculado antes de pegar uma conexão, para não segurá-la durante o bcrypt
+    senha_hash = await hash_senha(usuario.senha)
+    return await run_escrita(usuario_model.create_usuario, usuario, senha_hash=senha_hash)
+
+
+async def update_usuario(id: int, update_data: dict):
+    update_data = dict(update_data)
+    senha_hash = None
+    if update_data.get("senha"):
+        senha_hash = await hash_senha(update_data.pop("senha"))
+    return await run_escrita(usuario_model.update_usuario, id, update_data, senha_hash=senha_hash)
+
+
+async def delete_usuario(id: int, id_usuario: Optional[int] = None, request: Optional[Request] = None):
+    return await run_escrita(usuario_model.delete_usuario, id, id_usuario=id_usuario, request=request)
+
+
+async def remover_usuarios(**criterios):
+    return await run_escrita(usuario_model.remover_usuarios, **criterios)
+
+
+async def autenticar_usuario(email: str, senha: str) -> Optional[dict]:
+    """
+    Confere email e senha e retorna o usuário, ou None. Se o hash guardado usar
+    um custo ou esquema desatualizado, ele é refeito com a configuração atual.
+    """
+    credenciais = await run_db(usuario_model.get_credenciais, email)
+    valida, novo_hash = await verificar_senha(senha, credenciais["senha"] if credenciais else None)
+    if not valida:
+        return None
+    if novo_hash:
+        await run_db(usuario_model.atualizar_hash_senha, credenciais["id"], novo_hash)
+    return await get_usuario_by_id(credenciais["id"])
+
+
+# Expurgo
+
+async def status_expurgo() -> dict:
+    """Registros aguardando o expurgo (no banco) e o andamento da execução neste worker."""
+    pendentes = await run_db(exclusao.pendentes_expurgo)
+    return {"pendentes": pendentes, "execucao": exclusao.progresso_expurgo.status()}
+
+
+# Logs
+
+async def registrar_log(
+    tipo_operacao: str,
+    tabela_afetada: str,
+    id_registro: Optional[int] = None,
+    dados_anteriores: Optional[dict] = None,
+    dados_novos: Optional[dict] = None,
+    id_usuario: Optional[int] = None,
+    request: Optional[Request] = None
+):
+    # Apenas enfileira para o log_writer; não ocupa o executor nem uma conexão
+    log_model.registrar_log(
+        tipo_operacao, tabela_afetada, id_registro,
+        dados_anteriores, dados_novos, id_usuario, request
+    )
+
+
+async def consultar_logs(**filtros):
+    return await run_leitura(log_model.consultar_logs, **filtros)
+
+
+async def historico_registro(tabela: str, id_registro: int):
+    return await run_leitura(log_model.historico_registro, tabela, id_registro)
+
+
+# Eventos (sempre no primário: a posição de leitura não pode voltar numa réplica atrasada)
+
+async def ler_eventos(**kwargs):
+    return await run_db(eventos_model.ler_eventos, **kwargs)
+
+
+async def ultimo_evento():
+    return await run_db(eventos_model.ultimo_evento)
+
+
+async def posicao_consumidor(nome: str):
+    return await run_db(eventos_model.posicao_consumidor, nome)
+
+
+async def salvar_posicao(nome: str, posicao: int):
+    return await run_escrita(eventos_model.salvar_posicao, nome, posicao)
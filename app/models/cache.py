@@ -0,0 +1,277 @@
+import contextvars
+import heapq
+import itertools
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_AUSENTE = object()
+
+# Requisição que precisa ler as próprias escritas (ver models/replicas.py): em vez
+# de usar o valor em cache, que pode ter vindo de uma réplica atrasada, lê de novo
+# e substitui o valor guardado
+renovar = contextvars.ContextVar("cache_renovar", default=False)
+
+
+class CacheBackend:
+    """Interface dos backends de cache. Valores ausentes ou expirados retornam None."""
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def incr(self, key: str) -> int:
+        raise NotImplementedError
+
+    def get_counter(self, key: str) -> int:
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        return 0
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Cache LRU em memória, limitado por número de itens e com TTL por entrada."""
+
+    def __init__(self, max_itens: int = 10000):
+        self.max_itens = max_itens
+        self.evictions = 0
+        self._dados = OrderedDict()
+        # Contadores ficam fora do LRU: perder uma geração por eviction
+        # reativaria entradas antigas
+        self._contadores = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._dados.get(key)
+            if item is None:
+                return None
+            valor, expira_em = item
+            if expira_em is not None and expira_em <= time.monotonic():
+                del self._dados[key]
+                return None
+            self._dados.move_to_end(key)
+            return valor
+
+    def set(self, key, value, ttl=None):
+        expira_em = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._dados[key] = (value, expira_em)
+            self._dados.move_to_end(key)
+            while len(self._dados) > self.max_itens:
+                self._dados.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._dados.pop(key, None)
+
+    def incr(self, key):
+        with self._lock:
+            self._contadores[key] = self._contadores.get(key, 0) + 1
+            return self._contadores[key]
+
+    def get_counter(self, key):
+        return self._contadores.get(key, 0)
+
+    def clear(self):
+        with self._lock:
+            self._dados.clear()
+            self._contadores.clear()
+
+    def __len__(self):
+        return len(self._dados)
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Backend compartilhado entre workers usando um servidor compatível com Redis.
+    Requer o pacote `redis`, importado apenas quando este backend é escolhido.
+    """
+
+    def __init__(self, url: str, prefixo: str = "gp:"):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self._prefixo = prefixo
+
+    def get(self, key):
+        bruto = self._client.get(self._prefixo + key)
+        return pickle.loads(bruto) if bruto is not None else None
+
+    def set(self, key, value, ttl=None):
+        self._client.set(
+            self._prefixo + key,
+            pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL),
+            ex=int(ttl) if ttl else None
+        )
+
+    def delete(self, key):
+        self._client.delete(self._prefixo + key)
+
+    def incr(self, key):
+        return int(self._client.incr(self._prefixo + key))
+
+    def get_counter(self, key):
+        bruto = self._client.get(self._prefixo + key)
+        return int(bruto) if bruto is not None else 0
+
+    def clear(self):
+        for key in self._client.scan_iter(self._prefixo + "*"):
+            self._client.delete(key)
+
+    def __len__(self):
+        return sum(1 for _ in self._client.scan_iter(self._prefixo + "*"))
+
+
+class Cache:
+    """
+    Cache read-through com contadores de acertos e falhas.
+
+    Com `repetir_invalidacao` > 0, cada invalidação é repetida depois desse
+    tempo: uma leitura numa réplica ainda sem a escrita pode ter guardado o
+    valor antigo logo depois da primeira invalidação. A repetição roda numa
+    thread deste processo e só alcança os outros workers se o backend for
+    compartilhado (Redis); servidor.py exige isso com réplicas e vários workers.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: Optional[float] = None, repetir_invalidacao: float = 0):
+        self.backend = backend
+        self.ttl = ttl
+        self.repetir_invalidacao = repetir_invalidacao
+        self.hits = 0
+        self.misses = 0
+        self._repetir = []
+        self._ordem = itertools.count()
+        self._lock = threading.Lock()
+        self._agendou = threading.Condition(self._lock)
+        self._repetidor = None
+
+    def get(self, key: str):
+        try:
+            valor = self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Falha ao ler do cache: {str(e)}")
+            valor = None
+        if valor is None:
+            self.misses += 1
+            return _AUSENTE
+        self.hits += 1
+        return valor
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        try:
+            self.backend.set(key, value, ttl or self.ttl)
+        except Exception as e:
+            logger.warning(f"Falha ao gravar no cache: {str(e)}")
+
+    def get_or_load(self, key: str, loader: Callable[[], Any], ttl: Optional[float] = None):
+        valor = _AUSENTE if renovar.get() else self.get(key)
+        if valor is not _AUSENTE:
+            return valor
+        valor = loader()
+        # Resultados vazios não são guardados para não mascarar inserções
+        if valor is not None:
+            self.set(key, valor, ttl)
+        return valor
+
+    def _agendar(self, acao: Callable[[str], None], argumento: str):
+        if self.repetir_invalidacao <= 0:
+            return
+        with self._agendou:
+            heapq.heappush(
+                self._repetir, (time.monotonic() + self.repetir_invalidacao, next(self._ordem), acao, argumento)
+            )
+            # Iniciada no primeiro uso: cada worker tem a sua
+            if self._repetidor is None:
+                self._repetidor = threading.Thread(target=self._repetir_pendentes, name="cache-invalidacao", daemon=True)
+                self._repetidor.start()
+            self._agendou.notify()
+
+    def _repetir_pendentes(self):
+        """Repete cada invalidação no prazo, mesmo que o processo não leia mais do cache."""
+        while True:
+            with self._agendou:
+                while not self._repetir or self._repetir[0][0] > time.monotonic():
+                    self._agendou.wait(self._repetir[0][0] - time.monotonic() if self._repetir else None)
+                agora = time.monotonic()
+                devidas = []
+                while self._repetir and self._repetir[0][0] <= agora:
+                    devidas.append(heapq.heappop(self._repetir))
+            for _, _, acao, argumento in devidas:
+                acao(argumento)
+
+    def _apagar(self, key: str):
+        try:
+            self.backend.delete(key)
+        except Exception as e:
+            logger.warning(f"Falha ao invalidar cache: {str(e)}")
+
+    def invalidate(self, key: str):
+        self._apagar(key)
+        self._agendar(self._apagar, key)
+
+    def geracao(self, namespace: str) -> int:
+        """Número de geração de um grupo de chaves; mudar a geração invalida o grupo todo."""
+        chave = f"geracao:{namespace}"
+        try:
+            return self.backend.get_counter(chave)
+        except Exception as e:
+            logger.warning(f"Falha ao ler geração do cache: {str(e)}")
+            return 0
+
+    def _nova_geracao(self, namespace: str):
+        try:
+            self.backend.incr(f"geracao:{namespace}")
+        except Exception as e:
+            logger.warning(f"Falha ao invalidar cache: {str(e)}")
+
+    def invalidate_namespace(self, namespace: str):
+        self._nova_geracao(namespace)
+        self._agendar(self._nova_geracao, namespace)
+
+    def clear(self):
+        self.backend.clear()
+        with self._lock:
+            self._repetir.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "itens": len(self.backend),
+            "evictions": getattr(self.backend, "evictions", 0),
+        }
+
+
+def criar_backend() -> CacheBackend:
+    if Config.CACHE_BACKEND == "redis":
+        return RedisCacheBackend(Config.CACHE_URL)
+    return MemoryCacheBackend(Config.CACHE_MAX_ITENS)
+
+
+# Com réplicas, a invalidação se repete ao fim da janela em que elas podem estar atrasadas
+produto_cache = Cache(
+    criar_backend(), ttl=Config.CACHE_TTL,
+    repetir_invalidacao=Config.DB_REPLICA_JANELA_ESCRITA if Config.DB_REPLICAS else 0
+)
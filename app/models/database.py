@@ -1,26 +1,333 @@
 import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple, Optional
 import mysql.connector
 from config import Config
+from metricas import metricas, registrar_consulta
 
 logger = logging.getLogger(__name__)
 
-def get_db():
+
+class PoolTimeoutError(Exception):
+    """Nenhuma conexão ficou disponível dentro do tempo limite do pool."""
+
+
+def _connect(database: bool = True, host: Optional[str] = None, port=None):
     config = Config()
-    conn = mysql.connector.connect(
-        host=config.MYSQL_HOST,
+    params = dict(
+        host=host or config.MYSQL_HOST,
         user=config.MYSQL_USER,
         password=config.MYSQL_PASSWORD,
-        port=config.MYSQL_PORT
+        port=port or config.MYSQL_PORT
     )
-    
+    if database:
+        params["database"] = config.MYSQL_DB
+    return mysql.connector.connect(**params)
+
+
+# Fuso em que as conexões devolvem as colunas TIMESTAMP (o time_zone da sessão,
+# por padrão o do servidor MySQL). Lido a cada conexão nova: com a reciclagem
+# do pool, acompanha a mudança de horário de verão. None enquanto não lido.
+_fuso_banco: Optional[timezone] = None
+
+
+def _ler_fuso(conn):
+    global _fuso_banco
     try:
-        # Verifica e cria o banco de dados se não existir
         cursor = conn.cursor()
-        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {config.MYSQL_DB}")
-        cursor.execute(f"USE {config.MYSQL_DB}")
-        
-        # Criação das tabelas
-        cursor.execute("""
+        cursor.execute("SELECT TIMESTAMPDIFF(MINUTE, UTC_TIMESTAMP(), NOW())")
+        minutos = cursor.fetchone()[0]
+        cursor.close()
+    except Exception as e:
+        logger.warning(f"Falha ao ler o fuso horário do banco: {str(e)}")
+        return
+    _fuso_banco = timezone(timedelta(minutes=int(minutos)))
+
+
+def como_utc(data: datetime) -> datetime:
+    """Converte para UTC uma data lida do banco; sem fuso, ela está no fuso das conexões."""
+    if data.tzinfo is None:
+        # Antes da primeira conexão, supõe o banco no mesmo fuso da aplicação
+        data = data.replace(tzinfo=_fuso_banco) if _fuso_banco else data.astimezone()
+    return data.astimezone(timezone.utc)
+
+
+class ConnectionPool:
+    """
+    Pool de conexões MySQL com overflow, verificação de saúde no checkout
+    e reciclagem por idade.
+
+    Até `size` conexões ficam ociosas aguardando reuso; além disso podem ser
+    abertas até `max_overflow` conexões extras, fechadas na devolução.
+    """
+
+    def __init__(self, size: int, max_overflow: int, timeout: float,
+                 recycle: int, pre_ping: bool, connect=_connect):
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self._connect = connect
+        self._idle = deque()
+        self._criado_em = {}
+        self._em_uso = 0
+        self._cond = threading.Condition()
+        self._fechado = False
+
+    def _nova_conexao(self):
+        conn = self._connect()
+        self._criado_em[id(conn)] = time.monotonic()
+        _ler_fuso(conn)
+        return conn
+
+    def _descartar(self, conn):
+        self._criado_em.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _expirada(self, conn) -> bool:
+        if self.recycle <= 0:
+            return False
+        criado_em = self._criado_em.get(id(conn), 0)
+        return time.monotonic() - criado_em > self.recycle
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._fechado:
+                    raise PoolTimeoutError("Pool de conexões encerrado")
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._em_uso < self.size + self.max_overflow:
+                    conn = None
+                    break
+                restante = deadline - time.monotonic()
+                if restante <= 0:
+                    raise PoolTimeoutError(
+                        f"Tempo esgotado aguardando conexão ({self.timeout}s)"
+                    )
+                self._cond.wait(restante)
+            self._em_uso += 1
+
+        try:
+            if conn is not None and self._expirada(conn):
+                self._descartar(conn)
+                conn = None
+            if conn is not None and self.pre_ping and not conn.is_connected():
+                logger.warning("Conexão ociosa inválida descartada do pool")
+                self._descartar(conn)
+                conn = None
+            if conn is None:
+                conn = self._nova_conexao()
+            return conn
+        except Exception:
+            with self._cond:
+                self._em_uso -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn):
+        reutilizavel = True
+        try:
+            # Nunca devolve ao pool uma transação aberta: além de segurar locks,
+            # manteria um snapshot antigo para o próximo usuário da conexão.
+            if conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            reutilizavel = False
+
+        with self._cond:
+            self._em_uso -= 1
+            if reutilizavel and not self._fechado and len(self._idle) < self.size:
+                self._idle.append(conn)
+                conn = None
+            self._cond.notify()
+
+        if conn is not None:
+            self._descartar(conn)
+
+    def aquecer(self, quantidade: Optional[int] = None) -> int:
+        """Abre conexões ociosas até `quantidade` (no máximo `size`) antes da primeira requisição."""
+        quantidade = self.size if quantidade is None else min(quantidade, self.size)
+        with self._cond:
+            faltam = quantidade - len(self._idle) - self._em_uso
+        novas = [self._nova_conexao() for _ in range(max(0, faltam))]
+        sobras = []
+        with self._cond:
+            for conn in novas:
+                if not self._fechado and len(self._idle) < self.size:
+                    self._idle.append(conn)
+                else:
+                    sobras.append(conn)
+            self._cond.notify_all()
+        for conn in sobras:
+            self._descartar(conn)
+        return len(novas) - len(sobras)
+
+    def close(self):
+        with self._cond:
+            self._fechado = True
+            ociosas = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn in ociosas:
+            self._descartar(conn)
+
+    def status(self) -> dict:
+        with self._cond:
+            return {
+                "tamanho": self.size,
+                "max_overflow": self.max_overflow,
+                "em_uso": self._em_uso,
+                "ociosas": len(self._idle),
+            }
+
+
+class _CursorInstrumentado:
+    """Repassa tudo ao cursor real, medindo a duração de execute/executemany."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def _medir(self, metodo, operation, params, *args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return metodo(operation, params, *args, **kwargs)
+        finally:
+            registrar_consulta(operation, params, time.perf_counter() - inicio)
+
+    def execute(self, operation, params=(), *args, **kwargs):
+        return self._medir(self._cursor.execute, operation, params, *args, **kwargs)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        return self._medir(self._cursor.executemany, operation, seq_params, *args, **kwargs)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, nome):
+        return getattr(self._cursor, nome)
+
+
+class _ConexaoInstrumentada:
+    """Conexão emprestada do pool cujos cursores registram métricas das consultas."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, *args, **kwargs):
+        return _CursorInstrumentado(self._conn.cursor(*args, **kwargs))
+
+    def _medir(self, comando, metodo):
+        # Commit e rollback também são idas ao banco
+        inicio = time.perf_counter()
+        try:
+            return metodo()
+        finally:
+            registrar_consulta(comando, None, time.perf_counter() - inicio)
+
+    def commit(self):
+        return self._medir("COMMIT", self._conn.commit)
+
+    def rollback(self):
+        return self._medir("ROLLBACK", self._conn.rollback)
+
+    def __getattr__(self, nome):
+        return getattr(self._conn, nome)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                config = Config()
+                _pool = ConnectionPool(
+                    size=config.DB_POOL_SIZE,
+                    max_overflow=config.DB_POOL_MAX_OVERFLOW,
+                    timeout=config.DB_POOL_TIMEOUT,
+                    recycle=config.DB_POOL_RECYCLE,
+                    pre_ping=config.DB_POOL_PRE_PING
+                )
+    return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+# Estado do registro gravado nos eventos pelos gatilhos das migrações 8 e 9
+_JSON_PRODUTO = (
+    "JSON_OBJECT('id', NEW.id, 'nome', NEW.nome, 'descricao', NEW.descricao, 'preco', NEW.preco, "
+    "'estoque', NEW.estoque, 'versao', NEW.versao, 'updated_at', NEW.updated_at)"
+)
+_JSON_USUARIO = (
+    "JSON_OBJECT('id', NEW.id, 'nome', NEW.nome, 'email', NEW.email, 'data_atualizacao', NEW.data_atualizacao)"
+)
+# Marcar removido_em é exclusão (DELETE); limpá-lo, numa reimportação, é recriação (CREATE)
+_TIPO_EVENTO_UPDATE = (
+    "CASE WHEN NEW.removido_em IS NOT NULL THEN 'DELETE' "
+    "WHEN OLD.removido_em IS NOT NULL THEN 'CREATE' ELSE 'UPDATE' END"
+)
+
+
+class Passo(NamedTuple):
+    """Comando de migração que só roda se a consulta `aplicado` não devolver nenhuma linha."""
+    comando: str
+    aplicado: str
+    params: tuple = ()
+
+
+def _se_nao_existe_coluna(tabela: str, coluna: str, comando: str) -> Passo:
+    return Passo(comando, """
+        SELECT 1 FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (tabela, coluna))
+
+
+def _se_nao_existe_indice(tabela: str, indice: str, comando: str) -> Passo:
+    return Passo(comando, """
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s LIMIT 1
+    """, (tabela, indice))
+
+
+def _se_nao_existe_gatilho(gatilho: str, comando: str) -> Passo:
+    return Passo(comando, """
+        SELECT 1 FROM information_schema.TRIGGERS
+        WHERE TRIGGER_SCHEMA = DATABASE() AND TRIGGER_NAME = %s
+    """, (gatilho,))
+
+
+# Migrações versionadas: cada entrada é aplicada uma única vez e registrada
+# em schema_migrations. Novas alterações de schema entram no fim da lista.
+#
+# O MySQL confirma cada comando DDL na hora (commit implícito), então uma
+# migração que falha no meio fica aplicada pela metade e roda de novo na
+# próxima inicialização. Por isso cada comando precisa ser idempotente: DDL com
+# IF [NOT] EXISTS, DML que só altera o que falta, ou um Passo que consulta o
+# information_schema antes. Um ALTER TABLE com várias cláusulas é atômico no
+# InnoDB, e basta verificar uma delas.
+MIGRATIONS = [
+    (1, "schema inicial", [
+        """
         CREATE TABLE IF NOT EXISTS produtos (
             id INT AUTO_INCREMENT PRIMARY KEY,
             nome VARCHAR(100) NOT NULL,
@@ -30,9 +337,8 @@ def get_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
         )
-        """)
-        
-        cursor.execute("""
+        """,
+        """
         CREATE TABLE IF NOT EXISTS usuarios (
             id INT AUTO_INCREMENT PRIMARY KEY,
             nome VARCHAR(50) NOT NULL,
@@ -41,9 +347,8 @@ def get_db():
             data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
         )
-        """)
-        
-        cursor.execute("""
+        """,
+        """
         CREATE TABLE IF NOT EXISTS logs (
             id INT AUTO_INCREMENT PRIMARY KEY,
             tipo_operacao VARCHAR(20) NOT NULL,
@@ -55,22 +360,270 @@ def get_db():
             data_operacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             ip_origem VARCHAR(45)
         )
-        """)
-        
-        conn.commit()
-        cursor.close()
-        
-        conn = mysql.connector.connect(
-            host=config.MYSQL_HOST,
-            user=config.MYSQL_USER,
-            password=config.MYSQL_PASSWORD,
-            database=config.MYSQL_DB,
-            port=config.MYSQL_PORT
+        """,
+    ]),
+    (2, "indices de paginacao de produtos", [
+        _se_nao_existe_indice("produtos", "idx_produtos_nome_id", "CREATE INDEX idx_produtos_nome_id ON produtos (nome, id)"),
+        _se_nao_existe_indice("produtos", "idx_produtos_preco_id", "CREATE INDEX idx_produtos_preco_id ON produtos (preco, id)"),
+    ]),
+    (3, "logs em JSON e indices de consulta", [
+        # Logs antigos guardavam repr() de dicts Python; são preservados como strings JSON
+        """
+        UPDATE logs SET dados_anteriores = JSON_QUOTE(dados_anteriores)
+        WHERE dados_anteriores IS NOT NULL AND NOT JSON_VALID(dados_anteriores)
+        """,
+        """
+        UPDATE logs SET dados_novos = JSON_QUOTE(dados_novos)
+        WHERE dados_novos IS NOT NULL AND NOT JSON_VALID(dados_novos)
+        """,
+        Passo("ALTER TABLE logs MODIFY dados_anteriores JSON, MODIFY dados_novos JSON", """
+            SELECT 1 FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'logs' AND COLUMN_NAME = 'dados_novos'
+              AND DATA_TYPE = 'json'
+        """),
+        _se_nao_existe_indice(
+            "logs", "idx_logs_registro",
+            "CREATE INDEX idx_logs_registro ON logs (tabela_afetada, id_registro, data_operacao)"
+        ),
+        _se_nao_existe_indice("logs", "idx_logs_usuario", "CREATE INDEX idx_logs_usuario ON logs (id_usuario, data_operacao)"),
+        _se_nao_existe_indice("logs", "idx_logs_data", "CREATE INDEX idx_logs_data ON logs (data_operacao, id)"),
+    ]),
+    (4, "chave primaria de logs compativel com particionamento por data", [
+        Passo("""
+        ALTER TABLE logs
+            MODIFY data_operacao TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            DROP PRIMARY KEY,
+            ADD PRIMARY KEY (id, data_operacao)
+        """, """
+            SELECT 1 FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'logs' AND INDEX_NAME = 'PRIMARY'
+              AND COLUMN_NAME = 'data_operacao'
+        """),
+    ]),
+    (5, "busca textual de produtos", [
+        # Collation insensível a acentos e maiúsculas: "cafe" encontra "Café"
+        Passo("ALTER TABLE produtos CONVERT TO CHARACTER SET utf8mb4 COLLATE utf8mb4_0900_ai_ci", """
+            SELECT 1 FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'produtos' AND TABLE_COLLATION = 'utf8mb4_0900_ai_ci'
+        """),
+        _se_nao_existe_indice("produtos", "ft_produtos_nome", "CREATE FULLTEXT INDEX ft_produtos_nome ON produtos (nome)"),
+        _se_nao_existe_indice(
+            "produtos", "ft_produtos_busca", "CREATE FULLTEXT INDEX ft_produtos_busca ON produtos (nome, descricao)"
+        ),
+    ]),
+    (6, "versão dos produtos para controle de concorrência", [
+        # updated_at tem resolução de segundos; a versão muda a cada escrita
+        _se_nao_existe_coluna("produtos", "versao", "ALTER TABLE produtos ADD COLUMN versao INT NOT NULL DEFAULT 0"),
+    ]),
+    (7, "índices para análise do catálogo", [
+        # Atualização incremental do instantâneo e lista de estoque baixo sem varrer a tabela
+        _se_nao_existe_indice(
+            "produtos", "idx_produtos_updated_at", "CREATE INDEX idx_produtos_updated_at ON produtos (updated_at)"
+        ),
+        _se_nao_existe_indice(
+            "produtos", "idx_produtos_estoque_id", "CREATE INDEX idx_produtos_estoque_id ON produtos (estoque, id)"
+        ),
+    ]),
+    (8, "eventos de alteração de produtos e usuários", [
+        """
+        CREATE TABLE IF NOT EXISTS eventos (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            agregado VARCHAR(20) NOT NULL,
+            id_registro INT NOT NULL,
+            tipo VARCHAR(10) NOT NULL,
+            dados JSON NULL,
+            criado_em TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+            INDEX idx_eventos_criado_em (criado_em)
         )
-        yield conn
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS eventos_consumidores (
+            nome VARCHAR(100) PRIMARY KEY,
+            posicao BIGINT NOT NULL,
+            atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )
+        """,
+        # Gatilhos: o evento entra na mesma transação de qualquer escrita,
+        # inclusive upserts em lote, em que a aplicação não conhece os ids gerados
+        _se_nao_existe_gatilho("trg_produtos_evento_insert", f"""
+        CREATE TRIGGER trg_produtos_evento_insert AFTER INSERT ON produtos FOR EACH ROW
+        INSERT INTO eventos (agregado, id_registro, tipo, dados)
+        VALUES ('produtos', NEW.id, 'CREATE', {_JSON_PRODUTO})
+        """),
+        _se_nao_existe_gatilho("trg_produtos_evento_update", f"""
+        CREATE TRIGGER trg_produtos_evento_update AFTER UPDATE ON produtos FOR EACH ROW
+        INSERT INTO eventos (agregado, id_registro, tipo, dados)
+        VALUES ('produtos', NEW.id, 'UPDATE', {_JSON_PRODUTO})
+        """),
+        _se_nao_existe_gatilho("trg_produtos_evento_delete", """
+        CREATE TRIGGER trg_produtos_evento_delete AFTER DELETE ON produtos FOR EACH ROW
+        INSERT INTO eventos (agregado, id_registro, tipo) VALUES ('produtos', OLD.id, 'DELETE')
+        """),
+        _se_nao_existe_gatilho("trg_usuarios_evento_insert", f"""
+        CREATE TRIGGER trg_usuarios_evento_insert AFTER INSERT ON usuarios FOR EACH ROW
+        INSERT INTO eventos (agregado, id_registro, tipo, dados)
+        VALUES ('usuarios', NEW.id, 'CREATE', {_JSON_USUARIO})
+        """),
+        # A senha não vai para o evento; trocar só a senha (ou o hash) não gera evento
+        _se_nao_existe_gatilho("trg_usuarios_evento_update", f"""
+        CREATE TRIGGER trg_usuarios_evento_update AFTER UPDATE ON usuarios FOR EACH ROW
+        INSERT INTO eventos (agregado, id_registro, tipo, dados)
+        SELECT 'usuarios', NEW.id, 'UPDATE', {_JSON_USUARIO} FROM DUAL
+        WHERE NOT (OLD.nome <=> NEW.nome AND OLD.email <=> NEW.email)
+        """),
+        _se_nao_existe_gatilho("trg_usuarios_evento_delete", """
+        CREATE TRIGGER trg_usuarios_evento_delete AFTER DELETE ON usuarios FOR EACH ROW
+        INSERT INTO eventos (agregado, id_registro, tipo) VALUES ('usuarios', OLD.id, 'DELETE')
+        """),
+    ]),
+    (9, "exclusão lógica de produtos e usuários", [
+        # O MySQL não tem índice parcial: os índices de listagem passam a começar
+        # por removido_em, então os registros ativos (NULL) formam um prefixo
+        # contínuo de cada índice e os removidos, o final, onde o expurgo os busca
+        _se_nao_existe_coluna("produtos", "removido_em", """
+        ALTER TABLE produtos
+            ADD COLUMN removido_em TIMESTAMP NULL DEFAULT NULL,
+            DROP INDEX idx_produtos_nome_id,
+            DROP INDEX idx_produtos_preco_id,
+            DROP INDEX idx_produtos_estoque_id,
+            ADD INDEX idx_produtos_removido_em (removido_em),
+            ADD INDEX idx_produtos_nome_id (removido_em, nome, id),
+            ADD INDEX idx_produtos_preco_id (removido_em, preco, id),
+            ADD INDEX idx_produtos_estoque_id (removido_em, estoque, id)
+        """),
+        # Email único só entre os usuários ativos: `ativo` é NULL nos removidos e
+        # um índice UNIQUE aceita vários NULL, então o email fica livre para um novo cadastro
+        _se_nao_existe_coluna("usuarios", "removido_em", """
+        ALTER TABLE usuarios
+            ADD COLUMN removido_em TIMESTAMP NULL DEFAULT NULL,
+            ADD COLUMN ativo TINYINT GENERATED ALWAYS AS (IF(removido_em IS NULL, 1, NULL)) VIRTUAL,
+            DROP INDEX email,
+            ADD UNIQUE INDEX uq_usuarios_email_ativo (email, ativo),
+            ADD INDEX idx_usuarios_removido_em (removido_em, nome)
+        """),
+        # Remover é um UPDATE: vira evento DELETE, e o expurgo posterior não repete o evento
+        "DROP TRIGGER IF EXISTS trg_produtos_evento_update",
+        "DROP TRIGGER IF EXISTS trg_produtos_evento_delete",
+        "DROP TRIGGER IF EXISTS trg_usuarios_evento_update",
+        "DROP TRIGGER IF EXISTS trg_usuarios_evento_delete",
+        f"""
+        CREATE TRIGGER trg_produtos_evento_update AFTER UPDATE ON produtos FOR EACH ROW
+        INSERT INTO eventos (agregado, id_registro, tipo, dados)
+        SELECT 'produtos', NEW.id, {_TIPO_EVENTO_UPDATE}, IF(NEW.removido_em IS NULL, {_JSON_PRODUTO}, NULL)
+        FROM DUAL
+        WHERE OLD.removido_em IS NULL OR NEW.removido_em IS NULL
+        """,
+        """
+        CREATE TRIGGER trg_produtos_evento_delete AFTER DELETE ON produtos FOR EACH ROW
+        INSERT INTO eventos (agregado, id_registro, tipo)
+        SELECT 'produtos', OLD.id, 'DELETE' FROM DUAL WHERE OLD.removido_em IS NULL
+        """,
+        f"""
+        CREATE TRIGGER trg_usuarios_evento_update AFTER UPDATE ON usuarios FOR EACH ROW
+        INSERT INTO eventos (agregado, id_registro, tipo, dados)
+        SELECT 'usuarios', NEW.id, {_TIPO_EVENTO_UPDATE}, IF(NEW.removido_em IS NULL, {_JSON_USUARIO}, NULL)
+        FROM DUAL
+        WHERE (OLD.removido_em IS NULL OR NEW.removido_em IS NULL)
+          AND NOT (OLD.nome <=> NEW.nome AND OLD.email <=> NEW.email AND OLD.removido_em <=> NEW.removido_em)
+        """,
+        """
+        CREATE TRIGGER trg_usuarios_evento_delete AFTER DELETE ON usuarios FOR EACH ROW
+        INSERT INTO eventos (agregado, id_registro, tipo)
+        SELECT 'usuarios', OLD.id, 'DELETE' FROM DUAL WHERE OLD.removido_em IS NULL
+        """,
+    ]),
+    (10, "posição dos eventos atribuída depois do commit", [
+        # Os gatilhos gravam a posição vazia; models/eventos_model.py a preenche na
+        # ordem em que os eventos ficam visíveis. Os eventos já gravados mantêm o id
+        _se_nao_existe_coluna(
+            "eventos", "posicao",
+            "ALTER TABLE eventos ADD COLUMN posicao BIGINT NULL, ADD UNIQUE INDEX uq_eventos_posicao (posicao)"
+        ),
+        "UPDATE eventos SET posicao = id WHERE posicao IS NULL",
+        """
+        CREATE TABLE IF NOT EXISTS eventos_sequencia (
+            id TINYINT PRIMARY KEY,
+            ultima BIGINT NOT NULL
+        )
+        """,
+        """
+        INSERT INTO eventos_sequencia (id, ultima)
+        SELECT 1, COALESCE(MAX(posicao), 0) FROM eventos
+        ON DUPLICATE KEY UPDATE id = id
+        """,
+    ]),
+]
+
+
+def init_db():
+    """
+    Cria o banco de dados, se necessário, e aplica as migrações pendentes.
+    Deve ser chamada uma única vez na inicialização da aplicação.
+    """
+    config = Config()
+    conn = _connect(database=False)
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {config.MYSQL_DB}")
+        cursor.execute(f"USE {config.MYSQL_DB}")
+
+        # Evita que vários workers apliquem as mesmas migrações ao mesmo tempo
+        cursor.execute("SELECT GET_LOCK('schema_migrations', 60)")
+        cursor.fetchone()
+        try:
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                versao INT PRIMARY KEY,
+                descricao VARCHAR(255) NOT NULL,
+                aplicada_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """)
+            cursor.execute("SELECT versao FROM schema_migrations")
+            aplicadas = {row[0] for row in cursor.fetchall()}
+
+            for versao, descricao, comandos in MIGRATIONS:
+                if versao in aplicadas:
+                    continue
+                for comando in comandos:
+                    if isinstance(comando, Passo):
+                        cursor.execute(comando.aplicado, comando.params)
+                        if cursor.fetchall():
+                            # Aplicado por uma tentativa anterior que falhou no meio da migração
+                            continue
+                        comando = comando.comando
+                    cursor.execute(comando)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (versao, descricao) VALUES (%s, %s)",
+                    (versao, descricao)
+                )
+                conn.commit()
+                logger.info(f"Migração {versao} aplicada: {descricao}")
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK('schema_migrations')")
+            cursor.fetchone()
+            cursor.close()
     except Exception as e:
         logger.error(f"Erro ao configurar banco de dados: {str(e)}")
         raise
     finally:
         if conn.is_connected():
-            conn.close()
\ No newline at end of file
+            conn.close()
+
+
+@contextmanager
+def get_connection(pool: Optional[ConnectionPool] = None):
+    """Empresta uma conexão do pool (por padrão, o do primário) para uso fora do ciclo de dependências do FastAPI."""
+    pool = pool or get_pool()
+    inicio = time.perf_counter()
+    conn = pool.acquire()
+    metricas.observar("db_pool_espera_segundos", time.perf_counter() - inicio)
+    try:
+        yield _ConexaoInstrumentada(conn) if Config.METRICAS_ATIVAS else conn
+    finally:
+        pool.release(conn)
+
+
+def get_db():
+    with get_connection() as conn:
+        yield conn
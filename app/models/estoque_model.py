@@ -0,0 +1,142 @@
+import mysql.connector
+from pydantic import BaseModel, Field
+from typing import List
+
+from config import Config
+from models.produto_model import invalidar_cache_produto
+
+
+class EstoqueInsuficienteError(ValueError):
+    def __init__(self, ids: List[int]):
+        self.ids = ids
+        super().__init__(f"Estoque insuficiente para os produtos: {', '.join(map(str, ids))}")
+
+
+class ProdutoNaoEncontradoError(ValueError):
+    def __init__(self, ids: List[int]):
+        self.ids = ids
+        super().__init__(f"Produtos não encontrados: {', '.join(map(str, ids))}")
+
+
+class AjusteEstoque(BaseModel):
+    delta: int
+
+
+class ItemReserva(BaseModel):
+    id: int
+    quantidade: int = Field(..., gt=0)
+
+
+class Reserva(BaseModel):
+    # Todos os itens vão num único UPDATE, que bloqueia as linhas até o commit
+    itens: List[ItemReserva] = Field(..., min_items=1, max_items=Config.ESTOQUE_RESERVA_MAX_ITENS)
+
+
+def _ids_existentes(ids: List[int], db: mysql.connector.MySQLConnection) -> set:
+    cursor = db.cursor()
+    cursor.execute(
+        f"SELECT id FROM produtos WHERE id IN ({', '.join(['%s'] * len(ids))}) AND removido_em IS NULL",
+        tuple(ids)
+    )
+    existentes = {row[0] for row in cursor.fetchall()}
+    cursor.close()
+    return existentes
+
+
+def ajustar_estoque(id: int, delta: int, db: mysql.connector.MySQLConnection) -> dict:
+    """
+    Soma `delta` ao estoque num único UPDATE atômico, sem deixar o estoque
+    negativo. Retorna o estoque e a versão resultantes.
+    """
+    cursor = db.cursor()
+    try:
+        cursor.execute(
+            """
+            UPDATE produtos SET estoque = estoque + %s, versao = versao + 1
+            WHERE id = %s AND estoque + %s >= 0 AND removido_em IS NULL
+            """,
+            (delta, id, delta)
+        )
+        if cursor.rowcount == 0:
+            db.rollback()
+            if not _ids_existentes([id], db):
+                raise ProdutoNaoEncontradoError([id])
+            raise EstoqueInsuficienteError([id])
+
+        cursor.execute("SELECT estoque, versao FROM produtos WHERE id = %s", (id,))
+        estoque, versao = cursor.fetchone()
+        db.commit()
+    except mysql.connector.Error as err:
+        db.rollback()
+        raise ValueError(f"Erro ao ajustar estoque: {err.msg}")
+    finally:
+        cursor.close()
+
+    invalidar_cache_produto(id)
+    return {"id": id, "estoque": estoque, "versao": versao}
+
+
+def _agrupar(itens: List[ItemReserva]) -> dict:
+    quantidades = {}
+    for item in itens:
+        quantidades[item.id] = quantidades.get(item.id, 0) + item.quantidade
+    return quantidades
+
+
+def _movimentar_lote(itens: List[ItemReserva], sinal: int, db: mysql.connector.MySQLConnection) -> dict:
+    quantidades = _agrupar(itens)
+    ids = sorted(quantidades)
+    caso = " ".join("WHEN %s THEN %s" for _ in ids)
+    params_caso = [v for id in ids for v in (id, quantidades[id])]
+    marcadores = ", ".join(["%s"] * len(ids))
+
+    # Um único UPDATE para todos os itens; a guarda de estoque vale por linha
+    # e a contagem de linhas afetadas decide se o lote inteiro é confirmado
+    guarda = f"AND estoque >= CASE id {caso} END" if sinal < 0 else ""
+    cursor = db.cursor()
+    try:
+        cursor.execute(
+            f"""
+            UPDATE produtos
+            SET estoque = estoque {'-' if sinal < 0 else '+'} CASE id {caso} END,
+                versao = versao + 1
+            WHERE id IN ({marcadores}) AND removido_em IS NULL {guarda}
+            """,
+            (*params_caso, *ids, *(params_caso if sinal < 0 else []))
+        )
+        if cursor.rowcount != len(ids):
+            db.rollback()
+            existentes = _ids_existentes(ids, db)
+            faltando = [id for id in ids if id not in existentes]
+            if faltando:
+                raise ProdutoNaoEncontradoError(faltando)
+            cursor.execute(
+                f"SELECT id, estoque FROM produtos WHERE id IN ({marcadores})", tuple(ids)
+            )
+            insuficientes = [id for id, estoque in cursor.fetchall() if estoque < quantidades[id]]
+            raise EstoqueInsuficienteError(insuficientes or ids)
+
+        cursor.execute(
+            f"SELECT id, estoque, versao FROM produtos WHERE id IN ({marcadores})", tuple(ids)
+        )
+        resultado = {id: {"estoque": estoque, "versao": versao} for id, estoque, versao in cursor.fetchall()}
+        db.commit()
+    except mysql.connector.Error as err:
+        db.rollback()
+        raise ValueError(f"Erro ao movimentar estoque: {err.msg}")
+    finally:
+        cursor.close()
+
+    for id in ids:
+        invalidar_cache_produto(id)
+    return resultado
+
+
+def reservar_estoque(itens: List[ItemReserva], db: mysql.connector.MySQLConnection) -> dict:
+    """Baixa o estoque de vários produtos numa transação: ou todos são reservados ou nenhum."""
+    return _movimentar_lote(itens, -1, db)
+
+
+def liberar_estoque(itens: List[ItemReserva], db: mysql.connector.MySQLConnection) -> dict:
+    """Devolve ao estoque as quantidades de uma reserva."""
+    return _movimentar_lote(itens, 1, db)
@@ -0,0 +1,170 @@
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+import mysql.connector
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+AGREGADOS = ("produtos", "usuarios")
+LOTE_MAXIMO = 1000
+
+
+def _ler_dados(valor):
+    if valor is None:
+        return None
+    if isinstance(valor, (bytes, bytearray)):
+        valor = valor.decode("utf-8")
+    return json.loads(valor) if isinstance(valor, str) else valor
+
+
+def sequenciar_eventos(db: mysql.connector.MySQLConnection, lote: int = LOTE_MAXIMO) -> int:
+    """
+    Dá posição no feed aos eventos já confirmados e retorna a última posição.
+
+    Ids de AUTO_INCREMENT são reservados no INSERT mas só ficam visíveis no
+    commit, fora de ordem, e uma transação longa (uma importação em lote, por
+    exemplo) pode segurar o seu por minutos. Por isso a leitura não usa o id:
+    os eventos recebem posições consecutivas aqui, na ordem em que ficam
+    visíveis. Os de transações ainda abertas estão bloqueados por elas e são
+    pulados (SKIP LOCKED) até o commit; os de transações desfeitas nunca
+    aparecem. A linha de eventos_sequencia serializa quem sequencia, mas só
+    pelo tempo desta transação curta, sem bloquear as escritas.
+    """
+    cursor = db.cursor()
+    try:
+        # Leitura simples, sem bloqueios: não há o que sequenciar na maior parte das vezes
+        cursor.execute("SELECT id FROM eventos WHERE posicao IS NULL LIMIT 1")
+        if cursor.fetchone() is None:
+            cursor.execute("SELECT ultima FROM eventos_sequencia WHERE id = 1")
+            return cursor.fetchone()[0]
+
+        db.rollback()
+        # Sem gap locks: em REPEATABLE READ, a varredura travaria o intervalo em
+        # que os novos eventos são inseridos
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL READ COMMITTED")
+        cursor.execute("SELECT ultima FROM eventos_sequencia WHERE id = 1 FOR UPDATE")
+        ultima = cursor.fetchone()[0]
+        cursor.execute(
+            "SELECT id FROM eventos WHERE posicao IS NULL ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED", (lote,)
+        )
+        ids = [linha[0] for linha in cursor.fetchall()]
+        if ids:
+            marcadores = ", ".join(["%s"] * len(ids))
+            cursor.execute(
+                f"UPDATE eventos SET posicao = %s + FIELD(id, {marcadores}) WHERE id IN ({marcadores})",
+                (ultima, *ids, *ids)
+            )
+            ultima += len(ids)
+            cursor.execute("UPDATE eventos_sequencia SET ultima = %s WHERE id = 1", (ultima,))
+        db.commit()
+        return ultima
+    except mysql.connector.Error:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def ler_eventos(
+    db: mysql.connector.MySQLConnection,
+    apos: int = 0,
+    limite: int = 100,
+    agregado: Optional[str] = None
+) -> dict:
+    """
+    Lê os eventos com posição maior que `apos`, em ordem. As posições são
+    consecutivas e só existem para eventos confirmados (ver
+    `sequenciar_eventos`), então nenhum evento fica para trás.
+
+    `proximo` é a posição para continuar a leitura. Com `agregado`, eventos de
+    outros agregados são pulados, mas a posição avança sobre eles.
+    """
+    if agregado is not None and agregado not in AGREGADOS:
+        raise ValueError(f"Agregado inválido: {agregado}")
+    if not 1 <= limite <= LOTE_MAXIMO:
+        raise ValueError(f"O limite deve estar entre 1 e {LOTE_MAXIMO}")
+
+    sequenciar_eventos(db)
+    cursor = db.cursor(dictionary=True)
+    cursor.execute(
+        "SELECT id, posicao, agregado, id_registro, tipo, dados, criado_em FROM eventos "
+        "WHERE posicao > %s ORDER BY posicao LIMIT %s",
+        (apos, limite)
+    )
+    linhas = cursor.fetchall()
+    cursor.close()
+
+    eventos = []
+    proximo = apos
+    for linha in linhas:
+        proximo = linha["posicao"]
+        if agregado is None or linha["agregado"] == agregado:
+            linha["dados"] = _ler_dados(linha["dados"])
+            eventos.append(linha)
+    return {"eventos": eventos, "proximo": proximo}
+
+
+def ultimo_evento(db: mysql.connector.MySQLConnection) -> int:
+    """Última posição do feed, já contando os eventos confirmados desde a leitura anterior."""
+    return sequenciar_eventos(db)
+
+
+def posicao_consumidor(nome: str, db: mysql.connector.MySQLConnection) -> Optional[dict]:
+    cursor = db.cursor(dictionary=True)
+    cursor.execute("SELECT nome, posicao, atualizado_em FROM eventos_consumidores WHERE nome = %s", (nome,))
+    consumidor = cursor.fetchone()
+    cursor.close()
+    return consumidor
+
+
+def salvar_posicao(nome: str, posicao: int, db: mysql.connector.MySQLConnection) -> dict:
+    """Grava a posição confirmada pelo consumidor, que retoma dela na próxima leitura."""
+    try:
+        cursor = db.cursor()
+        cursor.execute(
+            """
+            INSERT INTO eventos_consumidores (nome, posicao) VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE posicao = VALUES(posicao)
+            """,
+            (nome, posicao)
+        )
+        db.commit()
+        cursor.close()
+    except mysql.connector.Error as err:
+        db.rollback()
+        raise ValueError(f"Erro ao salvar posição do consumidor: {err.msg}")
+    return {"nome": nome, "posicao": posicao}
+
+
+def limpar_eventos(db: mysql.connector.MySQLConnection, dias: int = Config.EVENTOS_RETENCAO_DIAS,
+                   lote: int = 5000) -> int:
+    """
+    Apaga eventos com mais de `dias` dias em lotes curtos, um commit por lote,
+    para não segurar bloqueios. Eventos ainda não lidos por um consumidor
+    registrado são mantidos.
+    """
+    cursor = db.cursor()
+    cursor.execute("SELECT MIN(posicao) FROM eventos_consumidores")
+    menor_posicao = cursor.fetchone()[0]
+    limite = datetime.now() - timedelta(days=dias)
+
+    total = 0
+    while True:
+        sql = "DELETE FROM eventos WHERE criado_em < %s"
+        params = [limite]
+        if menor_posicao is not None:
+            sql += " AND posicao <= %s"
+            params.append(menor_posicao)
+        cursor.execute(sql + " ORDER BY id LIMIT %s", (*params, lote))
+        apagados = cursor.rowcount
+        db.commit()
+        total += apagados
+        if apagados < lote:
+            break
+    cursor.close()
+    logger.info(f"{total} eventos removidos (anteriores a {limite:%Y-%m-%d %H:%M})")
+    return total
@@ -0,0 +1,235 @@
+import logging
+import threading
+from datetime import datetime, time, timedelta
+from typing import Callable, Iterable, List, Optional
+
+import mysql.connector
+
+from config import Config
+from models.database import get_connection
+
+logger = logging.getLogger(__name__)
+
+# Tabelas com exclusão lógica (coluna removido_em, migração 9)
+TABELAS = ("produtos", "usuarios")
+
+INTERVALO_LOG_PROGRESSO = timedelta(seconds=10)
+
+
+def remover_em_lote(
+    db: mysql.connector.MySQLConnection,
+    tabela: str,
+    condicoes: List[str],
+    params: list,
+    ids: Optional[Iterable[int]] = None,
+    lote: int = Config.EXCLUSAO_LOTE,
+    ao_remover: Optional[Callable[[List[int]], None]] = None
+) -> int:
+    """
+    Marca como removidos (removido_em) os registros que atendem às
+    `condicoes`, que devem incluir "removido_em IS NULL". Com `ids`, só
+    esses registros são considerados.
+
+    O trabalho é feito em lotes por id, com um commit por lote, para não
+    segurar bloqueios de milhares de linhas; se houver erro, os lotes já
+    confirmados continuam removidos. `ao_remover` recebe os ids de cada lote.
+    """
+    if tabela not in TABELAS:
+        raise ValueError(f"Tabela inválida: {tabela}")
+    where = " AND ".join(condicoes)
+    restantes = sorted(set(ids)) if ids is not None else None
+    ultimo_id = 0
+    total = 0
+
+    cursor = db.cursor()
+    try:
+        while True:
+            if restantes is not None:
+                bloco, restantes = restantes[:lote], restantes[lote:]
+            else:
+                cursor.execute(
+                    f"SELECT id FROM {tabela} WHERE {where} AND id > %s ORDER BY id LIMIT %s",
+                    (*params, ultimo_id, lote)
+                )
+                bloco = [linha[0] for linha in cursor.fetchall()]
+            if not bloco:
+                break
+
+            # As condições são repetidas: o registro pode ter mudado desde a seleção
+            cursor.execute(
+                f"UPDATE {tabela} SET removido_em = CURRENT_TIMESTAMP "
+                f"WHERE id IN ({', '.join(['%s'] * len(bloco))}) AND {where}",
+                (*bloco, *params)
+            )
+            total += cursor.rowcount
+            db.commit()
+            if ao_remover:
+                ao_remover(bloco)
+            ultimo_id = bloco[-1]
+    except mysql.connector.Error as err:
+        db.rollback()
+        raise ValueError(f"Erro ao remover registros de {tabela}: {err.msg}")
+    finally:
+        cursor.close()
+    return total
+
+
+def na_janela(momento: time, janela: str) -> bool:
+    """Diz se `momento` está na janela "HH:MM-HH:MM" (pode virar a meia-noite); vazia é sempre."""
+    if not janela:
+        return True
+    try:
+        inicio, fim = (time.fromisoformat(parte.strip()) for parte in janela.split("-"))
+    except ValueError:
+        raise ValueError(f"Janela de expurgo inválida: {janela!r} (use HH:MM-HH:MM)")
+    if inicio <= fim:
+        return inicio <= momento < fim
+    return momento >= inicio or momento < fim
+
+
+def pendentes_expurgo(db: mysql.connector.MySQLConnection, corte: Optional[datetime] = None) -> dict:
+    """Quantos registros removidos antes de `corte` ainda esperam o expurgo, por tabela."""
+    corte = corte or datetime.now() - timedelta(days=Config.EXPURGO_CARENCIA_DIAS)
+    cursor = db.cursor()
+    pendentes = {}
+    for tabela in TABELAS:
+        cursor.execute(f"SELECT COUNT(*) FROM {tabela} WHERE removido_em < %s", (corte,))
+        pendentes[tabela] = cursor.fetchone()[0]
+    cursor.close()
+    return pendentes
+
+
+class ProgressoExpurgo:
+    """Andamento do expurgo neste processo, exposto em /api/v1/expurgo e em /metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._estado = {
+            "executando": False, "tabela": None, "pendentes": {}, "removidos": {},
+            "lotes": 0, "iniciado_em": None, "terminado_em": None, "concluido": None,
+        }
+
+    def iniciar(self, pendentes: dict):
+        with self._lock:
+            self._estado.update(
+                executando=True, tabela=None, pendentes=dict(pendentes), removidos={t: 0 for t in pendentes},
+                lotes=0, iniciado_em=datetime.now(), terminado_em=None, concluido=None
+            )
+
+    def avancar(self, tabela: str, removidos: int):
+        with self._lock:
+            self._estado["tabela"] = tabela
+            self._estado["removidos"][tabela] += removidos
+            self._estado["lotes"] += 1
+
+    def terminar(self, concluido: bool):
+        with self._lock:
+            self._estado.update(executando=False, tabela=None, terminado_em=datetime.now(), concluido=concluido)
+
+    def status(self) -> dict:
+        with self._lock:
+            estado = dict(self._estado)
+            estado["pendentes"] = dict(estado["pendentes"])
+            estado["removidos"] = dict(estado["removidos"])
+        return estado
+
+
+progresso_expurgo = ProgressoExpurgo()
+
+
+def executar_expurgo(
+    db: mysql.connector.MySQLConnection,
+    janela: str = Config.EXPURGO_JANELA,
+    parar: Optional[threading.Event] = None,
+    progresso: ProgressoExpurgo = progresso_expurgo
+) -> dict:
+    """
+    Apaga de vez os registros removidos há mais de EXPURGO_CARENCIA_DIAS dias,
+    em lotes de EXPURGO_LOTE linhas com um commit e uma pausa de
+    EXPURGO_PAUSA segundos entre eles, para não disputar bloqueios e I/O com
+    o tráfego. Para ao sair da `janela` ou quando `parar` é sinalizado; a
+    próxima execução continua de onde esta parou.
+    """
+    if not na_janela(datetime.now().time(), janela):
+        return {"executado": False, "motivo": "fora da janela"}
+
+    cursor = db.cursor()
+    cursor.execute("SELECT GET_LOCK('expurgo', 0)")
+    if not cursor.fetchone()[0]:
+        cursor.close()
+        return {"executado": False, "motivo": "em execução em outro processo"}
+
+    parar = parar or threading.Event()
+    corte = datetime.now() - timedelta(days=Config.EXPURGO_CARENCIA_DIAS)
+    concluido = False
+    try:
+        pendentes = pendentes_expurgo(db, corte)
+        progresso.iniciar(pendentes)
+        proximo_log = datetime.now() + INTERVALO_LOG_PROGRESSO
+        for tabela in TABELAS:
+            removidos = 0
+            while removidos < pendentes[tabela]:
+                cursor.execute(
+                    f"DELETE FROM {tabela} WHERE removido_em < %s ORDER BY removido_em LIMIT %s",
+                    (corte, Config.EXPURGO_LOTE)
+                )
+                apagados = cursor.rowcount
+                db.commit()
+                progresso.avancar(tabela, apagados)
+                removidos += apagados
+
+                if datetime.now() >= proximo_log:
+                    logger.info(f"Expurgo de {tabela}: {removidos} de {pendentes[tabela]} registros")
+                    proximo_log = datetime.now() + INTERVALO_LOG_PROGRESSO
+                if apagados < Config.EXPURGO_LOTE:
+                    break
+                if parar.wait(Config.EXPURGO_PAUSA) or not na_janela(datetime.now().time(), janela):
+                    return {"executado": True, "concluido": False, "removidos": progresso.status()["removidos"]}
+        concluido = True
+    except mysql.connector.Error:
+        db.rollback()
+        raise
+    finally:
+        progresso.terminar(concluido)
+        cursor.execute("SELECT RELEASE_LOCK('expurgo')")
+        cursor.fetchone()
+        cursor.close()
+
+    removidos = progresso.status()["removidos"]
+    if any(removidos.values()):
+        logger.info(f"Expurgo concluído: {removidos}")
+    return {"executado": True, "concluido": True, "removidos": removidos}
+
+
+class ExpurgoScheduler:
+    """Executa o expurgo periodicamente numa thread em segundo plano, só dentro da janela."""
+
+    def __init__(self, intervalo: float):
+        self.intervalo = intervalo
+        self._parar = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._run, name="expurgo", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._parar.set()
+            self._thread.join(5)
+            self._thread = None
+
+    def _run(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                if not na_janela(datetime.now().time(), Config.EXPURGO_JANELA):
+                    continue
+                with get_connection() as conn:
+                    executar_expurgo(conn, parar=self._parar)
+            except Exception as e:
+                logger.error(f"Erro no expurgo: {str(e)}", exc_info=True)
+
+
+expurgo_scheduler = ExpurgoScheduler(Config.EXPURGO_INTERVALO)
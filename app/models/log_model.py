@@ -1,8 +1,13 @@
+import json
 import logging
 import mysql.connector
+from datetime import date, datetime
+from decimal import Decimal
 from fastapi import Request
-from typing import Optional
-from models.database import get_db
+import time
+from typing import Iterator, Optional
+from models.log_writer import INSERT_LOG, log_writer
+from models.produto_model import decode_cursor, encode_cursor
 
 logger = logging.getLogger(__name__)
 
@@ -16,51 +21,168 @@ def registrar_log(
     request: Optional[Request] = None,
     db: mysql.connector.MySQLConnection = None
 ):
+    """
+    Registra um evento de auditoria.
+
+    Sem `db`, o evento é enfileirado para o log_writer e gravado em lote em
+    segundo plano. Com `db`, é gravado imediatamente na conexão informada.
+    """
     try:
+        linha = linha_log(tipo_operacao, tabela_afetada, id_registro, dados_anteriores, dados_novos, id_usuario, request)
+
         if db is None:
-            db = next(get_db())
-        
-        ip_origem = request.client.host if request else None
-        
+            log_writer.enqueue(linha)
+            return
+
         cursor = db.cursor()
-        cursor.execute(
-            """
-            INSERT INTO logs (
-                tipo_operacao,
-                tabela_afetada,
-                id_registro,
-                dados_anteriores,
-                dados_novos,
-                id_usuario,
-                ip_origem
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """,
-            (
-                tipo_operacao,
-                tabela_afetada,
-                id_registro,
-                str(dados_anteriores) if dados_anteriores else None,
-                str(dados_novos) if dados_novos else None,
-                id_usuario,
-                ip_origem
-            )
-        )
+        cursor.execute(INSERT_LOG, linha)
         db.commit()
         cursor.close()
     except Exception as e:
         logger.error(f"Falha ao registrar log: {str(e)}")
         # Não falha a operação principal se o log falhar
 
-def obter_logs(db: mysql.connector.MySQLConnection = None):
+LOG_PAGE_SIZE_MAX = 200
+
+
+def linha_log(
+    tipo_operacao: str,
+    tabela_afetada: str,
+    id_registro: Optional[int] = None,
+    dados_anteriores: Optional[dict] = None,
+    dados_novos: Optional[dict] = None,
+    id_usuario: Optional[int] = None,
+    request: Optional[Request] = None
+) -> tuple:
+    """Parâmetros de INSERT_LOG para um evento de auditoria."""
+    return (
+        tipo_operacao,
+        tabela_afetada,
+        id_registro,
+        _para_json(dados_anteriores),
+        _para_json(dados_novos),
+        id_usuario,
+        request.client.host if request and request.client else None,
+        time.time()
+    )
+
+
+def _para_json(dados: Optional[dict]) -> Optional[str]:
+    if not dados:
+        return None
+    return json.dumps(dados, ensure_ascii=False, default=json_default)
+
+
+def json_default(valor):
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    return str(valor)
+
+
+def _de_json(valor):
+    if valor is None:
+        return None
+    if isinstance(valor, (bytes, bytearray)):
+        valor = valor.decode("utf-8")
     try:
-        if db is None:
-            db = next(get_db())
-        
-        cursor = db.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM logs ORDER BY data_operacao DESC")
-        logs = cursor.fetchall()
-        cursor.close()
-        return logs
-    except Exception as e:
-        logger.error(f"Erro ao obter logs: {str(e)}")
-        return []
\ No newline at end of file
+        return json.loads(valor)
+    except ValueError:
+        return valor
+
+
+def _decodificar(log: dict) -> dict:
+    log["dados_anteriores"] = _de_json(log.get("dados_anteriores"))
+    log["dados_novos"] = _de_json(log.get("dados_novos"))
+    return log
+
+
+def _filtros_logs(tabela=None, id_registro=None, id_usuario=None, tipo_operacao=None,
+                  inicio=None, fim=None):
+    condicoes, params = [], []
+    if tabela is not None:
+        condicoes.append("tabela_afetada = %s")
+        params.append(tabela)
+    if id_registro is not None:
+        condicoes.append("id_registro = %s")
+        params.append(id_registro)
+    if id_usuario is not None:
+        condicoes.append("id_usuario = %s")
+        params.append(id_usuario)
+    if tipo_operacao is not None:
+        condicoes.append("tipo_operacao = %s")
+        params.append(tipo_operacao)
+    if inicio is not None:
+        condicoes.append("data_operacao >= %s")
+        params.append(inicio)
+    if fim is not None:
+        condicoes.append("data_operacao < %s")
+        params.append(fim)
+    return condicoes, params
+
+
+def consultar_logs(
+    db: mysql.connector.MySQLConnection,
+    tabela: Optional[str] = None,
+    id_registro: Optional[int] = None,
+    id_usuario: Optional[int] = None,
+    tipo_operacao: Optional[str] = None,
+    inicio: Optional[datetime] = None,
+    fim: Optional[datetime] = None,
+    limite: int = 50,
+    apos: Optional[str] = None
+) -> dict:
+    """
+    Consulta os logs do mais recente para o mais antigo, uma página por vez.
+    `apos` é o cursor devolvido em "proximo" pela página anterior.
+    """
+    limite = max(1, min(int(limite), LOG_PAGE_SIZE_MAX))
+    condicoes, params = _filtros_logs(tabela, id_registro, id_usuario, tipo_operacao, inicio, fim)
+    if apos is not None:
+        data, ultimo_id = decode_cursor(apos)
+        condicoes.append("(data_operacao < %s OR (data_operacao = %s AND id < %s))")
+        params.extend([data, data, ultimo_id])
+
+    where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+    cursor = db.cursor(dictionary=True)
+    cursor.execute(
+        f"SELECT * FROM logs {where} ORDER BY data_operacao DESC, id DESC LIMIT %s",
+        (*params, limite + 1)
+    )
+    logs = [_decodificar(log) for log in cursor.fetchall()]
+    cursor.close()
+
+    mais = len(logs) > limite
+    logs = logs[:limite]
+    return {
+        "logs": logs,
+        "proximo": encode_cursor(logs[-1], "data_operacao") if mais else None,
+    }
+
+
+def iter_logs(db: mysql.connector.MySQLConnection, lote: int = 1000, **filtros) -> Iterator[dict]:
+    """Percorre todos os logs que atendem aos filtros, lote a lote, sem materializar o resultado."""
+    apos = None
+    while True:
+        pagina = consultar_logs(db, limite=min(lote, LOG_PAGE_SIZE_MAX), apos=apos, **filtros)
+        yield from pagina["logs"]
+        apos = pagina["proximo"]
+        if apos is None:
+            return
+
+
+def historico_registro(tabela: str, id_registro: int, db: mysql.connector.MySQLConnection) -> list:
+    """Histórico de alterações de um registro, da mais antiga para a mais recente."""
+    cursor = db.cursor(dictionary=True)
+    cursor.execute(
+        """
+        SELECT * FROM logs
+        WHERE tabela_afetada = %s AND id_registro = %s
+        ORDER BY data_operacao, id
+        """,
+        (tabela, id_registro)
+    )
+    historico = [_decodificar(log) for log in cursor.fetchall()]
+    cursor.close()
+    return historico
@@ -0,0 +1,358 @@
+import glob
+import gzip
+import heapq
+import itertools
+import json
+import logging
+import os
+import threading
+from datetime import date, datetime
+from typing import Iterator, Optional, Tuple
+
+import mysql.connector
+
+from config import Config
+from models.database import get_connection
+from models.log_model import _de_json, json_default
+
+logger = logging.getLogger(__name__)
+
+PARTICAO_FUTURA = "p_futuro"
+# Rodadas de exportação de linhas que chegaram a um mês já arquivado antes de desistir de removê-lo
+MAX_RODADAS_REMOCAO = 3
+
+
+def _inicio_mes(dia: date) -> date:
+    return date(dia.year, dia.month, 1)
+
+
+def _somar_meses(dia: date, meses: int) -> date:
+    total = dia.year * 12 + dia.month - 1 + meses
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def _nome_particao(mes: date) -> str:
+    return f"p{mes:%Y%m}"
+
+
+def _mes_da_particao(nome: str) -> Optional[date]:
+    try:
+        return datetime.strptime(nome[1:], "%Y%m").date()
+    except ValueError:
+        return None
+
+
+def _particao_sql(mes: date) -> str:
+    limite = _somar_meses(mes, 1)
+    return (f"PARTITION {_nome_particao(mes)} "
+            f"VALUES LESS THAN (UNIX_TIMESTAMP('{limite:%Y-%m-%d} 00:00:00'))")
+
+
+def listar_particoes(db: mysql.connector.MySQLConnection) -> list:
+    cursor = db.cursor()
+    cursor.execute(
+        """
+        SELECT PARTITION_NAME FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'logs' AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+        """
+    )
+    particoes = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    return particoes
+
+
+def particionar_logs(db: mysql.connector.MySQLConnection, hoje: Optional[date] = None):
+    """
+    Converte a tabela de logs para particionamento mensal por data_operacao.
+    Reconstrói a tabela inteira: rode pelo `cli.py logs particoes`, fora do horário de pico.
+    """
+    hoje = hoje or date.today()
+    cursor = db.cursor()
+    cursor.execute("SELECT MIN(data_operacao) FROM logs")
+    menor = cursor.fetchone()[0]
+    mes = _inicio_mes(menor.date() if menor else hoje)
+    ultimo = _somar_meses(_inicio_mes(hoje), Config.LOG_PARTICOES_FUTURAS)
+
+    particoes = []
+    while mes <= ultimo:
+        particoes.append(_particao_sql(mes))
+        mes = _somar_meses(mes, 1)
+    particoes.append(f"PARTITION {PARTICAO_FUTURA} VALUES LESS THAN MAXVALUE")
+
+    logger.info(f"Particionando tabela de logs em {len(particoes)} partições")
+    cursor.execute(
+        "ALTER TABLE logs PARTITION BY RANGE (UNIX_TIMESTAMP(data_operacao)) ("
+        + ", ".join(particoes) + ")"
+    )
+    cursor.close()
+
+
+def garantir_particoes(
+    db: mysql.connector.MySQLConnection,
+    hoje: Optional[date] = None,
+    particionar: bool = False
+):
+    """
+    Cria partições para os próximos meses, dividindo a partição p_futuro.
+    Uma tabela ainda não particionada só é convertida com particionar=True.
+    """
+    hoje = hoje or date.today()
+    particoes = listar_particoes(db)
+    if not particoes:
+        if particionar:
+            particionar_logs(db, hoje)
+        return
+
+    meses = [m for m in map(_mes_da_particao, particoes) if m]
+    proximo = _somar_meses(max(meses), 1) if meses else _inicio_mes(hoje)
+    ultimo = _somar_meses(_inicio_mes(hoje), Config.LOG_PARTICOES_FUTURAS)
+
+    novas = []
+    while proximo <= ultimo:
+        novas.append(_particao_sql(proximo))
+        proximo = _somar_meses(proximo, 1)
+    if not novas:
+        return
+
+    cursor = db.cursor()
+    cursor.execute(
+        f"ALTER TABLE logs REORGANIZE PARTITION {PARTICAO_FUTURA} INTO ("
+        + ", ".join(novas)
+        + f", PARTITION {PARTICAO_FUTURA} VALUES LESS THAN MAXVALUE)"
+    )
+    cursor.close()
+    logger.info(f"{len(novas)} partições de logs criadas")
+
+
+def _caminho_arquivo(mes: date, diretorio: str) -> str:
+    base = os.path.join(diretorio, f"logs_{mes:%Y_%m}")
+    caminho = f"{base}.jsonl.gz"
+    parte = 1
+    # Uma nova exportação do mesmo mês (ex.: após falha no meio da retenção)
+    # vira um arquivo adicional em vez de sobrescrever o existente
+    while os.path.exists(caminho):
+        parte += 1
+        caminho = f"{base}.{parte}.jsonl.gz"
+    return caminho
+
+
+def _exportar(
+    db: mysql.connector.MySQLConnection,
+    mes: date,
+    diretorio: str,
+    apos_id: int = 0
+) -> Tuple[int, int]:
+    """Exporta os logs do mês com id acima de apos_id; retorna o total e o último id exportado."""
+    inicio, fim = mes, _somar_meses(mes, 1)
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = _caminho_arquivo(mes, diretorio)
+    temporario = caminho + ".tmp"
+
+    total = 0
+    ultimo_id = apos_id
+    with gzip.open(temporario, "wt", encoding="utf-8") as arquivo:
+        while True:
+            cursor = db.cursor(dictionary=True)
+            cursor.execute(
+                """
+                SELECT * FROM logs
+                WHERE data_operacao >= %s AND data_operacao < %s AND id > %s
+                ORDER BY id LIMIT %s
+                """,
+                (inicio, fim, ultimo_id, Config.LOG_RETENCAO_LOTE)
+            )
+            logs = cursor.fetchall()
+            cursor.close()
+            if not logs:
+                break
+            for log in logs:
+                log["dados_anteriores"] = _de_json(log["dados_anteriores"])
+                log["dados_novos"] = _de_json(log["dados_novos"])
+                arquivo.write(json.dumps(log, ensure_ascii=False, default=json_default) + "\n")
+            total += len(logs)
+            ultimo_id = logs[-1]["id"]
+
+    if total == 0:
+        os.remove(temporario)
+        return 0, ultimo_id
+    os.replace(temporario, caminho)
+    logger.info(f"{total} logs de {mes:%Y-%m} arquivados em {caminho}")
+    return total, ultimo_id
+
+
+def arquivar_mes(db: mysql.connector.MySQLConnection, mes: date, diretorio: str) -> int:
+    """Exporta os logs de um mês para um arquivo JSONL compactado e retorna o total exportado."""
+    return _exportar(db, mes, diretorio)[0]
+
+
+def _remover_particao(db: mysql.connector.MySQLConnection, mes: date, ultimo_id: int, diretorio: str) -> int:
+    """
+    Remove a partição do mês só depois de confirmar, com a tabela bloqueada, que
+    nenhuma linha chegou depois da exportação (ex.: reenvio do arquivo de
+    contingência do gravador de logs, que insere linhas com datas antigas).
+    As linhas novas vão para um arquivo adicional do mês antes de nova tentativa.
+    Retorna o total de linhas exportadas nas rodadas extras.
+    """
+    nome = _nome_particao(mes)
+    extras = 0
+    cursor = db.cursor()
+    try:
+        for _ in range(MAX_RODADAS_REMOCAO):
+            cursor.execute("LOCK TABLES logs WRITE")
+            cursor.execute(f"SELECT COUNT(*) FROM logs PARTITION ({nome}) WHERE id > %s", (ultimo_id,))
+            if cursor.fetchone()[0] == 0:
+                cursor.execute(f"ALTER TABLE logs DROP PARTITION {nome}")
+                return extras
+            cursor.execute("UNLOCK TABLES")
+            total, ultimo_id = _exportar(db, mes, diretorio, ultimo_id)
+            extras += total
+        logger.warning(f"Partição {nome} continua recebendo logs; remoção adiada para a próxima execução")
+        return extras
+    finally:
+        cursor.execute("UNLOCK TABLES")
+        cursor.close()
+
+
+def _remover_linhas(db: mysql.connector.MySQLConnection, mes: date, ultimo_id: int):
+    # Sem partição própria: remove em lotes pequenos para não segurar locks.
+    # Só apaga o que foi exportado; linhas que chegaram depois ficam para a próxima execução.
+    cursor = db.cursor()
+    while True:
+        cursor.execute(
+            "DELETE FROM logs WHERE data_operacao >= %s AND data_operacao < %s AND id <= %s LIMIT %s",
+            (mes, _somar_meses(mes, 1), ultimo_id, Config.LOG_RETENCAO_LOTE)
+        )
+        removidos = cursor.rowcount
+        db.commit()
+        if removidos < Config.LOG_RETENCAO_LOTE:
+            break
+    cursor.close()
+
+
+def executar_retencao(db: mysql.connector.MySQLConnection, hoje: Optional[date] = None) -> dict:
+    """
+    Arquiva e remove os meses de log mais antigos que LOG_RETENCAO_MESES.
+    Usa um lock nomeado para que apenas um worker execute por vez.
+    """
+    hoje = hoje or date.today()
+    cursor = db.cursor()
+    cursor.execute("SELECT GET_LOCK('log_retencao', 0)")
+    if not cursor.fetchone()[0]:
+        cursor.close()
+        return {"executado": False}
+
+    arquivados = {}
+    try:
+        # Só cria as partições futuras; a conversão inicial da tabela é feita pelo `cli.py logs particoes`
+        garantir_particoes(db, hoje)
+
+        corte = _somar_meses(_inicio_mes(hoje), -Config.LOG_RETENCAO_MESES)
+        cursor.execute("SELECT MIN(data_operacao) FROM logs WHERE data_operacao < %s", (corte,))
+        menor = cursor.fetchone()[0]
+        particoes = listar_particoes(db)
+        mes = _inicio_mes(menor.date()) if menor else corte
+        while mes < corte:
+            total, ultimo_id = _exportar(db, mes, Config.LOG_ARQUIVO_DIR)
+            if _nome_particao(mes) in particoes:
+                total += _remover_particao(db, mes, ultimo_id, Config.LOG_ARQUIVO_DIR)
+            elif total:
+                _remover_linhas(db, mes, ultimo_id)
+            if total:
+                arquivados[f"{mes:%Y-%m}"] = total
+            mes = _somar_meses(mes, 1)
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK('log_retencao')")
+        cursor.fetchone()
+        cursor.close()
+    return {"executado": True, "arquivados": arquivados}
+
+
+def _mes_do_arquivo(caminho: str) -> date:
+    ano, mes = os.path.basename(caminho)[5:12].split("_")
+    return date(int(ano), int(mes), 1)
+
+
+def _ler_linhas(caminho: str) -> Iterator[dict]:
+    with gzip.open(caminho, "rt", encoding="utf-8") as arquivo:
+        for linha in arquivo:
+            yield json.loads(linha)
+
+
+def _logs_do_mes(caminhos: list) -> Iterator[dict]:
+    """
+    Junta os arquivos de um mês em ordem de id. Cada arquivo é gravado em ordem de
+    id, e exportações repetidas do mesmo mês podem conter o mesmo log: a junção
+    descarta os repetidos guardando só o último id, sem acumular ids na memória.
+    """
+    anterior = None
+    for log in heapq.merge(*map(_ler_linhas, caminhos), key=lambda log: log["id"]):
+        if log["id"] != anterior:
+            anterior = log["id"]
+            yield log
+
+
+def ler_arquivo(
+    diretorio: str,
+    inicio: Optional[datetime] = None,
+    fim: Optional[datetime] = None,
+    tabela: Optional[str] = None,
+    id_registro: Optional[int] = None,
+    id_usuario: Optional[int] = None,
+    tipo_operacao: Optional[str] = None
+) -> Iterator[dict]:
+    """Percorre os logs arquivados que atendem aos filtros, sem carregá-los no MySQL."""
+    caminhos = sorted(glob.glob(os.path.join(diretorio, "logs_*.jsonl.gz")), key=_mes_do_arquivo)
+    for mes_arquivo, arquivos in itertools.groupby(caminhos, key=_mes_do_arquivo):
+        if inicio and _somar_meses(mes_arquivo, 1) <= _inicio_mes(inicio.date()):
+            continue
+        if fim and datetime.combine(mes_arquivo, datetime.min.time()) >= fim:
+            continue
+
+        for log in _logs_do_mes(list(arquivos)):
+            data = datetime.fromisoformat(log["data_operacao"])
+            if inicio and data < inicio or fim and data >= fim:
+                continue
+            if tabela and log["tabela_afetada"] != tabela:
+                continue
+            if id_registro is not None and log["id_registro"] != id_registro:
+                continue
+            if id_usuario is not None and log["id_usuario"] != id_usuario:
+                continue
+            if tipo_operacao and log["tipo_operacao"] != tipo_operacao:
+                continue
+            yield log
+
+
+class RetencaoScheduler:
+    """Executa a retenção de logs periodicamente numa thread em segundo plano."""
+
+    def __init__(self, intervalo: float):
+        self.intervalo = intervalo
+        self._parar = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._run, name="log-retencao", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._parar.set()
+            self._thread.join(5)
+            self._thread = None
+
+    def _run(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                with get_connection() as conn:
+                    resultado = executar_retencao(conn)
+                if resultado.get("arquivados"):
+                    logger.info(f"Retenção de logs concluída: {resultado['arquivados']}")
+            except Exception as e:
+                logger.error(f"Erro na retenção de logs: {str(e)}", exc_info=True)
+
+
+retencao_scheduler = RetencaoScheduler(Config.LOG_RETENCAO_INTERVALO)
@@ -0,0 +1,279 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Optional
+
+from config import Config
+from metricas import metricas
+from models.database import get_connection
+from models.replicas import ERROS_CONEXAO
+
+logger = logging.getLogger(__name__)
+
+INSERT_LOG = """
+    INSERT INTO logs (
+        tipo_operacao,
+        tabela_afetada,
+        id_registro,
+        dados_anteriores,
+        dados_novos,
+        id_usuario,
+        ip_origem,
+        data_operacao
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s, FROM_UNIXTIME(%s))
+"""
+
+_PARAR = object()
+
+
+class LogWriter:
+    """
+    Grava os eventos de auditoria em segundo plano.
+
+    Os eventos entram numa fila limitada e são gravados com inserts de várias
+    linhas quando o lote atinge `batch_size` ou quando `flush_interval`
+    segundos se passam desde o primeiro evento pendente. Se o banco estiver
+    indisponível, os lotes vão para `spill_file` (quando configurado) e são
+    reenviados no próximo flush bem-sucedido.
+
+    Uma linha que o banco recusa sozinha (dado inválido, não conexão) volta ao
+    spill com a falha contada; depois de `max_falhas` ela vai para
+    `<spill_file>.rejeitados` e deixa de ser reenviada.
+    """
+
+    def __init__(self, max_fila: int, batch_size: int, flush_interval: float,
+                 spill_file: Optional[str] = None, max_falhas: int = 3):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_file = spill_file or None
+        self.max_falhas = max_falhas
+        self._fila = queue.Queue(maxsize=max_fila)
+        self._thread = None
+        self._parado = False
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self.enfileirados = 0
+        self.gravados = 0
+        self.descartados = 0
+        self.derramados = 0
+        self.rejeitados = 0
+        self.falhas = 0
+
+    def _iniciar(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+            self._thread.start()
+
+    def start(self):
+        with self._lock:
+            self._parado = False
+            self._iniciar()
+
+    def stop(self, timeout: float = 10.0):
+        """Grava tudo o que estiver na fila e encerra a thread. Eventos posteriores vão para o spill."""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+            self._parado = True
+        if thread is None:
+            return
+        self._fila.put(_PARAR)
+        thread.join(timeout)
+        if thread.is_alive():
+            logger.warning(f"Log writer não terminou em {timeout}s; {self._fila.qsize()} eventos pendentes")
+
+    def enqueue(self, linha: tuple) -> bool:
+        with self._lock:
+            if not self._parado:
+                self._iniciar()
+                try:
+                    self._fila.put_nowait(linha)
+                    self.enfileirados += 1
+                    return True
+                except queue.Full:
+                    self.descartados += 1
+                    logger.warning("Fila de logs cheia, evento de auditoria descartado")
+                    return False
+        # Depois do stop (ex.: requisição terminando durante o desligamento) não
+        # há thread para gravar: o evento vai direto para o spill, reenviado na próxima inicialização
+        logger.warning("Log writer parado, evento de auditoria enviado ao spill")
+        self._derramar([(linha, 0)])
+        return False
+
+    def _run(self):
+        lote = []
+        limite = None
+        while True:
+            timeout = None if limite is None else max(0.0, limite - time.monotonic())
+            try:
+                item = self._fila.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            parar = item is _PARAR
+            if item is not None and not parar:
+                lote.append(item)
+                if limite is None:
+                    limite = time.monotonic() + self.flush_interval
+
+            if lote and (parar or len(lote) >= self.batch_size or time.monotonic() >= limite):
+                self._flush(lote)
+                lote = []
+                limite = None
+
+            if parar:
+                # Drena o que ainda estiver na fila antes de sair
+                restantes = []
+                while True:
+                    try:
+                        item = self._fila.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not _PARAR:
+                        restantes.append(item)
+                for inicio in range(0, len(restantes), self.batch_size):
+                    self._flush(restantes[inicio:inicio + self.batch_size])
+                return
+
+    def _inserir(self, conn, linhas):
+        cursor = conn.cursor()
+        cursor.executemany(INSERT_LOG, linhas)
+        cursor.close()
+
+    def _gravar(self, conn, registros) -> list:
+        """
+        Insere os registros `(linha, falhas)` em lotes. Um lote recusado pelo banco
+        é refeito linha a linha para isolar as inválidas, devolvidas com a falha
+        contada e a mensagem de erro. Erros de conexão interrompem a gravação.
+        """
+        recusados = []
+        for inicio in range(0, len(registros), self.batch_size):
+            bloco = registros[inicio:inicio + self.batch_size]
+            try:
+                self._inserir(conn, [linha for linha, _ in bloco])
+                continue
+            except ERROS_CONEXAO:
+                raise
+            except Exception:
+                pass
+            # O INSERT que falha não grava nenhuma de suas linhas
+            for linha, falhas in bloco:
+                try:
+                    self._inserir(conn, [linha])
+                except ERROS_CONEXAO:
+                    raise
+                except Exception as e:
+                    recusados.append((linha, falhas + 1, str(e)))
+        return recusados
+
+    def _flush(self, lote):
+        inicio = time.perf_counter()
+        try:
+            with get_connection() as conn:
+                self._reenviar_spill(conn)
+                recusados = self._gravar(conn, [(linha, 0) for linha in lote])
+                conn.commit()
+            self.gravados += len(lote) - len(recusados)
+            metricas.observar("log_flush_segundos", time.perf_counter() - inicio)
+        except Exception as e:
+            self.falhas += 1
+            logger.error(f"Falha ao gravar {len(lote)} logs: {str(e)}")
+            self._derramar([(linha, 0) for linha in lote])
+            return
+        self._guardar_recusados(recusados)
+
+    def _guardar_recusados(self, recusados):
+        if not recusados:
+            return
+        self.falhas += 1
+        logger.error(f"{len(recusados)} logs recusados pelo banco: {recusados[0][2]}")
+        self._derramar([(linha, falhas) for linha, falhas, _ in recusados if falhas < self.max_falhas])
+        rejeitados = [r for r in recusados if r[1] >= self.max_falhas]
+        if not rejeitados:
+            return
+        self.rejeitados += len(rejeitados)
+        if not self.spill_file:
+            self.descartados += len(rejeitados)
+            return
+        try:
+            with self._spill_lock, open(self.spill_file + ".rejeitados", "a", encoding="utf-8") as arquivo:
+                for linha, falhas, erro in rejeitados:
+                    arquivo.write(json.dumps({"linha": linha, "falhas": falhas, "erro": erro}, ensure_ascii=False) + "\n")
+            logger.error(f"{len(rejeitados)} logs movidos para {self.spill_file}.rejeitados após {self.max_falhas} falhas")
+        except OSError as e:
+            self.descartados += len(rejeitados)
+            logger.error(f"Falha ao gravar arquivo de logs rejeitados: {str(e)}")
+
+    def _derramar(self, registros):
+        if not registros:
+            return
+        if not self.spill_file:
+            self.descartados += len(registros)
+            return
+        try:
+            with self._spill_lock, open(self.spill_file, "a", encoding="utf-8") as arquivo:
+                for linha, falhas in registros:
+                    arquivo.write(json.dumps({"linha": linha, "falhas": falhas}, ensure_ascii=False) + "\n")
+            self.derramados += len(registros)
+        except OSError as e:
+            self.descartados += len(registros)
+            logger.error(f"Falha ao gravar arquivo de spill de logs: {str(e)}")
+
+    @staticmethod
+    def _ler_spill(caminho: str) -> list:
+        registros = []
+        with open(caminho, encoding="utf-8") as arquivo:
+            for l in arquivo:
+                if not l.strip():
+                    continue
+                dado = json.loads(l)
+                # Arquivos gravados por versões anteriores guardam só a linha
+                if isinstance(dado, list):
+                    registros.append((tuple(dado), 0))
+                else:
+                    registros.append((tuple(dado["linha"]), dado["falhas"]))
+        return registros
+
+    def _reenviar_spill(self, conn):
+        if not self.spill_file:
+            return
+        # O arquivo é renomeado antes do reenvio para que eventos derramados
+        # enquanto isso (enqueue depois do stop) não se percam ao removê-lo
+        reenvio = self.spill_file + ".reenvio"
+        with self._spill_lock:
+            if not os.path.exists(reenvio) and os.path.exists(self.spill_file):
+                os.replace(self.spill_file, reenvio)
+        if not os.path.exists(reenvio):
+            return
+        registros = self._ler_spill(reenvio)
+        recusados = self._gravar(conn, registros)
+        conn.commit()
+        os.remove(reenvio)
+        gravados = len(registros) - len(recusados)
+        self.gravados += gravados
+        self.derramados -= min(self.derramados, len(registros))
+        logger.info(f"{gravados} logs reenviados do arquivo de spill")
+        self._guardar_recusados(recusados)
+
+    def stats(self) -> dict:
+        return {
+            "fila": self._fila.qsize(),
+            "enfileirados": self.enfileirados,
+            "gravados": self.gravados,
+            "descartados": self.descartados,
+            "derramados": self.derramados,
+            "rejeitados": self.rejeitados,
+            "falhas": self.falhas,
+        }
+
+
+log_writer = LogWriter(
+    max_fila=Config.LOG_QUEUE_MAX,
+    batch_size=Config.LOG_BATCH_SIZE,
+    flush_interval=Config.LOG_FLUSH_INTERVAL,
+    spill_file=Config.LOG_SPILL_FILE,
+    max_falhas=Config.LOG_SPILL_MAX_FALHAS
+)
@@ -0,0 +1,211 @@
+import codecs
+import csv
+import io
+import json
+import logging
+from typing import IO, Iterable, Iterator, Optional
+
+import mysql.connector
+from mysql.connector import errorcode
+from config import Config
+from models.database import get_connection
+from models.log_model import json_default
+from models.produto_model import invalidar_cache_produto, iter_produtos
+from models.replicas import ERROS_CONEXAO
+from validators.produto_validator import validador_produto_importacao
+from validators.validacao import mensagens_com_campo
+
+logger = logging.getLogger(__name__)
+
+FORMATOS = ("csv", "jsonl")
+CAMPOS_EXPORTACAO = ("id", "nome", "descricao", "preco", "estoque", "created_at", "updated_at")
+
+UPSERT_PRODUTO = """
+    INSERT INTO produtos (id, nome, descricao, preco, estoque)
+    VALUES (%s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        nome = VALUES(nome),
+        descricao = VALUES(descricao),
+        preco = VALUES(preco),
+        estoque = VALUES(estoque),
+        versao = versao + 1,
+        removido_em = NULL
+"""
+
+
+def formato_do_arquivo(nome: Optional[str], padrao: str = "csv") -> str:
+    if nome and nome.lower().endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    if nome and nome.lower().endswith(".csv"):
+        return "csv"
+    return padrao
+
+
+def ler_registros(arquivo: Iterable[str], formato: str) -> Iterator[tuple]:
+    """Lê o arquivo linha a linha, produzindo (numero_linha, registro) sem carregá-lo inteiro."""
+    if formato == "csv":
+        leitor = csv.DictReader(arquivo)
+        for registro in leitor:
+            yield leitor.line_num, registro
+    elif formato == "jsonl":
+        for numero, linha in enumerate(arquivo, start=1):
+            if not linha.strip():
+                continue
+            try:
+                yield numero, json.loads(linha)
+            except ValueError as e:
+                yield numero, e
+    else:
+        raise ValueError(f"Formato inválido: {formato}")
+
+
+def _validar_lote(lote: list, relatorio: dict) -> list:
+    registros = []
+    for numero, registro in lote:
+        if isinstance(registro, Exception):
+            _registrar_erro(relatorio, numero, [f"JSON inválido: {registro}"])
+        else:
+            registros.append((numero, registro))
+
+    resultado = validador_produto_importacao.validar_lote(registros)
+    for numero, erros in resultado.erros:
+        _registrar_erro(relatorio, numero, mensagens_com_campo(erros))
+    return [
+        (numero, (dados["id"], dados["nome"], dados["descricao"], dados["preco"], dados["estoque"]))
+        for numero, dados in resultado.validos
+    ]
+
+
+def _registrar_erro(relatorio: dict, numero: int, mensagens: list):
+    relatorio["total_erros"] += 1
+    if len(relatorio["erros"]) < Config.IMPORT_MAX_ERROS_REPORTADOS:
+        relatorio["erros"].append({"linha": numero, "erros": mensagens})
+
+
+def importar_produtos(
+    registros: Iterable[tuple],
+    db: mysql.connector.MySQLConnection,
+    lote: int = Config.IMPORT_LOTE,
+    transacao: int = Config.IMPORT_TRANSACAO
+) -> dict:
+    """
+    Importa produtos em lotes. Linhas com `id` existente são atualizadas
+    (upsert), e voltam ao catálogo se tiverem sido removidas; as demais são
+    inseridas. Linhas inválidas são reportadas sem interromper a importação.
+
+    `lote` é o tamanho de cada executemany e `transacao` o número de linhas
+    gravadas por commit. Um lote recusado pelo banco é refeito linha a linha,
+    e as linhas recusadas entram no relatório como as inválidas; só erros de
+    conexão e deadlocks (que desfazem a transação) interrompem a importação.
+    """
+    relatorio = {"processados": 0, "gravados": 0, "total_erros": 0, "erros": []}
+    cursor = db.cursor()
+    pendentes = 0
+    ids_alterados = set()
+
+    def inserir(linhas):
+        try:
+            cursor.executemany(UPSERT_PRODUTO, [params for _, params in linhas])
+            return [params for _, params in linhas]
+        except ERROS_CONEXAO:
+            raise
+        except mysql.connector.Error as err:
+            # O deadlock desfaz a transação inteira, não só o comando
+            if err.errno == errorcode.ER_LOCK_DEADLOCK:
+                raise
+        # O INSERT que falha não grava nenhuma de suas linhas
+        gravadas = []
+        for numero, params in linhas:
+            try:
+                cursor.execute(UPSERT_PRODUTO, params)
+                gravadas.append(params)
+            except ERROS_CONEXAO:
+                raise
+            except mysql.connector.Error as err:
+                if err.errno == errorcode.ER_LOCK_DEADLOCK:
+                    raise
+                _registrar_erro(relatorio, numero, [f"Recusada pelo banco: {err.msg}"])
+        return gravadas
+
+    def gravar(linhas):
+        nonlocal pendentes
+        if not linhas:
+            return
+        linhas = inserir(linhas)
+        pendentes += len(linhas)
+        ids_alterados.update(linha[0] for linha in linhas if linha[0] is not None)
+        if pendentes >= transacao:
+            commit()
+
+    def commit():
+        nonlocal pendentes
+        db.commit()
+        relatorio["gravados"] += pendentes
+        pendentes = 0
+        for id in ids_alterados:
+            invalidar_cache_produto(id)
+        ids_alterados.clear()
+        invalidar_cache_produto()
+
+    try:
+        atual = []
+        for item in registros:
+            atual.append(item)
+            relatorio["processados"] += 1
+            if len(atual) >= lote:
+                gravar(_validar_lote(atual, relatorio))
+                atual = []
+        gravar(_validar_lote(atual, relatorio))
+        if pendentes:
+            commit()
+    except mysql.connector.Error as err:
+        db.rollback()
+        logger.error(f"Erro na importação de produtos: {err.msg}")
+        raise ValueError(f"Erro ao importar produtos: {err.msg}")
+    finally:
+        cursor.close()
+
+    return relatorio
+
+
+def importar_arquivo(arquivo: IO[bytes], formato: str, db: mysql.connector.MySQLConnection, **kwargs) -> dict:
+    """Importa de um arquivo binário (ex.: upload), decodificando linha a linha."""
+    linhas = codecs.iterdecode(arquivo, "utf-8-sig")
+    return importar_produtos(ler_registros(linhas, formato), db, **kwargs)
+
+
+def _linha_exportacao(produto: dict) -> dict:
+    return {campo: produto.get(campo) for campo in CAMPOS_EXPORTACAO}
+
+
+def exportar_produtos(db: mysql.connector.MySQLConnection, formato: str = "csv",
+                      lote: int = Config.IMPORT_LOTE, **filtros) -> Iterator[str]:
+    """Gera o catálogo em CSV ou JSONL em blocos de `lote` linhas, sem materializar a tabela."""
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato inválido: {formato}")
+
+    buffer = io.StringIO()
+    escritor = None
+    if formato == "csv":
+        escritor = csv.DictWriter(buffer, fieldnames=CAMPOS_EXPORTACAO)
+        escritor.writeheader()
+
+    for numero, produto in enumerate(iter_produtos(db, lote=lote, **filtros), start=1):
+        linha = _linha_exportacao(produto)
+        if escritor:
+            escritor.writerow(linha)
+        else:
+            buffer.write(json.dumps(linha, ensure_ascii=False, default=json_default) + "\n")
+        if numero % lote == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_exportacao(formato: str = "csv", **filtros) -> Iterator[str]:
+    """Exportação com conexão própria, mantida apenas enquanto o conteúdo é consumido."""
+    with get_connection() as conn:
+        yield from exportar_produtos(conn, formato, **filtros)
@@ -1,13 +1,26 @@
+import base64
+import json
+import logging
+import re
+import threading
 import mysql.connector
-from pydantic import BaseModel, Field
-from typing import Optional
+from datetime import datetime
+from decimal import Decimal
+from pydantic import BaseModel
+from typing import Iterator, List, NamedTuple, Optional
+from config import Config
+from models.cache import produto_cache
+from models.exclusao import remover_em_lote
+
+logger = logging.getLogger(__name__)
 
 
 class ProdutoBase(BaseModel):
-    nome: str = Field(..., min_length=3)
+    # Só os tipos: as regras de negócio ficam em validators.produto_validator
+    nome: str
     descricao: Optional[str] = None
-    preco: float = Field(..., gt=0)
-    estoque: int = Field(..., ge=0)
+    preco: float
+    estoque: int
 
 
 class ProdutoCreate(ProdutoBase):
@@ -16,23 +29,339 @@ class ProdutoCreate(ProdutoBase):
 
 class Produto(ProdutoBase):
     id: int
+    versao: int = 0
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
 
-def get_produto_by_id(id: int, db: mysql.connector.MySQLConnection):
+def invalidar_cache_produto(id: Optional[int] = None):
+    """Remove o produto do cache e descarta todas as páginas de listagem em cache."""
+    if id is not None:
+        produto_cache.invalidate(f"produto:{id}")
+    produto_cache.invalidate_namespace("produtos")
+
+
+def _select_produto_by_id(id: int, db: mysql.connector.MySQLConnection, bloquear: bool = False):
+    """Lê direto do banco, sem cache; com `bloquear`, a linha fica travada até o fim da transação."""
     cursor = db.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM produtos WHERE id = %s", (id,))
+    cursor.execute(
+        "SELECT * FROM produtos WHERE id = %s AND removido_em IS NULL" + (" FOR UPDATE" if bloquear else ""), (id,)
+    )
     return cursor.fetchone()
 
 
+def get_produto_by_id(id: int, db: mysql.connector.MySQLConnection):
+    return produto_cache.get_or_load(f"produto:{id}", lambda: _select_produto_by_id(id, db))
+
+
 def get_all_produtos(db: mysql.connector.MySQLConnection):
     cursor = db.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM produtos")
+    cursor.execute("SELECT * FROM produtos WHERE removido_em IS NULL")
     return cursor.fetchall()
 
 
+ORDENACOES = ("id", "nome", "preco")
+
+
+def encode_cursor(registro: dict, ordenar_por: str) -> str:
+    valor = registro[ordenar_por]
+    if isinstance(valor, (Decimal, datetime)):
+        valor = str(valor)
+    bruto = json.dumps([valor, registro["id"]], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(bruto).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        valor, id = json.loads(bruto)
+        return valor, int(id)
+    except (ValueError, TypeError):
+        raise ValueError("Cursor de paginação inválido")
+
+
+def _filtros_sql(preco_min=None, preco_max=None, em_estoque=False):
+    # Produtos removidos ficam fora de toda leitura; os índices começam por removido_em
+    condicoes, params = ["removido_em IS NULL"], []
+    if preco_min is not None:
+        condicoes.append("preco >= %s")
+        params.append(preco_min)
+    if preco_max is not None:
+        condicoes.append("preco <= %s")
+        params.append(preco_max)
+    if em_estoque:
+        condicoes.append("estoque > 0")
+    return condicoes, params
+
+
+def listar_produtos_pagina(
+    db: mysql.connector.MySQLConnection,
+    ordenar_por: str = "id",
+    direcao: str = "asc",
+    limite: int = Config.PRODUTOS_PAGE_SIZE,
+    apos: Optional[str] = None,
+    antes: Optional[str] = None,
+    preco_min: Optional[float] = None,
+    preco_max: Optional[float] = None,
+    em_estoque: bool = False
+) -> dict:
+    """
+    Lista uma página de produtos usando paginação por cursor (keyset).
+
+    `apos` e `antes` são cursores opacos devolvidos em "proximo" e "anterior";
+    a ordenação usa sempre `id` como desempate, apoiada nos índices compostos.
+    As páginas ficam em cache até a próxima escrita em produtos.
+    """
+    chave = "produtos:pagina:{}:{}".format(
+        produto_cache.geracao("produtos"),
+        json.dumps([ordenar_por, direcao, limite, apos, antes, preco_min, preco_max, em_estoque])
+    )
+    return produto_cache.get_or_load(
+        chave,
+        lambda: _consultar_pagina(
+            db, ordenar_por, direcao, limite, apos, antes, preco_min, preco_max, em_estoque
+        ),
+        ttl=Config.CACHE_LISTAGEM_TTL
+    )
+
+
+def _consultar_pagina(db, ordenar_por, direcao, limite, apos, antes, preco_min, preco_max, em_estoque):
+    if ordenar_por not in ORDENACOES:
+        raise ValueError(f"Ordenação inválida: {ordenar_por}")
+    if direcao not in ("asc", "desc"):
+        raise ValueError(f"Direção inválida: {direcao}")
+    limite = max(1, min(int(limite), Config.PRODUTOS_PAGE_SIZE_MAX))
+
+    condicoes, params = _filtros_sql(preco_min, preco_max, em_estoque)
+
+    voltando = antes is not None
+    cursor_token = antes if voltando else apos
+    # Ao voltar uma página a busca percorre o índice no sentido inverso
+    crescente = (direcao == "asc") != voltando
+    op = ">" if crescente else "<"
+    ordem = "ASC" if crescente else "DESC"
+
+    if cursor_token is not None:
+        valor, ultimo_id = decode_cursor(cursor_token)
+        if ordenar_por == "id":
+            condicoes.append(f"id {op} %s")
+            params.append(ultimo_id)
+        else:
+            condicoes.append(f"({ordenar_por} {op} %s OR ({ordenar_por} = %s AND id {op} %s))")
+            params.extend([valor, valor, ultimo_id])
+
+    where = " AND ".join(condicoes)
+    order_by = "id" if ordenar_por == "id" else f"{ordenar_por} {ordem}, id"
+
+    cursor = db.cursor(dictionary=True)
+    cursor.execute(
+        f"SELECT * FROM produtos WHERE {where} ORDER BY {order_by} {ordem} LIMIT %s",
+        (*params, limite + 1)
+    )
+    produtos = cursor.fetchall()
+    cursor.close()
+
+    mais = len(produtos) > limite
+    produtos = produtos[:limite]
+    if voltando:
+        produtos.reverse()
+
+    tem_proxima = (not voltando and mais) or (voltando and bool(produtos))
+    tem_anterior = (voltando and mais) or (not voltando and apos is not None and bool(produtos))
+
+    return {
+        "produtos": produtos,
+        "proximo": encode_cursor(produtos[-1], ordenar_por) if tem_proxima else None,
+        "anterior": encode_cursor(produtos[0], ordenar_por) if tem_anterior else None,
+    }
+
+
+def iter_produtos(
+    db: mysql.connector.MySQLConnection,
+    lote: int = 1000,
+    preco_min: Optional[float] = None,
+    preco_max: Optional[float] = None,
+    em_estoque: bool = False
+) -> Iterator[dict]:
+    """Percorre todos os produtos em lotes por id, sem carregar a tabela inteira."""
+    ultimo_id = 0
+    while True:
+        condicoes, params = _filtros_sql(preco_min, preco_max, em_estoque)
+        condicoes.append("id > %s")
+        params.append(ultimo_id)
+        cursor = db.cursor(dictionary=True)
+        cursor.execute(
+            f"SELECT * FROM produtos WHERE {' AND '.join(condicoes)} ORDER BY id LIMIT %s",
+            (*params, lote)
+        )
+        produtos = cursor.fetchall()
+        cursor.close()
+        if not produtos:
+            return
+        yield from produtos
+        ultimo_id = produtos[-1]["id"]
+        if len(produtos) < lote:
+            return
+
+
+_PALAVRA = re.compile(r"\w+", re.UNICODE)
+
+# Lista padrão de stopwords e tamanho mínimo de palavra do InnoDB, usados
+# quando não é possível ler a configuração do servidor
+STOPWORDS_FULLTEXT = frozenset({
+    "a", "about", "an", "are", "as", "at", "be", "by", "com", "de", "en", "for",
+    "from", "how", "i", "in", "is", "it", "la", "of", "on", "or", "that", "the",
+    "this", "to", "was", "what", "when", "where", "who", "will", "with", "und", "www",
+})
+MIN_TOKEN_FULLTEXT = 3
+
+
+class ConfiguracaoFulltext(NamedTuple):
+    min_token: int
+    stopwords: frozenset
+
+
+FULLTEXT_PADRAO = ConfiguracaoFulltext(MIN_TOKEN_FULLTEXT, STOPWORDS_FULLTEXT)
+
+_fulltext: Optional[ConfiguracaoFulltext] = None
+_fulltext_lock = threading.Lock()
+
+
+def _texto(valor) -> str:
+    return valor.decode("utf-8") if isinstance(valor, (bytes, bytearray)) else str(valor)
+
+
+def _ler_configuracao_fulltext(db: mysql.connector.MySQLConnection) -> ConfiguracaoFulltext:
+    cursor = db.cursor()
+    try:
+        cursor.execute(
+            "SELECT @@innodb_ft_min_token_size, @@innodb_ft_enable_stopword, "
+            "@@innodb_ft_user_stopword_table, @@innodb_ft_server_stopword_table"
+        )
+        min_token, ativas, tabela_usuario, tabela_servidor = cursor.fetchone()
+        stopwords = frozenset()
+        if ativas:
+            tabela = tabela_usuario or tabela_servidor
+            if tabela:
+                # Formato "banco/tabela", com a coluna `value`
+                banco, _, nome = _texto(tabela).partition("/")
+                cursor.execute(f"SELECT value FROM `{banco}`.`{nome}`")
+            else:
+                cursor.execute("SELECT value FROM INFORMATION_SCHEMA.INNODB_FT_DEFAULT_STOPWORD")
+            stopwords = frozenset(_texto(valor).lower() for (valor,) in cursor.fetchall())
+        return ConfiguracaoFulltext(int(min_token), stopwords)
+    except mysql.connector.Error as err:
+        # A lista padrão em INFORMATION_SCHEMA exige o privilégio PROCESS
+        logger.warning(f"Configuração FULLTEXT do servidor indisponível, usando a padrão do InnoDB: {err.msg}")
+        return FULLTEXT_PADRAO
+    finally:
+        cursor.close()
+
+
+def configuracao_fulltext(db: mysql.connector.MySQLConnection) -> ConfiguracaoFulltext:
+    """
+    Tamanho mínimo de palavra e stopwords que o servidor aplica ao índice
+    FULLTEXT, lidos uma vez por processo. Palavras que o índice não guarda,
+    como termos obrigatórios, zerariam a busca.
+    """
+    global _fulltext
+    if _fulltext is None:
+        with _fulltext_lock:
+            if _fulltext is None:
+                _fulltext = _ler_configuracao_fulltext(db)
+    return _fulltext
+
+
+def termo_busca_booleano(termo: str, fulltext: ConfiguracaoFulltext = FULLTEXT_PADRAO) -> str:
+    """
+    Converte o texto digitado numa consulta FULLTEXT em modo booleano:
+    todas as palavras são obrigatórias e casam por prefixo. Operadores
+    digitados pelo usuário são descartados.
+    """
+    palavras = [
+        p for p in _PALAVRA.findall(termo)
+        if len(p) >= fulltext.min_token and p.lower() not in fulltext.stopwords
+    ]
+    return " ".join(f"+{p}*" for p in palavras)
+
+
+def buscar_produtos(
+    termo: str,
+    db: mysql.connector.MySQLConnection,
+    limite: int = Config.PRODUTOS_PAGE_SIZE,
+    apos: Optional[str] = None,
+    antes: Optional[str] = None
+) -> dict:
+    """
+    Busca produtos por nome e descrição, ordenados por relevância.
+    Ocorrências no nome pesam o dobro das ocorrências apenas na descrição.
+
+    A paginação é por cursor sobre (relevância, id), como na listagem: uma
+    página funda não lê nem descarta as anteriores como faria um OFFSET.
+    """
+    consulta = termo_busca_booleano(termo, configuracao_fulltext(db))
+    limite = max(1, min(int(limite), Config.PRODUTOS_PAGE_SIZE_MAX))
+    if not consulta:
+        return {"produtos": [], "proximo": None, "anterior": None}
+
+    chave = "produtos:busca:{}:{}".format(
+        produto_cache.geracao("produtos"), json.dumps([consulta, limite, apos, antes])
+    )
+    return produto_cache.get_or_load(
+        chave, lambda: _consultar_busca(db, consulta, limite, apos, antes), ttl=Config.CACHE_LISTAGEM_TTL
+    )
+
+
+def _consultar_busca(db, consulta, limite, apos, antes):
+    voltando = antes is not None
+    cursor_token = antes if voltando else apos
+    having, params = "", []
+    if cursor_token is not None:
+        relevancia, ultimo_id = decode_cursor(cursor_token)
+        # Relevância decrescente e id crescente; ao voltar uma página, o inverso
+        if voltando:
+            having = "HAVING relevancia > %s OR (relevancia = %s AND id < %s)"
+        else:
+            having = "HAVING relevancia < %s OR (relevancia = %s AND id > %s)"
+        params = [float(relevancia), float(relevancia), ultimo_id]
+    ordem = "relevancia ASC, id DESC" if voltando else "relevancia DESC, id"
+
+    cursor = db.cursor(dictionary=True)
+    # Arredondada para que o valor do cursor volte ao servidor sem diferença de ponto flutuante
+    cursor.execute(
+        f"""
+        SELECT *,
+            ROUND(2 * MATCH(nome) AGAINST (%s IN BOOLEAN MODE)
+                + MATCH(nome, descricao) AGAINST (%s IN BOOLEAN MODE), 6) AS relevancia
+        FROM produtos
+        WHERE MATCH(nome, descricao) AGAINST (%s IN BOOLEAN MODE) AND removido_em IS NULL
+        {having}
+        ORDER BY {ordem}
+        LIMIT %s
+        """,
+        (consulta, consulta, consulta, *params, limite + 1)
+    )
+    produtos = cursor.fetchall()
+    cursor.close()
+
+    mais = len(produtos) > limite
+    produtos = produtos[:limite]
+    if voltando:
+        produtos.reverse()
+
+    tem_proxima = (not voltando and mais) or (voltando and bool(produtos))
+    tem_anterior = (voltando and mais) or (not voltando and apos is not None and bool(produtos))
+
+    return {
+        "produtos": produtos,
+        "proximo": encode_cursor(produtos[-1], "relevancia") if tem_proxima else None,
+        "anterior": encode_cursor(produtos[0], "relevancia") if tem_anterior else None,
+    }
+
+
 def create_produto(produto: ProdutoCreate, db: mysql.connector.MySQLConnection):
     try:
         cursor = db.cursor()
@@ -41,23 +370,75 @@ def create_produto(produto: ProdutoCreate, db: mysql.connector.MySQLConnection):
             (produto.nome, produto.descricao, produto.preco, produto.estoque),
         )
         db.commit()
+        invalidar_cache_produto()
         return cursor.lastrowid
     except ValueError as err:
         db.rollback()
         raise ValueError(f"Erro ao criar produto: {err.msg}")
 
-def update_produto(id: int, produto: ProdutoBase, db: mysql.connector.MySQLConnection):
+class ConflitoVersaoError(ValueError):
+    pass
+
+
+def update_produto(id: int, produto: ProdutoBase, db: mysql.connector.MySQLConnection,
+                   versao: Optional[int] = None):
+    """
+    Atualiza o produto. Com `versao`, a escrita só acontece se ninguém tiver
+    alterado o produto desde que essa versão foi lida.
+    """
     cursor = db.cursor()
-    cursor.execute(
-        "UPDATE produtos SET nome=%s, descricao=%s, preco=%s, estoque=%s WHERE id=%s",
-        (produto.nome, produto.descricao, produto.preco, produto.estoque, id),
-    )
+    sql = ("UPDATE produtos SET nome=%s, descricao=%s, preco=%s, estoque=%s, versao=versao+1 "
+           "WHERE id=%s AND removido_em IS NULL")
+    params = [produto.nome, produto.descricao, produto.preco, produto.estoque, id]
+    if versao is not None:
+        sql += " AND versao=%s"
+        params.append(versao)
+    cursor.execute(sql, tuple(params))
+    rowcount = cursor.rowcount
     db.commit()
-    return cursor.rowcount
+    cursor.close()
+    if rowcount == 0 and versao is not None and _select_produto_by_id(id, db):
+        raise ConflitoVersaoError("O produto foi alterado por outra pessoa; revise os dados e salve novamente")
+    invalidar_cache_produto(id)
+    return rowcount
 
 
 def delete_produto(id: int, db: mysql.connector.MySQLConnection):
+    """Marca o produto como removido; a linha é apagada depois pelo expurgo (models/exclusao.py)."""
     cursor = db.cursor()
-    cursor.execute("DELETE FROM produtos WHERE id = %s", (id,))
+    cursor.execute(
+        "UPDATE produtos SET removido_em = CURRENT_TIMESTAMP WHERE id = %s AND removido_em IS NULL", (id,)
+    )
     db.commit()
-    return cursor.rowcount
\ No newline at end of file
+    invalidar_cache_produto(id)
+    return cursor.rowcount
+
+
+def remover_produtos(
+    db: mysql.connector.MySQLConnection,
+    ids: Optional[List[int]] = None,
+    preco_min: Optional[float] = None,
+    preco_max: Optional[float] = None,
+    estoque_max: Optional[int] = None,
+    atualizado_antes: Optional[datetime] = None
+) -> int:
+    """
+    Remove de uma vez os produtos da lista `ids` e/ou que atendem aos filtros,
+    em lotes de EXCLUSAO_LOTE. Sem ids nem filtros nada é removido.
+    """
+    condicoes, params = _filtros_sql(preco_min, preco_max)
+    if estoque_max is not None:
+        condicoes.append("estoque <= %s")
+        params.append(estoque_max)
+    if atualizado_antes is not None:
+        condicoes.append("updated_at < %s")
+        params.append(atualizado_antes)
+    if ids is None and len(condicoes) == 1:
+        raise ValueError("Informe os ids ou ao menos um filtro para remover produtos")
+
+    def invalidar(bloco):
+        for id in bloco:
+            produto_cache.invalidate(f"produto:{id}")
+        produto_cache.invalidate_namespace("produtos")
+
+    return remover_em_lote(db, "produtos", condicoes, params, ids=ids, ao_remover=invalidar)
\ No newline at end of file
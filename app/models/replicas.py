@@ -0,0 +1,216 @@
+import contextvars
+import functools
+import itertools
+import logging
+import threading
+import time
+from typing import List
+
+import mysql.connector
+from starlette.requests import HTTPConnection
+
+from config import Config
+from metricas import metricas
+from models import cache
+from models.database import ConnectionPool, PoolTimeoutError, _connect, get_connection
+
+logger = logging.getLogger(__name__)
+
+ESTRATEGIAS = ("round_robin", "menor_latencia")
+
+# Erros que indicam réplica inacessível (e não um problema da consulta)
+ERROS_CONEXAO = (mysql.connector.errors.InterfaceError, mysql.connector.errors.OperationalError,
+                 PoolTimeoutError, OSError)
+
+# Estado da requisição em andamento: {"primario": bool, "escreveu": bool}
+_consistencia = contextvars.ContextVar("replicas_consistencia", default=None)
+
+
+class Replica:
+    def __init__(self, host: str, port: str):
+        self.host = host
+        self.port = port
+        self.nome = f"{host}:{port}"
+        self.pool = ConnectionPool(
+            size=Config.DB_POOL_SIZE,
+            max_overflow=Config.DB_POOL_MAX_OVERFLOW,
+            timeout=Config.DB_POOL_TIMEOUT,
+            recycle=Config.DB_POOL_RECYCLE,
+            pre_ping=Config.DB_POOL_PRE_PING,
+            connect=functools.partial(_connect, host=host, port=port)
+        )
+        self.latencia = 0.0
+        self.indisponivel_ate = 0.0
+
+    def disponivel(self, agora: float) -> bool:
+        return agora >= self.indisponivel_ate
+
+
+class RoteadorLeitura:
+    """
+    Distribui as leituras entre as réplicas, em rodízio ou pela menor latência
+    média recente. Uma réplica que falha fica em quarentena e a leitura segue
+    para a próxima; sem nenhuma disponível, vai para o primário.
+
+    Só as leituras de quem acabou de escrever voltam ao primário (ver
+    LeituraConsistenteMiddleware); as dos demais clientes seguem nas réplicas.
+    O cache compartilhado fica correto pela invalidação repetida ao fim da
+    janela (ver models/cache.py).
+    """
+
+    def __init__(self, replicas: List[Replica], estrategia: str = "round_robin", quarentena: float = 30.0):
+        if estrategia not in ESTRATEGIAS:
+            raise ValueError(f"Estratégia de réplica inválida: {estrategia}")
+        self.replicas = replicas
+        self.estrategia = estrategia
+        self.quarentena = quarentena
+        self._rodizio = itertools.count()
+        self._lock = threading.Lock()
+
+    def candidatas(self) -> List[Replica]:
+        """Réplicas disponíveis, na ordem em que devem ser tentadas."""
+        agora = time.monotonic()
+        disponiveis = [r for r in self.replicas if r.disponivel(agora)]
+        if not disponiveis:
+            return []
+        if self.estrategia == "menor_latencia":
+            return sorted(disponiveis, key=lambda r: r.latencia)
+        inicio = next(self._rodizio) % len(disponiveis)
+        return disponiveis[inicio:] + disponiveis[:inicio]
+
+    def usar_primario(self) -> bool:
+        estado = _consistencia.get()
+        return estado is not None and estado["primario"]
+
+    def registrar_latencia(self, replica: Replica, duracao: float):
+        # Média móvel exponencial: reage a mudanças sem oscilar a cada consulta
+        with self._lock:
+            replica.latencia = duracao if replica.latencia == 0 else 0.8 * replica.latencia + 0.2 * duracao
+
+    def marcar_falha(self, replica: Replica, erro: Exception):
+        replica.indisponivel_ate = time.monotonic() + self.quarentena
+        metricas.incrementar("db_replica_falhas_total", replica=replica.nome)
+        logger.warning(f"Réplica {replica.nome} indisponível por {self.quarentena:.0f}s: {str(erro)}")
+
+    def executar(self, func, *args, **kwargs):
+        """Executa `func(*args, db=conexao, **kwargs)` numa réplica, com failover para o primário."""
+        if not self.usar_primario():
+            for replica in self.candidatas():
+                inicio = time.perf_counter()
+                try:
+                    with get_connection(replica.pool) as conn:
+                        resultado = func(*args, db=conn, **kwargs)
+                except ERROS_CONEXAO as e:
+                    self.marcar_falha(replica, e)
+                    continue
+                self.registrar_latencia(replica, time.perf_counter() - inicio)
+                metricas.incrementar("db_leituras_total", destino=replica.nome)
+                return resultado
+
+        metricas.incrementar("db_leituras_total", destino="primario")
+        with get_connection() as conn:
+            return func(*args, db=conn, **kwargs)
+
+    def aquecer(self):
+        for replica in self.replicas:
+            try:
+                replica.pool.aquecer()
+            except ERROS_CONEXAO as e:
+                self.marcar_falha(replica, e)
+
+    def close(self):
+        for replica in self.replicas:
+            replica.pool.close()
+
+    def status(self) -> List[dict]:
+        agora = time.monotonic()
+        return [
+            {"replica": r.nome, "disponivel": r.disponivel(agora), "latencia": r.latencia, **r.pool.status()}
+            for r in self.replicas
+        ]
+
+
+def _ler_replicas(valor: str) -> List[Replica]:
+    replicas = []
+    for item in filter(None, (parte.strip() for parte in valor.split(","))):
+        host, _, port = item.partition(":")
+        replicas.append(Replica(host, port or Config.MYSQL_PORT))
+    return replicas
+
+
+_roteador = None
+_roteador_lock = threading.Lock()
+
+
+def get_roteador() -> RoteadorLeitura:
+    global _roteador
+    if _roteador is None:
+        with _roteador_lock:
+            if _roteador is None:
+                _roteador = RoteadorLeitura(
+                    _ler_replicas(Config.DB_REPLICAS),
+                    estrategia=Config.DB_REPLICA_ESTRATEGIA,
+                    quarentena=Config.DB_REPLICA_QUARENTENA
+                )
+    return _roteador
+
+
+def close_roteador():
+    global _roteador
+    with _roteador_lock:
+        if _roteador is not None:
+            _roteador.close()
+            _roteador = None
+
+
+def marcar_escrita():
+    """Chamada a cada escrita: as próximas leituras desta requisição (e do cliente) vão ao primário."""
+    estado = _consistencia.get()
+    if estado is not None:
+        estado["primario"] = True
+        estado["escreveu"] = True
+        cache.renovar.set(True)
+
+
+class LeituraConsistenteMiddleware:
+    """
+    Garante que o usuário leia as próprias escritas: depois de uma escrita,
+    um cookie faz as leituras dele irem ao primário durante a janela configurada.
+    """
+
+    COOKIE = "ler_primario_ate"
+
+    def __init__(self, app, janela: float = 5.0):
+        self.app = app
+        self.janela = janela
+
+    def _ler_cookie(self, scope) -> float:
+        try:
+            return float(HTTPConnection(scope).cookies.get(self.COOKIE, 0))
+        except ValueError:
+            return 0.0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # O cookie guarda um horário de relógio (time.time), válido entre workers
+        estado = {"primario": self._ler_cookie(scope) > time.time(), "escreveu": False}
+        token = _consistencia.set(estado)
+        token_cache = cache.renovar.set(estado["primario"])
+
+        async def enviar(message):
+            if message["type"] == "http.response.start" and estado["escreveu"]:
+                message["headers"] = list(message.get("headers", [])) + [(
+                    b"set-cookie",
+                    f"{self.COOKIE}={time.time() + self.janela:.3f}; Path=/; "
+                    f"Max-Age={int(self.janela) + 1}; HttpOnly; SameSite=Lax".encode("latin-1")
+                )]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            cache.renovar.reset(token_cache)
+            _consistencia.reset(token)
@@ -0,0 +1,73 @@
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# deprecated="auto" marca como desatualizado qualquer hash de outro esquema ou
+# com custo diferente do configurado; verificar_senha devolve o hash refeito
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=Config.SENHA_BCRYPT_ROUNDS
+)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def gerar_hash(senha: str) -> str:
+    return pwd_context.hash(senha)
+
+
+def verificar_hash(senha: str, hash: Optional[str]) -> Tuple[bool, Optional[str]]:
+    """Retorna (senha confere, novo hash se o atual estiver desatualizado)."""
+    if hash is None:
+        # Gasta o mesmo tempo de uma verificação real para não revelar se o usuário existe
+        pwd_context.dummy_verify()
+        return False, None
+    return pwd_context.verify_and_update(senha, hash)
+
+
+def get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if Config.SENHA_PROCESSOS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # spawn evita herdar por fork as threads e conexões do processo da aplicação
+            _pool = ProcessPoolExecutor(
+                max_workers=Config.SENHA_PROCESSOS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+
+async def _executar(func, *args):
+    # Com SENHA_PROCESSOS=0 o cálculo roda no executor padrão (threads)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_pool(), func, *args)
+
+
+async def hash_senha(senha: str) -> str:
+    """Calcula o hash fora do event loop, num processo do pool."""
+    return await _executar(gerar_hash, senha)
+
+
+async def verificar_senha(senha: str, hash: Optional[str]) -> Tuple[bool, Optional[str]]:
+    return await _executar(verificar_hash, senha, hash)
@@ -0,0 +1,138 @@
+import logging
+from typing import Dict, List, Optional
+
+import mysql.connector
+from fastapi import Request
+
+from models.log_model import linha_log
+from models.log_writer import INSERT_LOG
+from models.produto_model import (
+    ConflitoVersaoError,
+    ProdutoBase,
+    _select_produto_by_id,
+    get_produto_by_id,
+    invalidar_cache_produto
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RegistroNaoEncontradoError(ValueError):
+    pass
+
+
+def campos_log_produto(produto: dict) -> dict:
+    return {
+        "nome": produto["nome"],
+        "descricao": produto["descricao"],
+        "preco": float(produto["preco"]),
+        "estoque": produto["estoque"]
+    }
+
+
+class UnidadeDeTrabalho:
+    """
+    Unidade de trabalho de uma requisição.
+
+    Os produtos lidos ficam num mapa de identidade, então cada um é consultado
+    no máximo uma vez por requisição. Alterações são acumuladas e gravadas por
+    `commit` numa única transação, na mesma conexão: a linha é lida com
+    bloqueio (sem cache), alterada e registrada no log; ou entra tudo, ou nada.
+    """
+
+    def __init__(self, request: Optional[Request] = None):
+        self.request = request
+        self.produtos: Dict[int, Optional[dict]] = {}
+        self._alteracoes = []
+        self._logs = []
+
+    def carregar_produto(self, id: int, db: mysql.connector.MySQLConnection) -> Optional[dict]:
+        """Leitura para exibição; as alterações não dependem dela (ver `commit`)."""
+        if id not in self.produtos:
+            self.produtos[id] = get_produto_by_id(id, db)
+        return self.produtos[id]
+
+    def registrar_log(self, tipo_operacao: str, tabela_afetada: str, id_registro: Optional[int] = None,
+                      dados_anteriores: Optional[dict] = None, dados_novos: Optional[dict] = None,
+                      id_usuario: Optional[int] = None):
+        self._logs.append(linha_log(
+            tipo_operacao, tabela_afetada, id_registro, dados_anteriores, dados_novos, id_usuario, self.request
+        ))
+
+    def atualizar_produto(self, id: int, produto: ProdutoBase, versao: Optional[int] = None, reler: bool = False):
+        """
+        Agenda a atualização. Com `versao`, o commit recusa a alteração se a
+        linha estiver em outra versão; com `reler`, deixa no mapa de identidade
+        a linha já atualizada, lida na mesma transação.
+        """
+        self._alteracoes.append(("UPDATE", id, versao, produto, reler, None))
+
+    def remover_produto(self, id: int, id_usuario: Optional[int] = None):
+        """Agenda a exclusão lógica; não exige o produto carregado. `id_usuario` vai para o log."""
+        self._alteracoes.append(("DELETE", id, None, None, False, id_usuario))
+
+    def _aplicar(self, cursor, tipo: str, id: int, produto: Optional[ProdutoBase], anterior: dict,
+                 id_usuario: Optional[int] = None):
+        if tipo == "DELETE":
+            cursor.execute("UPDATE produtos SET removido_em = CURRENT_TIMESTAMP WHERE id = %s", (id,))
+            self.registrar_log("DELETE", "produtos", id, dados_anteriores=campos_log_produto(anterior),
+                               id_usuario=id_usuario)
+        else:
+            cursor.execute(
+                "UPDATE produtos SET nome=%s, descricao=%s, preco=%s, estoque=%s, versao=versao+1 WHERE id=%s",
+                (produto.nome, produto.descricao, produto.preco, produto.estoque, id)
+            )
+            self.registrar_log("UPDATE", "produtos", id, dados_novos=produto.dict(),
+                               dados_anteriores=campos_log_produto(anterior))
+
+    def commit(self, db: mysql.connector.MySQLConnection) -> List[int]:
+        """
+        Grava as alterações e os logs pendentes com um único commit e retorna
+        os ids alterados. Cada
+        produto é lido com SELECT ... FOR UPDATE nesta conexão, então os dados
+        anteriores do log e a conferência da versão valem para a linha que será
+        alterada. Se algum produto não existir (ou estiver em outra versão), a
+        transação inteira é desfeita.
+        """
+        alteracoes, self._alteracoes = self._alteracoes, []
+        if not alteracoes and not self._logs:
+            return []
+
+        cursor = db.cursor()
+        try:
+            for tipo, id, versao, produto, _, id_usuario in alteracoes:
+                anterior = _select_produto_by_id(id, db, bloquear=True)
+                if anterior is None:
+                    self.produtos[id] = None
+                    raise RegistroNaoEncontradoError("Produto não encontrado")
+                if versao is not None and anterior["versao"] != versao:
+                    # Estado atual no mapa, para reexibir ao usuário
+                    self.produtos[id] = anterior
+                    raise ConflitoVersaoError(
+                        "O produto foi alterado por outra pessoa; revise os dados e salve novamente"
+                    )
+                self._aplicar(cursor, tipo, id, produto, anterior, id_usuario)
+            relidos = {
+                id: _select_produto_by_id(id, db)
+                for tipo, id, _, _, reler, _ in alteracoes if tipo == "UPDATE" and reler
+            }
+            logs, self._logs = self._logs, []
+            if logs:
+                cursor.executemany(INSERT_LOG, logs)
+            db.commit()
+        except Exception:
+            self._logs = []
+            db.rollback()
+            raise
+        finally:
+            cursor.close()
+
+        for tipo, id, *_ in alteracoes:
+            # Removido não existe mais; atualizado precisa ser relido (versão e updated_at mudaram)
+            if tipo == "DELETE":
+                self.produtos[id] = None
+            else:
+                self.produtos.pop(id, None)
+            invalidar_cache_produto(id)
+        self.produtos.update(relidos)
+        return [id for _, id, *_ in alteracoes]
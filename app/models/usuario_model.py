@@ -1,8 +1,13 @@
 import mysql.connector
+from datetime import datetime
+from fastapi import Request
 from pydantic import BaseModel
-from passlib.context import CryptContext
+from typing import List, Optional
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from models.exclusao import remover_em_lote
+from models.log_model import linha_log
+from models.log_writer import INSERT_LOG
+from models.senha import pwd_context
 
 class UsuarioBase(BaseModel):
     nome: str
@@ -16,14 +21,18 @@ class UsuarioCreate(UsuarioBase):
 
 class Usuario(UsuarioBase):
     id: int
+    data_atualizacao: Optional[datetime] = None
 
-def create_usuario(usuario: UsuarioCreate, db: mysql.connector.MySQLConnection):
+def create_usuario(usuario: UsuarioCreate, db: mysql.connector.MySQLConnection, senha_hash: Optional[str] = None):
+    """Cria o usuário; `senha_hash` permite informar o hash já calculado fora da conexão."""
     try:
-        usuario.hash_password()
+        if senha_hash is None:
+            usuario.hash_password()
+            senha_hash = usuario.senha
         cursor = db.cursor()
         cursor.execute(
             "INSERT INTO usuarios (nome, email, senha) VALUES (%s, %s, %s)",
-            (usuario.nome, usuario.email, usuario.senha),
+            (usuario.nome, usuario.email, senha_hash),
         )
         db.commit()
         return cursor.lastrowid
@@ -34,7 +43,9 @@ def create_usuario(usuario: UsuarioCreate, db: mysql.connector.MySQLConnection):
 def get_usuario_by_id(id: int, db: mysql.connector.MySQLConnection):
     try:
         cursor = db.cursor(dictionary=True)
-        cursor.execute("SELECT id, nome, email FROM usuarios WHERE id = %s", (id,))
+        cursor.execute(
+            "SELECT id, nome, email, data_atualizacao FROM usuarios WHERE id = %s AND removido_em IS NULL", (id,)
+        )
         return cursor.fetchone()
     except mysql.connector.Error as err:
         raise ValueError(f"Erro ao buscar usuário: {err.msg}")
@@ -42,16 +53,21 @@ def get_usuario_by_id(id: int, db: mysql.connector.MySQLConnection):
 def get_all_usuarios(db: mysql.connector.MySQLConnection):
     try:
         cursor = db.cursor(dictionary=True)
-        cursor.execute("SELECT id, nome, email FROM usuarios ORDER BY nome")
+        cursor.execute(
+            "SELECT id, nome, email, data_atualizacao FROM usuarios WHERE removido_em IS NULL ORDER BY nome"
+        )
         return cursor.fetchall()
     except mysql.connector.Error as err:
         raise ValueError(f"Erro ao listar usuários: {err.msg}")
 
-def update_usuario(id: int, update_data: dict, db: mysql.connector.MySQLConnection):
+def update_usuario(id: int, update_data: dict, db: mysql.connector.MySQLConnection, senha_hash: Optional[str] = None):
     try:
         cursor = db.cursor()
         
-        if 'senha' in update_data:
+        update_data = dict(update_data)
+        if senha_hash is not None:
+            update_data['senha'] = senha_hash
+        elif 'senha' in update_data:
             update_data['senha'] = pwd_context.hash(update_data['senha'])
         
         set_clause = ", ".join([f"{key} = %s" for key in update_data.keys()])
@@ -59,7 +75,7 @@ def update_usuario(id: int, update_data: dict, db: mysql.connector.MySQLConnecti
         values.append(id)
         
         cursor.execute(
-            f"UPDATE usuarios SET {set_clause} WHERE id = %s",
+            f"UPDATE usuarios SET {set_clause} WHERE id = %s AND removido_em IS NULL",
             values
         )
         db.commit()
@@ -68,12 +84,57 @@ def update_usuario(id: int, update_data: dict, db: mysql.connector.MySQLConnecti
         db.rollback()
         raise ValueError(f"Erro ao atualizar usuário: {err.msg}")
 
-def delete_usuario(id: int, db: mysql.connector.MySQLConnection):
+def delete_usuario(id: int, db: mysql.connector.MySQLConnection, id_usuario: Optional[int] = None,
+                   request: Optional[Request] = None):
+    """
+    Exclusão lógica; a linha é apagada depois pelo expurgo (models/exclusao.py).
+    O usuário é lido com bloqueio e o log, com os dados anteriores, é gravado na
+    mesma transação, como na exclusão de produtos. Retorna 1, ou 0 se não existir.
+    """
+    try:
+        cursor = db.cursor(dictionary=True)
+        cursor.execute(
+            "SELECT nome, email FROM usuarios WHERE id = %s AND removido_em IS NULL FOR UPDATE", (id,)
+        )
+        anterior = cursor.fetchone()
+        if anterior is None:
+            db.rollback()
+            return 0
+        cursor.execute("UPDATE usuarios SET removido_em = CURRENT_TIMESTAMP WHERE id = %s", (id,))
+        cursor.execute(INSERT_LOG, linha_log(
+            "DELETE", "usuarios", id, dados_anteriores=dict(anterior), id_usuario=id_usuario, request=request
+        ))
+        db.commit()
+        return 1
+    except mysql.connector.Error as err:
+        db.rollback()
+        raise ValueError(f"Erro ao deletar usuário: {err.msg}")
+
+def remover_usuarios(db: mysql.connector.MySQLConnection, ids: Optional[List[int]] = None,
+                     atualizado_antes: Optional[datetime] = None) -> int:
+    """Remove de uma vez os usuários da lista `ids` e/ou sem alterações desde `atualizado_antes`."""
+    if ids is None and atualizado_antes is None:
+        raise ValueError("Informe os ids ou ao menos um filtro para remover usuários")
+    condicoes, params = ["removido_em IS NULL"], []
+    if atualizado_antes is not None:
+        condicoes.append("data_atualizacao < %s")
+        params.append(atualizado_antes)
+    return remover_em_lote(db, "usuarios", condicoes, params, ids=ids)
+
+def get_credenciais(email: str, db: mysql.connector.MySQLConnection):
+    try:
+        cursor = db.cursor(dictionary=True)
+        cursor.execute("SELECT id, senha FROM usuarios WHERE email = %s AND removido_em IS NULL", (email,))
+        return cursor.fetchone()
+    except mysql.connector.Error as err:
+        raise ValueError(f"Erro ao buscar usuário: {err.msg}")
+
+def atualizar_hash_senha(id: int, senha_hash: str, db: mysql.connector.MySQLConnection):
     try:
         cursor = db.cursor()
-        cursor.execute("DELETE FROM usuarios WHERE id = %s", (id,))
+        cursor.execute("UPDATE usuarios SET senha = %s WHERE id = %s", (senha_hash, id))
         db.commit()
         return cursor.rowcount
     except mysql.connector.Error as err:
         db.rollback()
-        raise ValueError(f"Erro ao deletar usuário: {err.msg}")
\ No newline at end of file
+        raise ValueError(f"Erro ao atualizar senha: {err.msg}")
@@ -0,0 +1,40 @@
+from typing import List
+from fastapi import APIRouter
+from controllers.api_controller import (
+    PaginaLogs,
+    PaginaProdutos,
+    ResultadoBusca,
+    api_listar_produtos,
+    api_buscar_produtos,
+    api_obter_produto,
+    api_criar_produto,
+    api_atualizar_produto,
+    api_deletar_produto,
+    api_remover_produtos,
+    api_listar_usuarios,
+    api_obter_usuario,
+    api_remover_usuarios,
+    api_status_expurgo,
+    api_analise_estoque,
+    api_listar_logs,
+    api_historico_registro
+)
+from models.produto_model import Produto
+from models.usuario_model import Usuario
+
+router = APIRouter(prefix="/api/v1", tags=["api"])
+
+router.get("/produtos", response_model=PaginaProdutos, name="api_listar_produtos")(api_listar_produtos)
+router.get("/produtos/buscar", response_model=ResultadoBusca, name="api_buscar_produtos")(api_buscar_produtos)
+router.get("/produtos/{id}", response_model=Produto, name="api_obter_produto")(api_obter_produto)
+router.post("/produtos", response_model=Produto, status_code=201, name="api_criar_produto")(api_criar_produto)
+router.put("/produtos/{id}", response_model=Produto, name="api_atualizar_produto")(api_atualizar_produto)
+router.delete("/produtos/{id}", status_code=204, name="api_deletar_produto")(api_deletar_produto)
+router.post("/produtos/remover", response_model=dict, name="api_remover_produtos")(api_remover_produtos)
+router.get("/usuarios", response_model=List[Usuario], name="api_listar_usuarios")(api_listar_usuarios)
+router.get("/usuarios/{id}", response_model=Usuario, name="api_obter_usuario")(api_obter_usuario)
+router.post("/usuarios/remover", response_model=dict, name="api_remover_usuarios")(api_remover_usuarios)
+router.get("/expurgo", response_model=dict, name="api_status_expurgo")(api_status_expurgo)
+router.get("/analise/estoque", response_model=dict, name="api_analise_estoque")(api_analise_estoque)
+router.get("/logs", response_model=PaginaLogs, name="api_listar_logs")(api_listar_logs)
+router.get("/logs/{tabela}/{id_registro}", response_model=List[dict], name="api_historico_registro")(api_historico_registro)
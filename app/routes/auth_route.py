@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from fastapi.responses import HTMLResponse
+from controllers.auth_controller import (
+    form_login,
+    login,
+    logout
+)
+
+router = APIRouter(tags=["auth"])
+
+router.get("/login", response_class=HTMLResponse, name="login")(form_login)
+router.post("/login", response_class=HTMLResponse, name="login_post")(login)
+router.post("/logout", name="logout")(logout)
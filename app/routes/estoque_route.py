@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from controllers.estoque_controller import (
+    reservar,
+    liberar,
+    ajustar
+)
+
+router = APIRouter(prefix="/estoque", tags=["estoque"])
+
+router.post("/reservar", name="estoque_reservar")(reservar)
+router.post("/liberar", name="estoque_liberar")(liberar)
+router.post("/{id}", name="estoque_ajustar")(ajustar)
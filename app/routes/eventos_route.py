@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from controllers.eventos_controller import (
+    api_listar_eventos,
+    api_stream_eventos,
+    api_obter_consumidor,
+    api_salvar_consumidor
+)
+
+router = APIRouter(prefix="/api/v1/eventos", tags=["api"])
+
+router.get("", name="api_listar_eventos")(api_listar_eventos)
+router.get("/stream", name="api_stream_eventos")(api_stream_eventos)
+router.get("/consumidores/{nome}", name="api_obter_consumidor")(api_obter_consumidor)
+router.put("/consumidores/{nome}", name="api_salvar_consumidor")(api_salvar_consumidor)
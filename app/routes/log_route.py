@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+from fastapi.responses import HTMLResponse
+from controllers.log_controller import (
+    listar_logs,
+    obter_historico
+)
+
+router = APIRouter(prefix="/logs", tags=["logs"])
+
+router.get("/", response_class=HTMLResponse, name="listar_logs")(listar_logs)
+router.get("/{tabela}/{id_registro}", response_class=HTMLResponse, name="historico_registro")(obter_historico)
@@ -0,0 +1,73 @@
+"""
+Inicia a aplicação em modo de produção, com vários workers.
+
+Uso (de qualquer diretório):
+    python app/servidor.py
+    python app/servidor.py --workers 4 --porta 8080
+
+Com mais de um worker, SECRET_KEY é obrigatória. Em desenvolvimento continue
+usando `uvicorn main:app --reload` dentro de app/, que aceita uma chave aleatória.
+"""
+import argparse
+import importlib.util
+import logging
+import os
+import sys
+
+import uvicorn
+
+from config import Config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+
+
+def _disponivel(modulo: str) -> bool:
+    return importlib.util.find_spec(modulo) is not None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor de produção")
+    parser.add_argument("--host", default=Config.SERVIDOR_HOST)
+    parser.add_argument("--porta", type=int, default=Config.SERVIDOR_PORTA)
+    parser.add_argument("--workers", type=int, default=Config.SERVIDOR_WORKERS,
+                        help="Processos worker (0: um por CPU)")
+    args = parser.parse_args(argv)
+
+    workers = args.workers or os.cpu_count() or 1
+    if workers > 1 and not Config.SECRET_KEY:
+        # Sem a chave cada worker sortearia a sua, e o cookie assinado por um seria recusado pelos outros
+        parser.error("defina SECRET_KEY (o mesmo valor para todos os workers) para iniciar com mais de um worker")
+    if workers > 1 and Config.DB_REPLICAS and Config.CACHE_BACKEND != "redis":
+        # O cache em memória é de cada worker: as invalidações (e a repetição delas ao fim
+        # da janela das réplicas) não chegam aos outros, que guardariam leituras atrasadas
+        parser.error("com DB_REPLICAS e mais de um worker, use CACHE_BACKEND=redis")
+    # uvloop e httptools são opcionais: sem eles ficam o asyncio e o h11
+    loop = "uvloop" if _disponivel("uvloop") else "asyncio"
+    http = "httptools" if _disponivel("httptools") else "h11"
+    logger.info(f"Iniciando {workers} worker(s) em {args.host}:{args.porta} (loop {loop}, http {http})")
+
+    # Caminhos relativos da configuração (sessões, arquivo de logs) continuam
+    # valendo como se a aplicação fosse iniciada de dentro de app/
+    os.chdir(DIRETORIO)
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.porta,
+        workers=workers,
+        loop=loop,
+        http=http,
+        app_dir=DIRETORIO,
+        lifespan="on",
+        proxy_headers=True,
+        access_log=Config.SERVIDOR_ACCESS_LOG,
+        timeout_keep_alive=Config.SERVIDOR_KEEPALIVE,
+        timeout_graceful_shutdown=Config.SERVIDOR_TIMEOUT_DESLIGAMENTO,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
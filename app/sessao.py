@@ -0,0 +1,257 @@
+import json
+import logging
+import random
+import secrets
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection, Request
+
+from config import Config
+from models.cache import CacheBackend, MemoryCacheBackend, RedisCacheBackend
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteSessionBackend(CacheBackend):
+    """
+    Sessões num arquivo SQLite local, compartilhado pelos workers da mesma
+    máquina. Cada thread usa sua própria conexão.
+    """
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self._local = threading.local()
+        self._conexao().execute(
+            "CREATE TABLE IF NOT EXISTS sessoes (id TEXT PRIMARY KEY, dados TEXT NOT NULL, expira REAL NOT NULL)"
+        )
+
+    def _conexao(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.caminho, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conexao().execute(
+            "SELECT dados FROM sessoes WHERE id = ? AND expira > ?", (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value, ttl=None):
+        conn = self._conexao()
+        conn.execute(
+            """
+            INSERT INTO sessoes (id, dados, expira) VALUES (?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET dados = excluded.dados, expira = excluded.expira
+            """,
+            (key, json.dumps(value, ensure_ascii=False, default=str), time.time() + (ttl or Config.SESSAO_TTL))
+        )
+        # Remove as expiradas de vez em quando, sem precisar de uma tarefa separada
+        if random.random() < 0.01:
+            conn.execute("DELETE FROM sessoes WHERE expira <= ?", (time.time(),))
+
+    def delete(self, key):
+        self._conexao().execute("DELETE FROM sessoes WHERE id = ?", (key,))
+
+    def clear(self):
+        self._conexao().execute("DELETE FROM sessoes")
+
+    def __len__(self):
+        return self._conexao().execute("SELECT COUNT(*) FROM sessoes").fetchone()[0]
+
+
+def criar_store() -> CacheBackend:
+    if Config.SESSAO_BACKEND == "redis":
+        return RedisCacheBackend(Config.CACHE_URL, prefixo="gp:sessao:")
+    if Config.SESSAO_BACKEND == "memoria":
+        return MemoryCacheBackend(Config.SESSAO_MAX_ITENS)
+    return SQLiteSessionBackend(Config.SESSAO_ARQUIVO)
+
+
+class Sessao(dict):
+    """Dados da sessão; alterações marcam a sessão para ser gravada ao fim da requisição."""
+
+    def __init__(self, id: Optional[str] = None, dados: Optional[dict] = None):
+        super().__init__(dados or {})
+        self.id = id
+        self.modificada = False
+        self.id_descartado = None
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.modificada = True
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.modificada = True
+
+    def pop(self, key, *default):
+        if key in self:
+            self.modificada = True
+        return super().pop(key, *default)
+
+    def clear(self):
+        super().clear()
+        self.modificada = True
+
+    def renovar(self):
+        """Troca o id da sessão (ex.: no login), descartando o anterior."""
+        if self.id is not None:
+            self.id_descartado = self.id
+        self.id = None
+        self.modificada = True
+
+
+class _SessaoPreguicosa:
+    """
+    Guarda o id vindo do cookie; a sessão só é lida do store quando alguém pede.
+    `usuario_id` é o usuário logado quando o cookie foi emitido (no login), também
+    assinado, para quem precisa identificá-lo sem consultar o store.
+    """
+
+    def __init__(self, middleware: "SessaoMiddleware", id: Optional[str], usuario_id: Optional[int] = None):
+        self.middleware = middleware
+        self.id = id
+        self.usuario_id = usuario_id
+        self.sessao = None
+
+    async def carregar(self) -> Sessao:
+        if self.sessao is None:
+            dados = await self.middleware.executar(self.middleware.store.get, self.id) if self.id else None
+            self.sessao = Sessao(self.id if dados is not None else None, dados)
+        return self.sessao
+
+
+class SessaoMiddleware:
+    """
+    Sessões no servidor identificadas por um cookie assinado com SECRET_KEY.
+    Requisições que não usam a sessão não acessam o store.
+    """
+
+    def __init__(self, app, store: CacheBackend, secret_key: str, cookie: str = "sessao",
+                 ttl: float = 86400, secure: bool = False):
+        self.app = app
+        self.store = store
+        self.cookie = cookie
+        self.ttl = ttl
+        self.secure = secure
+        self.serializer = URLSafeTimedSerializer(secret_key, salt="sessao")
+        self.bloqueante = not isinstance(store, MemoryCacheBackend)
+
+    async def executar(self, func, *args):
+        if self.bloqueante:
+            return await run_in_threadpool(func, *args)
+        return func(*args)
+
+    def _ler_cookie(self, scope) -> Tuple[Optional[str], Optional[int]]:
+        """Retorna (id da sessão, id do usuário logado) do cookie assinado."""
+        valor = HTTPConnection(scope).cookies.get(self.cookie)
+        if not valor:
+            return None, None
+        try:
+            conteudo = self.serializer.loads(valor, max_age=self.ttl)
+        except BadSignature:
+            return None, None
+        # Cookies emitidos antes de o usuário entrar no conteúdo trazem só o id
+        if isinstance(conteudo, str):
+            return conteudo, None
+        return conteudo[0], conteudo[1]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        preguicosa = _SessaoPreguicosa(self, *self._ler_cookie(scope))
+        scope.setdefault("state", {})["sessao"] = preguicosa
+
+        async def enviar(message):
+            if message["type"] == "http.response.start" and preguicosa.sessao is not None:
+                await self._salvar(preguicosa.sessao, MutableHeaders(scope=message))
+            await send(message)
+
+        await self.app(scope, receive, enviar)
+
+    async def _salvar(self, sessao: Sessao, headers: MutableHeaders):
+        if sessao.id_descartado:
+            await self.executar(self.store.delete, sessao.id_descartado)
+        if not sessao.modificada:
+            return
+
+        if not sessao:
+            if sessao.id:
+                await self.executar(self.store.delete, sessao.id)
+                headers.append("Set-Cookie", self._cookie("", 0))
+            return
+
+        novo = sessao.id is None
+        if novo:
+            sessao.id = secrets.token_urlsafe(32)
+        await self.executar(self.store.set, sessao.id, dict(sessao), self.ttl)
+        if novo:
+            usuario = sessao.get("usuario")
+            conteudo = [sessao.id, usuario["id"] if usuario else None]
+            headers.append("Set-Cookie", self._cookie(self.serializer.dumps(conteudo), int(self.ttl)))
+
+    def _cookie(self, valor: str, max_age: int) -> str:
+        cookie = f"{self.cookie}={valor}; Path=/; Max-Age={max_age}; HttpOnly; SameSite=Lax"
+        if self.secure:
+            cookie += "; Secure"
+        return cookie
+
+
+def secret_key() -> str:
+    if Config.SECRET_KEY:
+        return Config.SECRET_KEY
+    # Só serve para um processo único (desenvolvimento); servidor.py recusa iniciar vários workers sem a chave
+    logger.warning("SECRET_KEY não definida; usando uma chave aleatória, as sessões não sobrevivem a reinícios")
+    return secrets.token_hex(32)
+
+
+async def get_sessao(request: Request) -> Sessao:
+    return await request.state.sessao.carregar()
+
+
+async def set_flash(request: Request, message: str, category: str = "success"):
+    """Define uma mensagem flash, exibida na próxima página carregada."""
+    sessao = await get_sessao(request)
+    sessao["flash"] = {"message": message, "category": category}
+
+
+async def get_flash(request: Request):
+    """Obtém e remove a mensagem flash da sessão."""
+    sessao = await get_sessao(request)
+    return sessao.pop("flash", None)
+
+
+async def iniciar_login(request: Request, usuario: dict):
+    sessao = await get_sessao(request)
+    sessao.renovar()
+    sessao["usuario"] = {"id": usuario["id"], "nome": usuario["nome"]}
+
+
+async def encerrar_login(request: Request):
+    sessao = await get_sessao(request)
+    sessao.clear()
+
+
+async def usuario_logado(request: Request) -> Optional[dict]:
+    sessao = await get_sessao(request)
+    return sessao.get("usuario")
+
+
+async def exigir_login(request: Request) -> dict:
+    """Dependência das rotas que só um usuário logado pode usar; devolve o usuário da sessão."""
+    usuario = await usuario_logado(request)
+    if not usuario:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Login necessário")
+    return usuario
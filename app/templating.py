@@ -0,0 +1,83 @@
+import logging
+import os
+import time
+
+from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from config import Config
+from metricas import metricas
+from models.cache import Cache, MemoryCacheBackend
+
+logger = logging.getLogger(__name__)
+
+# Relativo ao módulo, para que a aplicação funcione a partir de qualquer diretório
+DIRETORIO_TEMPLATES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+
+# Fragmentos são chaveados pelo estado do registro (ex.: id, versão e
+# updated_at), então nunca precisam ser invalidados: versões antigas apenas
+# deixam de ser usadas e saem do LRU. Ficam sempre na memória local, já que
+# uma ida ao Redis custaria mais que renderizar o fragmento.
+fragmento_cache = Cache(MemoryCacheBackend(Config.FRAGMENTO_CACHE_MAX_ITENS), ttl=Config.FRAGMENTO_CACHE_TTL)
+
+
+class FragmentoCacheExtension(Extension):
+    """
+    Tag `{% cache parte1, parte2, ... %}...{% endcache %}` que guarda o HTML
+    renderizado do bloco, identificado pelas partes informadas.
+    """
+
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        partes = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            partes.append(parser.parse_expression())
+        corpo = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method("_renderizar", [nodes.List(partes)]), [], [], corpo
+        ).set_lineno(lineno)
+
+    def _renderizar(self, partes, caller):
+        chave = "fragmento:" + ":".join(map(str, partes))
+        return Markup(fragmento_cache.get_or_load(chave, caller))
+
+
+def _bytecode_cache():
+    if not Config.TEMPLATE_BYTECODE_CACHE:
+        return None
+    if Config.TEMPLATE_BYTECODE_DIR:
+        os.makedirs(Config.TEMPLATE_BYTECODE_DIR, exist_ok=True)
+    return FileSystemBytecodeCache(Config.TEMPLATE_BYTECODE_DIR or None)
+
+
+class TemplatesInstrumentados(Jinja2Templates):
+    """Jinja2Templates que registra o tempo de renderização de cada template."""
+
+    def TemplateResponse(self, name: str, *args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return super().TemplateResponse(name, *args, **kwargs)
+        finally:
+            metricas.observar("template_render_segundos", time.perf_counter() - inicio, template=name)
+
+
+templates = TemplatesInstrumentados(
+    directory=DIRETORIO_TEMPLATES,
+    extensions=[FragmentoCacheExtension],
+    bytecode_cache=_bytecode_cache(),
+    auto_reload=Config.TEMPLATE_AUTO_RELOAD
+)
+
+
+def precompilar_templates() -> int:
+    """Compila todos os templates na inicialização, antes da primeira requisição."""
+    total = 0
+    for nome in templates.env.list_templates(extensions=["html"]):
+        templates.env.get_template(nome)
+        total += 1
+    logger.info(f"{total} templates compilados")
+    return total
@@ -1,19 +1,53 @@
-from typing import Optional
-from pydantic import BaseModel, Field, ValidationError
+from validators.validacao import (
+    Campo,
+    Validador,
+    bytes_maximo,
+    decimal,
+    inteiro,
+    maior_ou_igual,
+    maior_que,
+    menor_ou_igual,
+    tamanho_maximo,
+    tamanho_minimo,
+    texto
+)
 
+# Limites das colunas de produtos: nome VARCHAR(100), descricao TEXT,
+# preco DECIMAL(10, 2) e estoque INT. Acima deles o MySQL (sql_mode estrito)
+# recusa o comando, e o erro viraria falha do banco em vez de erro do campo.
+NOME_MAXIMO = 100
+DESCRICAO_MAXIMA_BYTES = 65535
+PRECO_MAXIMO = 99999999.99
+INTEIRO_MAXIMO = 2147483647
 
-class ProdutoSchema(BaseModel):
-    nome: str = Field(..., min_length=3, description="O nome do produto deve ter pelo menos 3 caracteres")
-    descricao: Optional[str] = Field("", description="A descrição do produto é opcional")
-    preco: float = Field(..., gt=0, description="O preço deve ser um valor positivo")
-    estoque: int = Field(..., ge=0, description="O estoque deve ser um número inteiro maior ou igual a zero")
+validador_produto = Validador([
+    Campo("nome", texto, "O nome do produto deve ser um texto",
+          [tamanho_minimo(3, "O nome do produto deve ter no mínimo 3 caracteres"),
+           tamanho_maximo(NOME_MAXIMO, f"O nome do produto deve ter no máximo {NOME_MAXIMO} caracteres")]),
+    Campo("descricao", texto, "A descrição do produto deve ser um texto",
+          [bytes_maximo(DESCRICAO_MAXIMA_BYTES, "A descrição do produto é longa demais")],
+          obrigatorio=False, padrao=""),
+    Campo("preco", decimal, "O preço deve ser um número",
+          [maior_que(0, "O preço deve ser um valor positivo"),
+           menor_ou_igual(PRECO_MAXIMO, f"O preço deve ser no máximo {PRECO_MAXIMO:.2f}")]),
+    Campo("estoque", inteiro, "O estoque deve ser um número inteiro",
+          [maior_ou_igual(0, "O estoque deve ser um número inteiro maior ou igual a zero"),
+           menor_ou_igual(INTEIRO_MAXIMO, f"O estoque deve ser no máximo {INTEIRO_MAXIMO}")]),
+])
+
+# Importação: o id é opcional e decide entre inserir e atualizar
+validador_produto_importacao = validador_produto.estender([
+    Campo("id", inteiro, "O id deve ser um número inteiro",
+          [maior_que(0, "O id deve ser um número inteiro positivo"),
+           menor_ou_igual(INTEIRO_MAXIMO, f"O id deve ser no máximo {INTEIRO_MAXIMO}")],
+          obrigatorio=False),
+])
 
 
 class ProdutoValidator:
     @staticmethod
     def validate(data: dict):
-        try:
-            ProdutoSchema(**data)
-            return {"valid": True}
-        except ValidationError as e:
-            return {"valid": False, "errors": e.errors()}
+        dados, erros = validador_produto.validar(data)
+        if erros:
+            return {"valid": False, "errors": [erro._asdict() for erro in erros]}
+        return {"valid": True, "data": dados}
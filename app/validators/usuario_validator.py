@@ -1,17 +1,33 @@
-from pydantic import BaseModel, EmailStr, Field, ValidationError
+from validators.validacao import Campo, Validador, corresponde, tamanho_maximo, tamanho_minimo, texto
 
+# Limites das colunas de usuarios: nome VARCHAR(50) e email VARCHAR(100)
+NOME_MAXIMO = 50
+EMAIL_MAXIMO = 100
 
-class UsuarioSchema(BaseModel):
-    nome: str = Field(..., min_length=3, description="O nome deve ter pelo menos 3 caracteres")
-    email: EmailStr = Field(..., description="Email inválido")
-    senha: str = Field(..., min_length=6, description="A senha deve ter pelo menos 6 caracteres")
+validador_usuario = Validador([
+    Campo("nome", texto, "O nome deve ser um texto",
+          [tamanho_minimo(3, "O nome deve ter no mínimo 3 caracteres"),
+           tamanho_maximo(NOME_MAXIMO, f"O nome deve ter no máximo {NOME_MAXIMO} caracteres")]),
+    # Parte local, @ e domínio com ao menos um ponto, sem rótulos vazios (a..b, .com)
+    Campo("email", texto, "Email inválido",
+          [corresponde(r"[^@\s]+@[^@\s.]+(\.[^@\s.]+)+", "Email inválido"),
+           tamanho_maximo(EMAIL_MAXIMO, f"O email deve ter no máximo {EMAIL_MAXIMO} caracteres")]),
+    # A senha não passa por strip: espaços fazem parte dela
+    Campo("senha", str, "A senha deve ser um texto",
+          [tamanho_minimo(6, "A senha deve ter no mínimo 6 caracteres")]),
+])
+
+# Na edição, senha em branco mantém a atual
+validador_usuario_edicao = validador_usuario.estender([
+    Campo("senha", str, "A senha deve ser um texto",
+          [tamanho_minimo(6, "A senha deve ter no mínimo 6 caracteres")], obrigatorio=False),
+])
 
 
 class UsuarioValidator:
     @staticmethod
     def validate(data: dict):
-        try:
-            UsuarioSchema(**data)
-            return {"valid": True}
-        except ValidationError as e:
-            return {"valid": False, "errors": e.errors()}
+        dados, erros = validador_usuario.validar(data)
+        if erros:
+            return {"valid": False, "errors": [erro._asdict() for erro in erros]}
+        return {"valid": True, "data": dados}
@@ -0,0 +1,171 @@
+import math
+import re
+from typing import Any, Callable, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+# Uma regra recebe o valor já convertido e retorna True quando ele é válido
+Regra = Tuple[Callable[[Any], bool], str]
+
+
+class ErroValidacao(NamedTuple):
+    campo: str
+    mensagem: str
+
+
+class ResultadoLote(NamedTuple):
+    validos: List[tuple]
+    erros: List[tuple]
+
+
+# Conversores: transformam o valor bruto (formulário, CSV, JSON) no tipo do
+# campo, levantando ValueError/TypeError quando não é possível
+
+def texto(valor) -> str:
+    if not isinstance(valor, str):
+        raise TypeError("texto esperado")
+    return valor.strip()
+
+
+def decimal(valor) -> float:
+    if isinstance(valor, bool):
+        raise TypeError("número esperado")
+    numero = float(valor.strip() if isinstance(valor, str) else valor)
+    if not math.isfinite(numero):
+        raise ValueError("número finito esperado")
+    return numero
+
+
+def inteiro(valor) -> int:
+    if isinstance(valor, bool):
+        raise TypeError("inteiro esperado")
+    if isinstance(valor, int):
+        return valor
+    if isinstance(valor, float):
+        if not valor.is_integer():
+            raise ValueError("inteiro esperado")
+        return int(valor)
+    return int(valor.strip())
+
+
+# Regras
+
+def tamanho_minimo(n: int, mensagem: str) -> Regra:
+    return (lambda v: len(v) >= n, mensagem)
+
+
+def tamanho_maximo(n: int, mensagem: str) -> Regra:
+    return (lambda v: len(v) <= n, mensagem)
+
+
+def bytes_maximo(n: int, mensagem: str) -> Regra:
+    """Limite em bytes UTF-8, como o das colunas TEXT."""
+    return (lambda v: len(v.encode("utf-8")) <= n, mensagem)
+
+
+def maior_que(limite, mensagem: str) -> Regra:
+    return (lambda v: v > limite, mensagem)
+
+
+def maior_ou_igual(limite, mensagem: str) -> Regra:
+    return (lambda v: v >= limite, mensagem)
+
+
+def menor_ou_igual(limite, mensagem: str) -> Regra:
+    return (lambda v: v <= limite, mensagem)
+
+
+def corresponde(padrao: str, mensagem: str) -> Regra:
+    compilado = re.compile(padrao)
+    return (lambda v: compilado.fullmatch(v) is not None, mensagem)
+
+
+class Campo(NamedTuple):
+    nome: str
+    conversor: Callable[[Any], Any]
+    mensagem_tipo: str
+    regras: Sequence[Regra] = ()
+    obrigatorio: bool = True
+    padrao: Any = None
+
+
+class Validador:
+    """
+    Valida registros (dicts) contra uma lista de campos, convertendo os
+    valores e coletando todos os erros de cada registro, sem parar no primeiro.
+
+    Os campos são "compilados" uma vez, na criação, em tuplas simples; os
+    validadores ficam em variáveis de módulo e são reutilizados por
+    formulários, API e importação em lote. Chaves desconhecidas são ignoradas.
+    """
+
+    def __init__(self, campos: Iterable[Campo]):
+        self.campos = tuple(campos)
+        self._plano = tuple(
+            (c.nome, c.conversor, c.mensagem_tipo, tuple(c.regras), c.obrigatorio, c.padrao)
+            for c in self.campos
+        )
+
+    def estender(self, campos: Iterable[Campo], sem: Iterable[str] = ()) -> "Validador":
+        """Novo validador com campos adicionais (ou substituídos) e sem os campos em `sem`."""
+        novos = {c.nome: c for c in campos}
+        removidos = set(sem) | set(novos)
+        return Validador([c for c in self.campos if c.nome not in removidos] + list(novos.values()))
+
+    def validar(self, registro: dict) -> Tuple[Optional[dict], List[ErroValidacao]]:
+        """Retorna (dados convertidos, []) ou (None, erros)."""
+        dados = {}
+        erros = []
+        for nome, conversor, mensagem_tipo, regras, obrigatorio, padrao in self._plano:
+            valor = registro.get(nome)
+            if valor is None or valor == "":
+                if obrigatorio:
+                    erros.append(ErroValidacao(nome, f"O campo {nome} é obrigatório"))
+                else:
+                    dados[nome] = padrao
+                continue
+            try:
+                valor = conversor(valor)
+            except (ValueError, TypeError, AttributeError):
+                erros.append(ErroValidacao(nome, mensagem_tipo))
+                continue
+            for teste, mensagem in regras:
+                if not teste(valor):
+                    erros.append(ErroValidacao(nome, mensagem))
+            dados[nome] = valor
+        if erros:
+            return None, erros
+        return dados, erros
+
+    def validar_lote(self, registros: Iterable[tuple]) -> ResultadoLote:
+        """
+        Valida pares (chave, registro) numa única passada. Retorna as listas
+        de (chave, dados) válidos e de (chave, erros). A chave identifica o
+        registro para quem chamou (número da linha, índice na lista etc.).
+        """
+        validar = self.validar
+        validos = []
+        erros = []
+        for chave, registro in registros:
+            if not isinstance(registro, dict):
+                erros.append((chave, [ErroValidacao("", "Registro inválido")]))
+                continue
+            dados, problemas = validar(registro)
+            if problemas:
+                erros.append((chave, problemas))
+            else:
+                validos.append((chave, dados))
+        return ResultadoLote(validos, erros)
+
+
+def mensagens(erros: Iterable[ErroValidacao]) -> List[str]:
+    """Mensagens para exibir em formulários."""
+    return [erro.mensagem for erro in erros]
+
+
+def mensagens_com_campo(erros: Iterable[ErroValidacao]) -> List[str]:
+    """Mensagens prefixadas pelo campo, para relatórios de importação."""
+    return [f"{erro.campo}: {erro.mensagem}" if erro.campo else erro.mensagem for erro in erros]
+
+
+def detalhes_api(erros: Iterable[ErroValidacao], origem: str = "body") -> List[dict]:
+    """Erros no mesmo formato das respostas 422 do FastAPI."""
+    return [{"loc": [origem, erro.campo], "msg": erro.mensagem, "type": "value_error"} for erro in erros]
@@ -0,0 +1,14 @@
+import os
+import sys
+
+# Os módulos da aplicação usam imports relativos ao diretório app/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+# Configuração lida na importação: sem processos de senha, sessão em memória, sem limites
+os.environ.setdefault("SESSAO_BACKEND", "memoria")
+os.environ.setdefault("SECRET_KEY", "testes")
+os.environ.setdefault("SENHA_PROCESSOS", "0")
+os.environ.setdefault("SENHA_BCRYPT_ROUNDS", "4")
+os.environ.setdefault("ADMISSAO_ATIVA", "false")
+os.environ.setdefault("EXPURGO_ATIVO", "false")
+os.environ.setdefault("LOG_RETENCAO_ATIVA", "false")
@@ -0,0 +1,115 @@
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from admissao import AdmissaoMiddleware, ControleConcorrencia, MemoriaLimiteBackend
+from models.cache import MemoryCacheBackend
+from sessao import SessaoMiddleware
+
+
+class StoreContado(MemoryCacheBackend):
+    def __init__(self):
+        super().__init__()
+        self.leituras = 0
+
+    def get(self, key):
+        self.leituras += 1
+        return super().get(key)
+
+
+class IpDoCabecalho:
+    """O TestClient usa sempre o mesmo endereço; o teste escolhe o IP pelo cabeçalho X-Ip."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            ip = dict(scope["headers"]).get(b"x-ip")
+            if ip:
+                scope["client"] = (ip.decode(), 50000)
+        await self.app(scope, receive, send)
+
+
+def criar_app(store):
+    async def pagina(request):
+        return PlainTextResponse("ok")
+
+    async def entrar(request):
+        sessao = await request.state.sessao.carregar()
+        sessao.renovar()
+        sessao["usuario"] = {"id": int(request.query_params["id"]), "nome": "Ana"}
+        return PlainTextResponse("ok")
+
+    async def flash(request):
+        sessao = await request.state.sessao.carregar()
+        sessao["flash"] = {"message": "Cadastro realizado", "category": "success"}
+        return PlainTextResponse("ok")
+
+    # POST é da classe "escrita", sem limite aqui: só as leituras de /pagina contam
+    app = Starlette(routes=[
+        Route("/pagina", pagina), Route("/entrar", entrar, methods=["POST"]), Route("/flash", flash, methods=["POST"])
+    ])
+    app.add_middleware(
+        AdmissaoMiddleware, backend=MemoriaLimiteBackend(), limites={"leitura": (0.001, 3)},
+        controle=ControleConcorrencia(10, 10, 1)
+    )
+    app.add_middleware(SessaoMiddleware, store=store, secret_key="testes")
+    return IpDoCabecalho(app)
+
+
+def test_limite_por_usuario_sem_ler_o_store():
+    store = StoreContado()
+    client = TestClient(criar_app(store))
+    client.post("/entrar?id=1")
+    leituras = store.leituras
+
+    # Trocar de IP não renova o balde do usuário logado
+    codigos = [client.get("/pagina", headers={"X-Ip": f"10.0.0.{n}"}).status_code for n in range(4)]
+
+    assert codigos == [200, 200, 200, 429]
+    assert store.leituras == leituras
+
+
+def test_usuarios_diferentes_tem_baldes_separados():
+    app = criar_app(StoreContado())
+    primeiro, segundo = TestClient(app), TestClient(app)
+    primeiro.post("/entrar?id=1")
+    segundo.post("/entrar?id=2")
+
+    assert [primeiro.get("/pagina", headers={"X-Ip": f"10.0.0.{n}"}).status_code for n in range(4)][-1] == 429
+    assert segundo.get("/pagina", headers={"X-Ip": "10.0.1.1"}).status_code == 200
+
+
+def test_varias_sessoes_do_mesmo_usuario_dividem_o_balde():
+    app = criar_app(StoreContado())
+    clientes = [TestClient(app) for _ in range(4)]
+    for client in clientes:
+        client.post("/entrar?id=1")
+
+    codigos = [client.get("/pagina", headers={"X-Ip": f"10.0.0.{n}"}).status_code for n, client in enumerate(clientes)]
+
+    assert codigos == [200, 200, 200, 429]
+
+
+def test_sessoes_anonimas_nao_escapam_do_limite_do_ip():
+    app = criar_app(StoreContado())
+    clientes = [TestClient(app) for _ in range(4)]
+    for client in clientes:
+        # Cada um ganha um cookie de sessão só para guardar a mensagem flash
+        client.post("/flash")
+        assert client.cookies.get("sessao")
+
+    codigos = [client.get("/pagina").status_code for client in clientes]
+
+    assert codigos == [200, 200, 200, 429]
+
+
+def test_usuario_logado_tambem_gasta_o_balde_do_ip():
+    app = criar_app(StoreContado())
+    logado, anonimo = TestClient(app), TestClient(app)
+    logado.post("/entrar?id=1")
+
+    assert [logado.get("/pagina").status_code for _ in range(3)] == [200, 200, 200]
+    assert anonimo.get("/pagina").status_code == 429
@@ -0,0 +1,109 @@
+"""Busca FULLTEXT: filtro de palavras igual ao do servidor e paginação por cursor sobre (relevância, id)."""
+import mysql.connector
+import pytest
+
+from models import produto_model
+from models.cache import produto_cache
+from models.produto_model import buscar_produtos, configuracao_fulltext, termo_busca_booleano
+
+
+class Cursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self._linhas = []
+
+    def execute(self, sql, params=()):
+        sql = " ".join(sql.split())
+        self.conn.comandos.append((sql, params))
+        if sql.startswith("SELECT @@innodb_ft_min_token_size"):
+            self._linhas = [self.conn.variaveis]
+        elif "INNODB_FT_DEFAULT_STOPWORD" in sql:
+            if self.conn.sem_privilegio:
+                raise mysql.connector.errors.ProgrammingError(msg="Access denied; you need the PROCESS privilege")
+            self._linhas = [(p,) for p in self.conn.stopwords]
+        elif sql.startswith("SELECT *,"):
+            self._linhas = self.conn.resultado(sql, params)
+
+    def fetchone(self):
+        return self._linhas[0]
+
+    def fetchall(self):
+        return list(self._linhas)
+
+    def close(self):
+        pass
+
+
+class Conexao:
+    def __init__(self, variaveis=(3, 1, None, None), stopwords=(), sem_privilegio=False, produtos=()):
+        self.variaveis = variaveis
+        self.stopwords = stopwords
+        self.sem_privilegio = sem_privilegio
+        self.produtos = list(produtos)
+        self.comandos = []
+
+    def cursor(self, dictionary=False):
+        return Cursor(self)
+
+    def resultado(self, sql, params):
+        """Ordena por (relevância desc, id) e aplica o cursor do HAVING, como o servidor."""
+        linhas = sorted(self.produtos, key=lambda p: (-p["relevancia"], p["id"]))
+        if "HAVING relevancia < %s" in sql:
+            relevancia, _, ultimo_id = params[3:6]
+            linhas = [p for p in linhas if (-p["relevancia"], p["id"]) > (-relevancia, ultimo_id)]
+        return [dict(p) for p in linhas[:params[-1]]]
+
+
+@pytest.fixture(autouse=True)
+def limpar(monkeypatch):
+    monkeypatch.setattr(produto_model, "_fulltext", None)
+    produto_cache.clear()
+    yield
+    produto_cache.clear()
+
+
+def test_filtro_usa_tamanho_minimo_e_stopwords_do_servidor():
+    conn = Conexao(variaveis=(4, 1, None, None), stopwords=("para", "com"))
+
+    fulltext = configuracao_fulltext(conn)
+
+    assert fulltext.min_token == 4
+    assert termo_busca_booleano("café para gato com pão", fulltext) == "+café* +gato*"
+
+
+def test_stopwords_desativadas_no_servidor():
+    fulltext = configuracao_fulltext(Conexao(variaveis=(3, 0, None, None)))
+
+    assert termo_busca_booleano("the mouse", fulltext) == "+the* +mouse*"
+
+
+def test_sem_privilegio_usa_a_configuracao_padrao_do_innodb():
+    fulltext = configuracao_fulltext(Conexao(sem_privilegio=True))
+
+    assert fulltext == produto_model.FULLTEXT_PADRAO
+    assert termo_busca_booleano("the mouse pé", fulltext) == "+mouse*"
+
+
+def test_paginas_por_cursor_sem_offset():
+    produtos = [
+        {"id": id, "nome": f"Caneta {id}", "relevancia": relevancia}
+        for id, relevancia in [(1, 0.5), (2, 0.9), (3, 0.5), (4, 0.5), (5, 0.1)]
+    ]
+    conn = Conexao(produtos=produtos)
+
+    primeira = buscar_produtos("caneta", conn, limite=2)
+    segunda = buscar_produtos("caneta", conn, limite=2, apos=primeira["proximo"])
+    terceira = buscar_produtos("caneta", conn, limite=2, apos=segunda["proximo"])
+
+    assert [p["id"] for p in primeira["produtos"]] == [2, 1]
+    assert [p["id"] for p in segunda["produtos"]] == [3, 4]
+    assert [p["id"] for p in terceira["produtos"]] == [5]
+    assert terceira["proximo"] is None and terceira["anterior"] is not None
+    consultas = [sql for sql, _ in conn.comandos if sql.startswith("SELECT *,")]
+    assert not any("OFFSET" in sql for sql in consultas)
+    assert all(sql.endswith("LIMIT %s") for sql in consultas)
+
+
+def test_cursor_invalido():
+    with pytest.raises(ValueError):
+        buscar_produtos("caneta", Conexao(), apos="nao-e-um-cursor")
@@ -0,0 +1,56 @@
+"""Last-Modified e If-Modified-Since com as datas sem fuso que o MySQL devolve."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from controllers.api_controller import _data_http
+from models import database
+
+
+class Cursor:
+    def execute(self, sql, params=()):
+        assert "UTC_TIMESTAMP()" in sql
+
+    def fetchone(self):
+        return (180,)
+
+    def close(self):
+        pass
+
+
+class Conexao:
+    def cursor(self):
+        return Cursor()
+
+
+@pytest.fixture
+def fuso(monkeypatch):
+    monkeypatch.setattr(database, "_fuso_banco", None)
+
+
+def test_fuso_lido_da_conexao(fuso):
+    database._ler_fuso(Conexao())
+
+    # 12:00 no fuso do banco (UTC+3) são 09:00 em UTC, seja qual for o fuso da aplicação
+    assert database._fuso_banco == timezone(timedelta(hours=3))
+    assert _data_http(datetime(2024, 1, 1, 12, 0)) == "Mon, 01 Jan 2024 09:00:00 GMT"
+
+
+def test_data_com_fuso_nao_e_convertida_de_novo(fuso, monkeypatch):
+    monkeypatch.setattr(database, "_fuso_banco", timezone(timedelta(hours=-5)))
+
+    assert _data_http(datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)) == "Mon, 01 Jan 2024 12:00:00 GMT"
+    assert database.como_utc(datetime(2024, 1, 1, 12, 0)) == datetime(2024, 1, 1, 17, 0, tzinfo=timezone.utc)
+
+
+def test_falha_na_leitura_mantem_o_fuso_anterior(fuso, monkeypatch):
+    anterior = timezone(timedelta(hours=1))
+    monkeypatch.setattr(database, "_fuso_banco", anterior)
+
+    class SemCursor:
+        def cursor(self):
+            raise OSError("conexão fechada")
+
+    database._ler_fuso(SemCursor())
+
+    assert database._fuso_banco is anterior
@@ -0,0 +1,47 @@
+"""A reserva de estoque vai num único UPDATE: o número de itens por requisição é limitado."""
+import pytest
+from fastapi.testclient import TestClient
+
+from config import Config
+from controllers import estoque_controller
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    import main
+
+    chamadas = []
+
+    async def reservar(itens):
+        chamadas.append(itens)
+        return [{"id": item.id, "estoque": 0} for item in itens]
+
+    async def registrar_log(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(estoque_controller, "reservar_estoque", reservar)
+    monkeypatch.setattr(estoque_controller, "registrar_log", registrar_log)
+    return TestClient(main.app), chamadas
+
+
+def itens(n):
+    return {"itens": [{"id": id, "quantidade": 1} for id in range(1, n + 1)]}
+
+
+def test_reserva_no_limite_de_itens(cliente):
+    client, chamadas = cliente
+
+    resposta = client.post("/estoque/reservar", json=itens(Config.ESTOQUE_RESERVA_MAX_ITENS))
+
+    assert resposta.status_code == 200
+    assert len(chamadas[0]) == Config.ESTOQUE_RESERVA_MAX_ITENS
+
+
+@pytest.mark.parametrize("rota", ["/estoque/reservar", "/estoque/liberar"])
+def test_reserva_acima_do_limite_e_recusada(cliente, rota):
+    client, chamadas = cliente
+
+    resposta = client.post(rota, json=itens(Config.ESTOQUE_RESERVA_MAX_ITENS + 1))
+
+    assert resposta.status_code == 422
+    assert chamadas == []
@@ -0,0 +1,188 @@
+"""
+Feed de eventos com transações que ficam abertas por muito tempo (importação em
+lote, remoção em lote): os eventos delas não podem ser pulados nem perdidos.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from models.eventos_model import ler_eventos, sequenciar_eventos, ultimo_evento
+
+
+class Servidor:
+    """
+    Simula o que o feed usa do InnoDB: ids de AUTO_INCREMENT reservados no
+    INSERT, linhas visíveis a outras conexões só depois do commit e linhas
+    não confirmadas bloqueadas pela transação que as inseriu.
+    """
+
+    def __init__(self):
+        self.eventos = {}
+        self.proximo_id = 1
+        self.ultima = 0
+
+
+class Cursor:
+    def __init__(self, conn, dictionary=False):
+        self.conn = conn
+        self.dictionary = dictionary
+        self._linhas = []
+
+    def _visiveis(self):
+        return [e for e in self.conn.servidor.eventos.values() if e["dono"] in (None, self.conn)]
+
+    def execute(self, sql, params=()):
+        servidor = self.conn.servidor
+        sql = " ".join(sql.split())
+        self.conn.comandos.append(sql)
+        if sql == "SELECT id FROM eventos WHERE posicao IS NULL LIMIT 1":
+            self._linhas = [(e["id"],) for e in self._visiveis() if e["posicao"] is None][:1]
+        elif sql.startswith("SELECT ultima FROM eventos_sequencia"):
+            self._linhas = [(servidor.ultima,)]
+        elif sql.startswith("SET TRANSACTION"):
+            self._linhas = []
+        elif sql.endswith("FOR UPDATE SKIP LOCKED"):
+            assert sql.startswith("SELECT id FROM eventos WHERE posicao IS NULL ORDER BY id")
+            livres = sorted(e["id"] for e in self._visiveis() if e["posicao"] is None)
+            self._linhas = [(id,) for id in livres[:params[0]]]
+        elif sql.startswith("UPDATE eventos SET posicao"):
+            ultima, ids = params[0], params[1:(len(params) + 1) // 2]
+            for ordem, id in enumerate(ids, 1):
+                servidor.eventos[id]["posicao"] = ultima + ordem
+        elif sql.startswith("UPDATE eventos_sequencia"):
+            servidor.ultima = params[0]
+        elif sql.startswith("SELECT id, posicao"):
+            apos, limite = params
+            linhas = sorted(
+                (e for e in self._visiveis() if e["posicao"] is not None and e["posicao"] > apos),
+                key=lambda e: e["posicao"]
+            )[:limite]
+            self._linhas = [{k: v for k, v in e.items() if k != "dono"} for e in linhas]
+        else:
+            raise AssertionError(f"Comando inesperado: {sql}")
+
+    def fetchone(self):
+        return self._linhas[0] if self._linhas else None
+
+    def fetchall(self):
+        return list(self._linhas)
+
+    def close(self):
+        pass
+
+
+class Conexao:
+    def __init__(self, servidor):
+        self.servidor = servidor
+        self.comandos = []
+
+    def cursor(self, dictionary=False):
+        return Cursor(self, dictionary)
+
+    def inserir_evento(self, agregado="produtos", id_registro=1, tipo="UPDATE", criado_em=None):
+        """O que os gatilhos fazem a cada escrita: reserva o próximo id e grava sem posição."""
+        id = self.servidor.proximo_id
+        self.servidor.proximo_id += 1
+        self.servidor.eventos[id] = {
+            "id": id, "posicao": None, "agregado": agregado, "id_registro": id_registro, "tipo": tipo,
+            "dados": None, "criado_em": criado_em or datetime.now(), "dono": self
+        }
+        return id
+
+    def commit(self):
+        for evento in self.servidor.eventos.values():
+            if evento["dono"] is self:
+                evento["dono"] = None
+
+    def rollback(self):
+        # O id reservado não volta: fica o buraco na sequência
+        for id in [id for id, e in self.servidor.eventos.items() if e["dono"] is self]:
+            del self.servidor.eventos[id]
+
+
+@pytest.fixture
+def servidor():
+    return Servidor()
+
+
+def test_transacao_longa_nao_perde_eventos(servidor):
+    leitor = Conexao(servidor)
+    importacao = Conexao(servidor)
+    # A importação reserva o primeiro id e segura a transação aberta
+    id_importacao = importacao.inserir_evento(id_registro=10, tipo="CREATE", criado_em=datetime.now() - timedelta(hours=1))
+
+    outra = Conexao(servidor)
+    outra.inserir_evento(id_registro=20)
+    outra.commit()
+
+    primeira = ler_eventos(leitor, apos=0)
+    assert [e["id_registro"] for e in primeira["eventos"]] == [20]
+    assert primeira["proximo"] == 1
+
+    # Muitas leituras depois, com a transação ainda aberta: o feed segue sem pular nada
+    for registro in (21, 22):
+        outra.inserir_evento(id_registro=registro)
+        outra.commit()
+    segunda = ler_eventos(leitor, apos=primeira["proximo"])
+    assert [e["id_registro"] for e in segunda["eventos"]] == [21, 22]
+    assert ler_eventos(leitor, apos=segunda["proximo"]) == {"eventos": [], "proximo": segunda["proximo"]}
+
+    importacao.commit()
+    terceira = ler_eventos(leitor, apos=segunda["proximo"])
+    assert [(e["id"], e["posicao"]) for e in terceira["eventos"]] == [(id_importacao, 4)]
+    assert terceira["proximo"] == 4
+
+
+def test_transacao_desfeita_nao_trava_o_feed(servidor):
+    leitor = Conexao(servidor)
+    desfeita = Conexao(servidor)
+    desfeita.inserir_evento(id_registro=10)
+    desfeita.rollback()
+    confirmada = Conexao(servidor)
+    confirmada.inserir_evento(id_registro=20)
+    confirmada.commit()
+
+    resultado = ler_eventos(leitor, apos=0)
+
+    assert [(e["id"], e["posicao"]) for e in resultado["eventos"]] == [(2, 1)]
+    assert ultimo_evento(leitor) == 1
+
+
+def test_posicoes_consecutivas_na_ordem_de_confirmacao(servidor):
+    leitor = Conexao(servidor)
+    primeira, segunda = Conexao(servidor), Conexao(servidor)
+    primeira.inserir_evento(id_registro=1)
+    segunda.inserir_evento(id_registro=2)
+    segunda.commit()
+    assert sequenciar_eventos(leitor) == 1
+    primeira.commit()
+    assert sequenciar_eventos(leitor) == 2
+
+    eventos = ler_eventos(leitor, apos=0)["eventos"]
+    assert [(e["id_registro"], e["posicao"]) for e in eventos] == [(2, 1), (1, 2)]
+
+
+def test_agregado_filtra_mas_avanca_a_posicao(servidor):
+    leitor = Conexao(servidor)
+    escrita = Conexao(servidor)
+    escrita.inserir_evento(agregado="usuarios")
+    escrita.inserir_evento(agregado="produtos")
+    escrita.inserir_evento(agregado="usuarios")
+    escrita.commit()
+
+    resultado = ler_eventos(leitor, apos=0, agregado="produtos")
+
+    assert [e["agregado"] for e in resultado["eventos"]] == ["produtos"]
+    assert resultado["proximo"] == 3
+
+
+def test_sem_eventos_novos_nao_abre_transacao_de_escrita(servidor):
+    leitor = Conexao(servidor)
+    escrita = Conexao(servidor)
+    escrita.inserir_evento()
+    escrita.commit()
+    sequenciar_eventos(leitor)
+    leitor.comandos.clear()
+
+    assert sequenciar_eventos(leitor) == 1
+    assert not any("FOR UPDATE" in comando for comando in leitor.comandos)
@@ -0,0 +1,128 @@
+"""
+Retenção de logs com linhas chegando a um mês já exportado (reenvio do arquivo
+de contingência do gravador) e leitura de exportações repetidas do mesmo mês.
+"""
+from datetime import date, datetime
+
+from models import log_retention
+from models.log_retention import executar_retencao, ler_arquivo
+
+
+def log(id, dia, tabela="produtos"):
+    return {
+        "id": id, "tipo_operacao": "UPDATE", "tabela_afetada": tabela, "id_registro": 1,
+        "dados_anteriores": None, "dados_novos": None, "id_usuario": None, "data_operacao": dia
+    }
+
+
+class Cursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 0
+        self._linhas = []
+
+    def _do_mes(self, nome):
+        return [l for l in self.conn.logs if f"p{l['data_operacao']:%Y%m}" == nome]
+
+    def execute(self, sql, params=()):
+        conn = self.conn
+        sql = " ".join(sql.split())
+        conn.comandos.append(sql)
+        if sql.startswith(("SELECT GET_LOCK", "SELECT RELEASE_LOCK")):
+            self._linhas = [(1,)]
+        elif "information_schema.PARTITIONS" in sql:
+            self._linhas = [(nome,) for nome in conn.particoes]
+        elif sql.startswith("SELECT MIN(data_operacao)"):
+            datas = [l["data_operacao"] for l in conn.logs if l["data_operacao"] < datetime.combine(params[0], datetime.min.time())]
+            self._linhas = [(min(datas) if datas else None,)]
+        elif sql.startswith("SELECT * FROM logs"):
+            inicio, fim, apos, lote = params
+            linhas = sorted(
+                (l for l in conn.logs if inicio <= l["data_operacao"].date() < fim and l["id"] > apos),
+                key=lambda l: l["id"]
+            )
+            self._linhas = [dict(l) for l in linhas[:lote]]
+            if not self._linhas and conn.ao_exportar:
+                conn.ao_exportar()
+                conn.ao_exportar = None
+        elif sql.startswith("SELECT COUNT(*) FROM logs PARTITION"):
+            nome = sql.split("(")[2].split(")")[0]
+            self._linhas = [(len([l for l in self._do_mes(nome) if l["id"] > params[0]]),)]
+        elif sql.startswith("ALTER TABLE logs DROP PARTITION"):
+            assert conn.bloqueada
+            nome = sql.rsplit(" ", 1)[1]
+            conn.logs = [l for l in conn.logs if l not in self._do_mes(nome)]
+            conn.particoes.remove(nome)
+        elif sql == "LOCK TABLES logs WRITE":
+            conn.bloqueada = True
+        elif sql == "UNLOCK TABLES":
+            conn.bloqueada = False
+        elif not sql.startswith("ALTER TABLE logs REORGANIZE"):
+            raise AssertionError(f"Comando inesperado: {sql}")
+
+    def fetchone(self):
+        return self._linhas[0] if self._linhas else None
+
+    def fetchall(self):
+        return list(self._linhas)
+
+    def close(self):
+        pass
+
+
+class Conexao:
+    def __init__(self, logs, particoes):
+        self.logs = logs
+        self.particoes = particoes
+        self.comandos = []
+        self.bloqueada = False
+        self.ao_exportar = None
+
+    def cursor(self, dictionary=False):
+        return Cursor(self)
+
+    def commit(self):
+        pass
+
+
+def test_linhas_que_chegam_depois_da_exportacao_sao_arquivadas_antes_da_remocao(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_retention.Config, "LOG_ARQUIVO_DIR", str(tmp_path))
+    monkeypatch.setattr(log_retention.Config, "LOG_RETENCAO_MESES", 12)
+    conn = Conexao(
+        [log(1, datetime(2024, 1, 10)), log(2, datetime(2024, 1, 20)), log(50, datetime(2025, 3, 1))],
+        ["p202401", "p202402", "p202503", "p_futuro"]
+    )
+    # O gravador reenvia o arquivo de contingência enquanto o mês é exportado
+    conn.ao_exportar = lambda: conn.logs.append(log(40, datetime(2024, 1, 15)))
+
+    resultado = executar_retencao(conn, hoje=date(2025, 3, 15))
+
+    assert resultado["arquivados"] == {"2024-01": 3}
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["logs_2024_01.2.jsonl.gz", "logs_2024_01.jsonl.gz"]
+    assert [l["id"] for l in ler_arquivo(str(tmp_path))] == [1, 2, 40]
+    assert [l["id"] for l in conn.logs] == [50]
+    assert conn.particoes == ["p202503", "p_futuro"]
+    assert not conn.bloqueada
+    assert not any("PARTITION BY" in comando for comando in conn.comandos)
+
+
+def test_retencao_nao_particiona_tabela_sem_particoes(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_retention.Config, "LOG_ARQUIVO_DIR", str(tmp_path))
+    conn = Conexao([log(1, datetime(2025, 3, 1))], [])
+
+    executar_retencao(conn, hoje=date(2025, 3, 15))
+
+    assert not any(comando.startswith("ALTER TABLE") for comando in conn.comandos)
+
+
+def test_exportacoes_repetidas_do_mesmo_mes_nao_duplicam(tmp_path):
+    conn = Conexao([log(1, datetime(2024, 1, 10)), log(3, datetime(2024, 1, 12), tabela="usuarios")], [])
+    log_retention.arquivar_mes(conn, date(2024, 1, 1), str(tmp_path))
+    conn.logs.append(log(5, datetime(2024, 1, 30)))
+    log_retention.arquivar_mes(conn, date(2024, 1, 1), str(tmp_path))
+    conn.logs = [log(2, datetime(2024, 2, 1))]
+    log_retention.arquivar_mes(conn, date(2024, 2, 1), str(tmp_path))
+
+    assert [l["id"] for l in ler_arquivo(str(tmp_path))] == [1, 3, 5, 2]
+    assert [l["id"] for l in ler_arquivo(str(tmp_path), tabela="produtos")] == [1, 5, 2]
+    assert [l["id"] for l in ler_arquivo(str(tmp_path), inicio=datetime(2024, 1, 11))] == [3, 5, 2]
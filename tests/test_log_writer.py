@@ -0,0 +1,102 @@
+"""Gravador de logs: linhas que o banco sempre recusa e eventos que chegam depois do stop."""
+import json
+from contextlib import contextmanager
+
+import mysql.connector
+import pytest
+
+from models import log_writer as modulo
+from models.log_writer import LogWriter
+
+
+class Cursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def executemany(self, sql, linhas):
+        if self.conn.fora_do_ar:
+            raise mysql.connector.errors.InterfaceError("sem conexão")
+        if any(linha[0] == "RUIM" for linha in linhas):
+            raise mysql.connector.errors.DataError("Data too long for column 'tipo_operacao'")
+        self.conn.pendentes.extend(linhas)
+
+    def close(self):
+        pass
+
+
+class Conexao:
+    def __init__(self):
+        self.fora_do_ar = False
+        self.pendentes = []
+        self.gravadas = []
+
+    def cursor(self):
+        return Cursor(self)
+
+    def commit(self):
+        self.gravadas.extend(self.pendentes)
+        self.pendentes = []
+
+
+def linha(tipo="UPDATE", id=1):
+    return (tipo, "produtos", id, None, None, None, None, 0)
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    conexao = Conexao()
+
+    @contextmanager
+    def get_connection():
+        yield conexao
+
+    monkeypatch.setattr(modulo, "get_connection", get_connection)
+    return conexao
+
+
+@pytest.fixture
+def writer(tmp_path):
+    return LogWriter(max_fila=100, batch_size=10, flush_interval=0.01,
+                     spill_file=str(tmp_path / "spill.jsonl"), max_falhas=2)
+
+
+def test_linha_recusada_nao_trava_as_demais_e_vai_para_rejeitados(conn, writer, tmp_path):
+    conn.fora_do_ar = True
+    writer._flush([linha(id=1), linha("RUIM", 2), linha(id=3)])
+    conn.fora_do_ar = False
+
+    writer._flush([linha(id=4)])
+    assert [l[2] for l in conn.gravadas] == [1, 3, 4]
+    assert json.loads((tmp_path / "spill.jsonl").read_text())["falhas"] == 1
+
+    writer._flush([linha(id=5)])
+    assert [l[2] for l in conn.gravadas] == [1, 3, 4, 5]
+    assert not (tmp_path / "spill.jsonl").exists()
+    rejeitado = json.loads((tmp_path / "spill.jsonl.rejeitados").read_text())
+    assert rejeitado["linha"][2] == 2 and rejeitado["falhas"] == 2 and "Data too long" in rejeitado["erro"]
+    assert writer.stats()["rejeitados"] == 1
+
+    writer._flush([linha(id=6)])
+    assert [l[2] for l in conn.gravadas][-1] == 6
+
+
+def test_spill_de_versao_anterior_e_reenviado(conn, writer, tmp_path):
+    (tmp_path / "spill.jsonl").write_text(json.dumps(list(linha(id=9))) + "\n")
+
+    writer._flush([linha(id=10)])
+
+    assert [l[2] for l in conn.gravadas] == [9, 10]
+
+
+def test_evento_depois_do_stop_vai_para_o_spill(conn, writer, tmp_path):
+    writer.start()
+    writer.stop()
+
+    assert writer.enqueue(linha(id=7)) is False
+    assert writer._thread is None
+    assert json.loads((tmp_path / "spill.jsonl").read_text())["linha"][2] == 7
+
+    writer.start()
+    writer.enqueue(linha(id=8))
+    writer.stop()
+    assert [l[2] for l in conn.gravadas] == [7, 8]
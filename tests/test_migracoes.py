@@ -0,0 +1,117 @@
+"""
+Migrações que falham no meio: o MySQL confirma cada DDL na hora, então a
+próxima inicialização roda a migração de novo sobre um schema meio alterado.
+"""
+import re
+
+import pytest
+
+from models import database
+from models.database import MIGRATIONS, Passo, init_db
+
+
+class Cursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self._linhas = []
+
+    def execute(self, sql, params=()):
+        conn = self.conn
+        self._linhas = []
+        if sql.startswith("SELECT GET_LOCK") or sql.startswith("SELECT RELEASE_LOCK"):
+            self._linhas = [(1,)]
+        elif sql == "SELECT versao FROM schema_migrations":
+            self._linhas = [(versao,) for versao in conn.versoes]
+        elif sql.startswith("INSERT INTO schema_migrations"):
+            conn.versoes.add(params[0])
+        elif (sql, params) in conn.passos:
+            # Consulta ao information_schema: o objeto existe se o comando do passo já rodou
+            if conn.passos[(sql, params)] in conn.executados:
+                self._linhas = [(1,)]
+        else:
+            if sql == conn.falhar_em:
+                conn.falhar_em = None
+                raise RuntimeError("conexão perdida")
+            conn.executados.append(sql)
+
+    def fetchone(self):
+        return self._linhas[0] if self._linhas else None
+
+    def fetchall(self):
+        return list(self._linhas)
+
+    def close(self):
+        pass
+
+
+class Conexao:
+    def __init__(self):
+        self.versoes = set()
+        self.executados = []
+        self.falhar_em = None
+        self.passos = {
+            (c.aplicado, c.params): c.comando
+            for _, _, comandos in MIGRATIONS for c in comandos if isinstance(c, Passo)
+        }
+
+    def cursor(self):
+        return Cursor(self)
+
+    def commit(self):
+        pass
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    conn = Conexao()
+    monkeypatch.setattr(database, "_connect", lambda database=True: conn)
+    return conn
+
+
+def comandos(versao):
+    return next(comandos for v, _, comandos in MIGRATIONS if v == versao)
+
+
+def texto(comando):
+    return comando.comando if isinstance(comando, Passo) else comando
+
+
+def test_todo_comando_de_migracao_e_idempotente():
+    for versao, _, lista in MIGRATIONS:
+        for comando in lista:
+            if isinstance(comando, Passo):
+                continue
+            sql = " ".join(comando.split())
+            assert (
+                re.match(r"(CREATE TABLE|DROP TRIGGER) IF (NOT )?EXISTS ", sql)
+                or re.match(r"UPDATE .* WHERE ", sql)
+                or "ON DUPLICATE KEY UPDATE" in sql
+                # Recriação de gatilho logo depois do DROP TRIGGER IF EXISTS da mesma migração
+                or (sql.startswith("CREATE TRIGGER") and any(
+                    texto(c).strip() == f"DROP TRIGGER IF EXISTS {sql.split()[2]}" for c in lista
+                ))
+            ), f"Migração {versao} não é idempotente: {sql[:60]}"
+
+
+def test_migracao_que_falhou_no_meio_continua_de_onde_parou(conn):
+    conn.versoes = set(range(1, 9))
+    produtos, usuarios = comandos(9)[:2]
+    conn.falhar_em = usuarios.comando
+
+    with pytest.raises(RuntimeError):
+        init_db()
+    assert conn.executados[-1] == produtos.comando
+    assert 9 not in conn.versoes
+
+    init_db()
+
+    # O ALTER de produtos já confirmado não roda de novo (daria coluna duplicada)
+    assert conn.executados.count(produtos.comando) == 1
+    assert conn.executados.count(usuarios.comando) == 1
+    assert {9, 10} <= conn.versoes
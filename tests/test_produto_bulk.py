@@ -0,0 +1,188 @@
+"""
+Importação em lote: linhas inválidas ou recusadas pelo banco entram no
+relatório sem interromper a importação nem desfazer os lotes já gravados.
+"""
+import io
+import json
+from contextlib import contextmanager
+
+import mysql.connector
+import pytest
+from fastapi.testclient import TestClient
+
+from controllers import produto_controller
+from models import async_db
+from models.produto_bulk import importar_arquivo, importar_produtos, ler_registros
+from sessao import exigir_login
+from validators.produto_validator import validador_produto_importacao
+
+
+class Cursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def _gravar(self, linhas):
+        # Simula um gatilho/constraint do banco que o validador não conhece
+        if any(nome == "Recusado" for _, nome, *_ in linhas):
+            raise mysql.connector.errors.DatabaseError(msg="Produto bloqueado", errno=1644)
+        if self.conn.cair:
+            raise mysql.connector.errors.OperationalError(msg="Lost connection", errno=2013)
+        self.conn.pendentes.extend(linhas)
+
+    def executemany(self, sql, linhas):
+        self.conn.comandos += 1
+        self._gravar(linhas)
+
+    def execute(self, sql, params):
+        self.conn.comandos += 1
+        self._gravar([params])
+
+    def close(self):
+        pass
+
+
+class Conexao:
+    def __init__(self):
+        self.pendentes = []
+        self.gravados = []
+        self.comandos = 0
+        self.commits = 0
+        self.rollbacks = 0
+        self.cair = False
+
+    def cursor(self):
+        return Cursor(self)
+
+    def commit(self):
+        self.commits += 1
+        self.gravados.extend(self.pendentes)
+        self.pendentes = []
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.pendentes = []
+
+
+def linha(nome="Caneta", preco="2.50", estoque="10", **campos):
+    return {"nome": nome, "descricao": "", "preco": preco, "estoque": estoque, **campos}
+
+
+def test_ler_registros_csv_e_jsonl():
+    csv = ["nome,preco,estoque\n", "Caneta,2.50,10\n", "Lápis,1,3\n"]
+    assert [(n, r["nome"]) for n, r in ler_registros(csv, "csv")] == [(2, "Caneta"), (3, "Lápis")]
+
+    jsonl = ['{"nome": "Caneta"}\n', "\n", "{quebrado\n"]
+    registros = list(ler_registros(jsonl, "jsonl"))
+    assert registros[0] == (1, {"nome": "Caneta"})
+    assert registros[1][0] == 3 and isinstance(registros[1][1], ValueError)
+
+    with pytest.raises(ValueError):
+        list(ler_registros([], "xml"))
+
+
+def test_validar_lote_respeita_os_limites_das_colunas():
+    resultado = validador_produto_importacao.validar_lote([
+        (1, linha()),
+        (2, {"nome": "x" * 300, "preco": "1e9", "estoque": "99999999999"}),
+        (3, linha(id="0")),
+        (4, "não é registro"),
+    ])
+
+    assert [n for n, _ in resultado.validos] == [1]
+    erros = dict(resultado.erros)
+    assert sorted(e.campo for e in erros[2]) == ["estoque", "nome", "preco"]
+    assert [e.campo for e in erros[3]] == ["id"]
+    assert [e.mensagem for e in erros[4]] == ["Registro inválido"]
+
+
+def test_linhas_invalidas_e_recusadas_nao_interrompem_a_importacao():
+    conn = Conexao()
+    registros = [
+        (2, linha(nome="Primeira")),
+        (3, linha(nome="x" * 101)),
+        (4, linha(nome="Recusado")),
+        (5, linha(nome="Quarta", id="7")),
+        (6, linha(nome="Quinta")),
+    ]
+
+    relatorio = importar_produtos(iter(registros), conn, lote=3, transacao=10)
+
+    assert [nome for _, nome, *_ in conn.gravados] == ["Primeira", "Quarta", "Quinta"]
+    assert relatorio["processados"] == 5
+    assert relatorio["gravados"] == 3
+    assert relatorio["total_erros"] == 2
+    assert [e["linha"] for e in relatorio["erros"]] == [3, 4]
+    assert "Recusada pelo banco: Produto bloqueado" in relatorio["erros"][1]["erros"]
+    assert (conn.commits, conn.rollbacks) == (1, 0)
+
+
+def test_erro_de_conexao_interrompe_e_desfaz_o_lote_em_andamento():
+    conn = Conexao()
+    registros = [(n, linha(nome=f"Produto {n}")) for n in range(1, 5)]
+
+    def registros_com_queda():
+        for numero, registro in registros:
+            if numero == 3:
+                conn.cair = True
+            yield numero, registro
+
+    with pytest.raises(ValueError):
+        importar_produtos(registros_com_queda(), conn, lote=2, transacao=2)
+
+    # Só o primeiro lote, confirmado antes da queda, fica gravado
+    assert [nome for _, nome, *_ in conn.gravados] == ["Produto 1", "Produto 2"]
+    assert conn.rollbacks == 1
+
+
+def test_importar_arquivo_jsonl():
+    conn = Conexao()
+    conteudo = "\n".join(json.dumps(linha(nome=nome)) for nome in ("Caneta", "Lápis")).encode("utf-8")
+
+    relatorio = importar_arquivo(io.BytesIO(conteudo), "jsonl", conn)
+
+    assert relatorio["gravados"] == 2
+    assert [nome for _, nome, *_ in conn.gravados] == ["Caneta", "Lápis"]
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    import main
+
+    conn = Conexao()
+    escritas = []
+
+    @contextmanager
+    def get_connection():
+        yield conn
+
+    async def registrar_log(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(async_db, "get_connection", get_connection)
+    monkeypatch.setattr(async_db, "marcar_escrita", lambda: escritas.append(True))
+    monkeypatch.setattr(produto_controller, "registrar_log", registrar_log)
+    yield TestClient(main.app), main.app, conn, escritas
+    main.app.dependency_overrides.clear()
+
+
+def test_importacao_e_exportacao_exigem_login(cliente):
+    client, _, conn, _ = cliente
+
+    resposta = client.post("/produtos/importar", files={"arquivo": ("catalogo.jsonl", b'{"nome": "Caneta"}\n')})
+
+    assert resposta.status_code == 401
+    assert client.get("/produtos/exportar").status_code == 401
+    assert conn.comandos == 0
+
+
+def test_importacao_marca_a_escrita(cliente):
+    client, app, conn, escritas = cliente
+    app.dependency_overrides[exigir_login] = lambda: {"id": 7, "nome": "Ana"}
+    conteudo = json.dumps(linha()).encode("utf-8")
+
+    resposta = client.post("/produtos/importar", files={"arquivo": ("catalogo.jsonl", conteudo)})
+
+    assert resposta.status_code == 200, resposta.text
+    assert resposta.json()["gravados"] == 1
+    # As leituras seguintes do usuário vão ao primário, sem o cache desatualizado
+    assert escritas == [True]
@@ -0,0 +1,59 @@
+"""A remoção em lote pela API exige login e ao menos um id ou filtro."""
+import pytest
+from fastapi.testclient import TestClient
+
+from controllers import api_controller
+from sessao import exigir_login
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    import main
+
+    chamadas = []
+
+    async def remover(**criterios):
+        chamadas.append(criterios)
+        return 2
+
+    async def registrar_log(*args, **kwargs):
+        chamadas.append(kwargs)
+
+    monkeypatch.setattr(api_controller, "remover_produtos", remover)
+    monkeypatch.setattr(api_controller, "remover_usuarios", remover)
+    monkeypatch.setattr(api_controller, "registrar_log", registrar_log)
+    yield TestClient(main.app), main.app, chamadas
+    main.app.dependency_overrides.clear()
+
+
+@pytest.mark.parametrize("rota", ["/api/v1/produtos/remover", "/api/v1/usuarios/remover"])
+def test_sem_login_nada_e_removido(cliente, rota):
+    client, _, chamadas = cliente
+
+    resposta = client.post(rota, json={"ids": [1, 2]})
+
+    assert resposta.status_code == 401
+    assert chamadas == []
+
+
+@pytest.mark.parametrize("corpo", [{}, {"ids": None, "atualizado_antes": None}, {"estoque_maximo": 0}])
+def test_corpo_sem_filtro_e_recusado(cliente, corpo):
+    client, app, chamadas = cliente
+    app.dependency_overrides[exigir_login] = lambda: {"id": 7, "nome": "Ana"}
+
+    resposta = client.post("/api/v1/produtos/remover", json=corpo)
+
+    assert resposta.status_code in (400, 422)
+    assert chamadas == []
+
+
+def test_remocao_logada_registra_o_usuario(cliente):
+    client, app, chamadas = cliente
+    app.dependency_overrides[exigir_login] = lambda: {"id": 7, "nome": "Ana"}
+
+    resposta = client.post("/api/v1/usuarios/remover", json={"ids": [3, 4]})
+
+    assert resposta.status_code == 200
+    assert resposta.json() == {"removidos": 2}
+    assert chamadas[0] == {"ids": [3, 4]}
+    assert chamadas[1]["id_usuario"] == 7
@@ -0,0 +1,63 @@
+"""Ler as próprias escritas com réplicas: decisão por cliente, sem prender as leituras dos demais ao primário."""
+import time
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from models import cache
+from models.cache import _AUSENTE, Cache, MemoryCacheBackend
+from models.replicas import LeituraConsistenteMiddleware, RoteadorLeitura, marcar_escrita
+
+
+def criar_app():
+    roteador = RoteadorLeitura([])
+
+    async def escrever(request):
+        marcar_escrita()
+        return JSONResponse({"primario": roteador.usar_primario(), "renovar": cache.renovar.get()})
+
+    async def ler(request):
+        return JSONResponse({"primario": roteador.usar_primario(), "renovar": cache.renovar.get()})
+
+    app = Starlette(routes=[Route("/escrever", escrever, methods=["POST"]), Route("/ler", ler)])
+    app.add_middleware(LeituraConsistenteMiddleware, janela=5)
+    return app
+
+
+def test_escrita_de_um_cliente_nao_leva_os_outros_ao_primario():
+    app = criar_app()
+    autor, outro = TestClient(app), TestClient(app)
+
+    assert autor.post("/escrever").json() == {"primario": True, "renovar": True}
+
+    assert autor.get("/ler").json() == {"primario": True, "renovar": True}
+    assert outro.get("/ler").json() == {"primario": False, "renovar": False}
+
+
+def test_requisicao_de_quem_escreveu_rele_e_substitui_o_cache():
+    produtos = Cache(MemoryCacheBackend())
+    produtos.set("produto:1", {"versao": 1})
+
+    token = cache.renovar.set(True)
+    try:
+        assert produtos.get_or_load("produto:1", lambda: {"versao": 2}) == {"versao": 2}
+    finally:
+        cache.renovar.reset(token)
+    assert produtos.get_or_load("produto:1", lambda: {"versao": 3}) == {"versao": 2}
+
+
+def test_invalidacao_se_repete_ao_fim_da_janela():
+    produtos = Cache(MemoryCacheBackend(), repetir_invalidacao=0.05)
+    geracao = produtos.geracao("produtos")
+    produtos.invalidate("produto:1")
+    produtos.invalidate_namespace("produtos")
+    # Leitura numa réplica ainda sem a escrita guarda o valor antigo
+    produtos.set("produto:1", {"versao": 1})
+
+    assert produtos.get("produto:1") == {"versao": 1}
+    # A repetição não depende de uma nova leitura neste processo
+    time.sleep(0.2)
+    assert produtos.backend.get("produto:1") is None
+    assert produtos.geracao("produtos") == geracao + 2
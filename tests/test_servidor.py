@@ -0,0 +1,48 @@
+import pytest
+
+import servidor
+
+
+@pytest.fixture
+def execucoes(monkeypatch):
+    chamadas = []
+    monkeypatch.setattr(servidor.uvicorn, "run", lambda *args, **kwargs: chamadas.append(kwargs))
+    monkeypatch.setattr(servidor.os, "chdir", lambda caminho: None)
+    return chamadas
+
+
+def test_varios_workers_sem_secret_key_nao_inicia(monkeypatch, execucoes):
+    monkeypatch.setattr(servidor.Config, "SECRET_KEY", "")
+
+    with pytest.raises(SystemExit):
+        servidor.main(["--workers", "4"])
+
+    assert execucoes == []
+
+
+def test_um_worker_aceita_chave_aleatoria(monkeypatch, execucoes):
+    monkeypatch.setattr(servidor.Config, "SECRET_KEY", "")
+
+    assert servidor.main(["--workers", "1"]) == 0
+    assert execucoes[0]["workers"] == 1
+
+
+def test_varios_workers_com_secret_key(monkeypatch, execucoes):
+    monkeypatch.setattr(servidor.Config, "SECRET_KEY", "chave")
+
+    assert servidor.main(["--workers", "4"]) == 0
+    assert execucoes[0]["workers"] == 4
+
+
+def test_replicas_com_varios_workers_exigem_cache_compartilhado(monkeypatch, execucoes):
+    monkeypatch.setattr(servidor.Config, "SECRET_KEY", "chave")
+    monkeypatch.setattr(servidor.Config, "DB_REPLICAS", "replica1:3306")
+    monkeypatch.setattr(servidor.Config, "CACHE_BACKEND", "memoria")
+
+    with pytest.raises(SystemExit):
+        servidor.main(["--workers", "4"])
+    assert servidor.main(["--workers", "1"]) == 0
+
+    monkeypatch.setattr(servidor.Config, "CACHE_BACKEND", "redis")
+    assert servidor.main(["--workers", "4"]) == 0
+    assert [chamada["workers"] for chamada in execucoes] == [1, 4]
@@ -0,0 +1,323 @@
+"""
+Idas ao banco por requisição na edição e exclusão de produtos: leitura com
+bloqueio, alteração, log e commit numa única transação, numa única conexão.
+"""
+import copy
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+
+from models import database
+from models.cache import _AUSENTE, produto_cache
+from models.produto_model import ConflitoVersaoError, ProdutoBase
+from models.unidade_trabalho import RegistroNaoEncontradoError, UnidadeDeTrabalho
+from models.usuario_model import delete_usuario
+from sessao import exigir_login
+
+
+class CursorFalso:
+    def __init__(self, conn, dictionary=False):
+        self.conn = conn
+        self.rowcount = 0
+        self._linha = None
+
+    def execute(self, sql, params=()):
+        self.conn.comandos.append(sql)
+        produtos = self.conn.produtos
+        id = params[-1]
+        if sql.startswith("SELECT * FROM produtos"):
+            if "FOR UPDATE" in sql:
+                self.conn.bloqueados.add(id)
+            self._linha = copy.deepcopy(produtos.get(id))
+        elif sql.startswith("UPDATE produtos SET removido_em"):
+            self.rowcount = 1 if produtos.pop(id, None) else 0
+        elif sql.startswith("UPDATE produtos SET nome"):
+            nome, descricao, preco, estoque = params[:4]
+            produtos[id].update(nome=nome, descricao=descricao, preco=Decimal(str(preco)), estoque=estoque)
+            produtos[id]["versao"] += 1
+            self.rowcount = 1
+
+    def executemany(self, sql, linhas):
+        self.conn.comandos.append(sql)
+        self.conn.logs.extend(linhas)
+
+    def fetchone(self):
+        return self._linha
+
+    def close(self):
+        pass
+
+
+class ConexaoFalsa:
+    """Registra cada comando, commit e rollback; só o commit torna as alterações visíveis."""
+
+    def __init__(self, produtos):
+        self.produtos = copy.deepcopy(produtos)
+        self.confirmados = copy.deepcopy(produtos)
+        self.comandos = []
+        self.logs = []
+        self.logs_confirmados = []
+        self.bloqueados = set()
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self, dictionary=False):
+        return CursorFalso(self, dictionary)
+
+    def commit(self):
+        self.commits += 1
+        self.confirmados = copy.deepcopy(self.produtos)
+        self.logs_confirmados.extend(self.logs)
+        self.logs = []
+        self.bloqueados.clear()
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.produtos = copy.deepcopy(self.confirmados)
+        self.logs = []
+        self.bloqueados.clear()
+
+
+class PoolFalso:
+    def __init__(self, conn):
+        self.conn = conn
+        self.emprestimos = 0
+
+    def acquire(self):
+        self.emprestimos += 1
+        return self.conn
+
+    def release(self, conn):
+        pass
+
+
+def produto(id=1, versao=3, **campos):
+    linha = {
+        "id": id, "nome": "Caneta", "descricao": "Azul", "preco": Decimal("2.50"), "estoque": 10,
+        "versao": versao, "created_at": datetime(2024, 1, 1), "updated_at": datetime(2024, 1, 2)
+    }
+    linha.update(campos)
+    return linha
+
+
+NOVO = ProdutoBase(nome="Caneta", descricao="Vermelha", preco=3.0, estoque=8)
+
+
+@pytest.fixture
+def conn():
+    produto_cache.clear()
+    yield ConexaoFalsa({1: produto()})
+    produto_cache.clear()
+
+
+def test_edicao_le_altera_e_registra_numa_transacao(conn):
+    # Entrada desatualizada no cache (outro worker já alterou o produto): não pode ir para o log
+    produto_cache.set("produto:1", produto(nome="Antigo", versao=1))
+    uow = UnidadeDeTrabalho()
+    uow.atualizar_produto(1, NOVO, versao=3)
+
+    assert uow.commit(conn) == [1]
+
+    assert len(conn.comandos) == 3
+    assert conn.comandos[0].endswith("FOR UPDATE")
+    assert conn.comandos[1].startswith("UPDATE produtos SET nome")
+    assert "INSERT INTO logs" in conn.comandos[2]
+    assert (conn.commits, conn.rollbacks) == (1, 0)
+
+    tipo, tabela, id, anteriores, novos, *_ = conn.logs_confirmados[0]
+    assert (tipo, tabela, id) == ("UPDATE", "produtos", 1)
+    assert '"nome": "Caneta"' in anteriores and '"Azul"' in anteriores
+    assert '"Vermelha"' in novos
+    assert conn.confirmados[1]["versao"] == 4
+    assert produto_cache.get("produto:1") is _AUSENTE
+
+
+def test_edicao_com_releitura_na_mesma_transacao(conn):
+    uow = UnidadeDeTrabalho()
+    uow.atualizar_produto(1, NOVO, reler=True)
+
+    uow.commit(conn)
+
+    assert len(conn.comandos) == 4
+    assert conn.commits == 1
+    assert uow.produtos[1]["descricao"] == "Vermelha"
+    assert uow.produtos[1]["versao"] == 4
+
+
+def test_exclusao_le_altera_e_registra_numa_transacao(conn):
+    uow = UnidadeDeTrabalho()
+    uow.remover_produto(1)
+
+    uow.commit(conn)
+
+    assert len(conn.comandos) == 3
+    assert conn.comandos[0].endswith("FOR UPDATE")
+    assert conn.comandos[1].startswith("UPDATE produtos SET removido_em")
+    assert (conn.commits, conn.rollbacks) == (1, 0)
+    tipo, _, _, anteriores, *_ = conn.logs_confirmados[0]
+    assert tipo == "DELETE" and '"Azul"' in anteriores
+    assert 1 not in conn.confirmados
+    assert uow.produtos[1] is None
+
+
+def test_produto_inexistente_desfaz_sem_alterar(conn):
+    uow = UnidadeDeTrabalho()
+    uow.atualizar_produto(99, NOVO)
+
+    with pytest.raises(RegistroNaoEncontradoError):
+        uow.commit(conn)
+
+    assert len(conn.comandos) == 1
+    assert (conn.commits, conn.rollbacks) == (0, 1)
+    assert conn.logs_confirmados == []
+
+
+def test_conflito_de_versao_desfaz_e_guarda_o_estado_atual(conn):
+    conn.produtos[2] = conn.confirmados[2] = produto(id=2)
+    uow = UnidadeDeTrabalho()
+    uow.remover_produto(2)
+    uow.atualizar_produto(1, NOVO, versao=2)
+
+    with pytest.raises(ConflitoVersaoError):
+        uow.commit(conn)
+
+    # A exclusão agendada antes também é desfeita
+    assert (conn.commits, conn.rollbacks) == (0, 1)
+    assert 2 in conn.confirmados
+    assert conn.confirmados[1]["versao"] == 3
+    assert conn.logs_confirmados == []
+    assert uow.produtos[1]["versao"] == 3
+
+
+@pytest.fixture
+def cliente(conn, monkeypatch):
+    import main
+
+    pool = PoolFalso(conn)
+    monkeypatch.setattr(database, "_pool", pool)
+    main.app.dependency_overrides[exigir_login] = lambda: {"id": 7, "nome": "Ana"}
+    yield TestClient(main.app), pool
+    main.app.dependency_overrides.clear()
+
+
+def test_api_edicao_usa_uma_conexao_e_um_commit(cliente, conn):
+    client, pool = cliente
+
+    resposta = client.put("/api/v1/produtos/1", json=NOVO.dict(), headers={"If-Match": '"p1-v3"'})
+
+    assert resposta.status_code == 200, resposta.text
+    assert resposta.json()["descricao"] == "Vermelha"
+    assert pool.emprestimos == 1
+    assert len(conn.comandos) == 4
+    assert (conn.commits, conn.rollbacks) == (1, 0)
+
+
+def test_api_exclusao_usa_uma_conexao_e_um_commit(cliente, conn):
+    client, pool = cliente
+
+    assert client.delete("/api/v1/produtos/1").status_code == 204
+    assert client.delete("/api/v1/produtos/1").status_code == 404
+
+    assert pool.emprestimos == 2
+    assert len(conn.comandos) == 4
+    assert (conn.commits, conn.rollbacks) == (1, 1)
+    # Quem excluiu vai para o log
+    assert conn.logs_confirmados[0][5] == 7
+
+
+@pytest.mark.parametrize("metodo, rota", [
+    ("delete", "/api/v1/produtos/1"), ("post", "/produtos/1/deletar"), ("post", "/usuarios/1/deletar")
+])
+def test_exclusao_sem_login_e_recusada(cliente, conn, metodo, rota):
+    import main
+
+    client, pool = cliente
+    main.app.dependency_overrides.clear()
+
+    resposta = getattr(client, metodo)(rota, follow_redirects=False)
+
+    assert resposta.status_code == 401
+    assert pool.emprestimos == 0
+    assert 1 in conn.confirmados
+
+
+def test_formulario_edicao_usa_uma_conexao_e_um_commit(cliente, conn):
+    client, pool = cliente
+
+    resposta = client.post(
+        "/produtos/1/editar", data={**NOVO.dict(), "versao": 3}, follow_redirects=False
+    )
+
+    assert resposta.status_code == 303
+    assert pool.emprestimos == 1
+    assert len(conn.comandos) == 3
+    assert (conn.commits, conn.rollbacks) == (1, 0)
+
+
+class CursorUsuario:
+    def __init__(self, conn, dictionary=False):
+        self.conn = conn
+        self._linha = None
+
+    def execute(self, sql, params=()):
+        self.conn.comandos.append(sql)
+        self.conn.params.append(params)
+        if sql.startswith("SELECT nome, email FROM usuarios"):
+            self._linha = self.conn.usuarios.get(params[0])
+
+    def fetchone(self):
+        return self._linha
+
+
+class ConexaoUsuario:
+    def __init__(self, usuarios):
+        self.usuarios = usuarios
+        self.comandos = []
+        self.params = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self, dictionary=False):
+        return CursorUsuario(self, dictionary)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+def test_exclusao_de_usuario_registra_os_dados_anteriores_na_mesma_transacao():
+    conn = ConexaoUsuario({3: {"nome": "Bia", "email": "bia@exemplo.com"}})
+
+    assert delete_usuario(3, conn, id_usuario=7) == 1
+
+    consulta, exclusao, log = conn.comandos
+    assert consulta.endswith("FOR UPDATE")
+    assert exclusao.startswith("UPDATE usuarios SET removido_em")
+    assert "INSERT INTO logs" in log
+    tipo, tabela, id, anteriores, _, id_usuario, *_ = conn.params[2]
+    assert (tipo, tabela, id, id_usuario) == ("DELETE", "usuarios", 3, 7)
+    assert '"email": "bia@exemplo.com"' in anteriores
+    assert (conn.commits, conn.rollbacks) == (1, 0)
+
+
+def test_exclusao_de_usuario_inexistente_nao_altera_nem_registra():
+    conn = ConexaoUsuario({})
+
+    assert delete_usuario(3, conn, id_usuario=7) == 0
+
+    assert len(conn.comandos) == 1
+    assert (conn.commits, conn.rollbacks) == (0, 1)
+
+
+def test_if_match_curinga_aceita_qualquer_versao(cliente, conn):
+    client, _ = cliente
+
+    resposta = client.put("/api/v1/produtos/1", json=NOVO.dict(), headers={"If-Match": "*"})
+
+    assert resposta.status_code == 200, resposta.text
+    assert resposta.json()["versao"] == 4
+    assert client.put("/api/v1/produtos/99", json=NOVO.dict(), headers={"If-Match": "*"}).status_code == 404
@@ -0,0 +1,126 @@
+"""
+Motor de validação usado por formulários, API e importação: conversão dos
+valores brutos, obrigatórios e padrões, extensão de validadores e lotes.
+"""
+import pytest
+
+from validators.validacao import (
+    Campo,
+    ErroValidacao,
+    Validador,
+    decimal,
+    detalhes_api,
+    inteiro,
+    maior_que,
+    mensagens_com_campo,
+    tamanho_maximo,
+    texto
+)
+from validators.usuario_validator import validador_usuario, validador_usuario_edicao
+
+
+@pytest.mark.parametrize("valor, esperado", [(" Caneta ", "Caneta"), ("", "")])
+def test_texto(valor, esperado):
+    assert texto(valor) == esperado
+
+
+@pytest.mark.parametrize("valor, esperado", [("2.5", 2.5), (" 3 ", 3.0), (4, 4.0), (1.25, 1.25)])
+def test_decimal(valor, esperado):
+    assert decimal(valor) == esperado
+
+
+@pytest.mark.parametrize("valor, esperado", [("10", 10), (7, 7), (3.0, 3), (" 2 ", 2)])
+def test_inteiro(valor, esperado):
+    assert inteiro(valor) == esperado
+
+
+@pytest.mark.parametrize("conversor, valor", [
+    (texto, 10), (decimal, "abc"), (decimal, "nan"), (decimal, "inf"), (decimal, True),
+    (inteiro, "2.5"), (inteiro, 2.5), (inteiro, False), (inteiro, [1]),
+])
+def test_conversao_invalida(conversor, valor):
+    with pytest.raises((ValueError, TypeError, AttributeError)):
+        conversor(valor)
+
+
+VALIDADOR = Validador([
+    Campo("nome", texto, "O nome deve ser um texto", [tamanho_maximo(5, "Nome longo")]),
+    Campo("preco", decimal, "O preço deve ser um número", [maior_que(0, "Preço positivo")]),
+    Campo("obs", texto, "Obs deve ser um texto", obrigatorio=False, padrao="-"),
+])
+
+
+def test_converte_e_ignora_chaves_desconhecidas():
+    dados, erros = VALIDADOR.validar({"nome": " Ana ", "preco": "2", "extra": 1})
+
+    assert erros == []
+    assert dados == {"nome": "Ana", "preco": 2.0, "obs": "-"}
+
+
+@pytest.mark.parametrize("ausente", [None, ""])
+def test_obrigatorio_ausente_e_opcional_com_padrao(ausente):
+    dados, erros = VALIDADOR.validar({"nome": ausente, "preco": "1", "obs": ausente})
+
+    assert dados is None
+    assert erros == [ErroValidacao("nome", "O campo nome é obrigatório")]
+
+
+def test_coleta_todos_os_erros_sem_parar_no_primeiro():
+    _, erros = VALIDADOR.validar({"nome": "Longo demais", "preco": "-1", "obs": 3})
+
+    assert erros == [
+        ErroValidacao("nome", "Nome longo"),
+        ErroValidacao("preco", "Preço positivo"),
+        ErroValidacao("obs", "Obs deve ser um texto"),
+    ]
+    assert mensagens_com_campo(erros)[0] == "nome: Nome longo"
+    assert detalhes_api(erros)[1] == {"loc": ["body", "preco"], "msg": "Preço positivo", "type": "value_error"}
+
+
+def test_estender_substitui_acrescenta_e_remove_campos():
+    estendido = VALIDADOR.estender(
+        [Campo("preco", decimal, "O preço deve ser um número", obrigatorio=False, padrao=0.0),
+         Campo("id", inteiro, "O id deve ser um inteiro")],
+        sem=["obs"]
+    )
+
+    assert [c.nome for c in estendido.campos] == ["nome", "preco", "id"]
+    assert estendido.validar({"nome": "Ana", "id": "3"}) == ({"nome": "Ana", "preco": 0.0, "id": 3}, [])
+    # O original não muda
+    assert [c.nome for c in VALIDADOR.campos] == ["nome", "preco", "obs"]
+
+
+def test_validar_lote():
+    resultado = VALIDADOR.validar_lote([
+        (1, {"nome": "Ana", "preco": "1"}),
+        (2, {"nome": "Ana"}),
+        (3, ["não", "é", "dict"]),
+        (4, {"nome": "Bia", "preco": 2}),
+    ])
+
+    assert [chave for chave, _ in resultado.validos] == [1, 4]
+    assert resultado.validos[1][1]["preco"] == 2.0
+    assert resultado.erros == [
+        (2, [ErroValidacao("preco", "O campo preco é obrigatório")]),
+        (3, [ErroValidacao("", "Registro inválido")]),
+    ]
+
+
+def test_usuario_respeita_os_limites_das_colunas():
+    _, erros = validador_usuario.validar({"nome": "x" * 51, "email": "a" * 95 + "@b.com", "senha": "segredo"})
+
+    assert sorted(e.campo for e in erros) == ["email", "nome"]
+
+
+@pytest.mark.parametrize("email", ["ana", "ana@", "ana@dominio", "ana@dominio..com", "ana@.com", "a na@b.com"])
+def test_usuario_email_invalido(email):
+    _, erros = validador_usuario.validar({"nome": "Ana", "email": email, "senha": "segredo"})
+
+    assert [e.campo for e in erros] == ["email"]
+
+
+def test_usuario_edicao_sem_senha_mantem_a_atual():
+    dados, erros = validador_usuario_edicao.validar({"nome": "Ana", "email": "ana@exemplo.com.br", "senha": ""})
+
+    assert erros == []
+    assert dados["senha"] is None